@@ -1,4 +1,54 @@
-from django.contrib import admin
-from .models import Leader
+from django.contrib import admin, messages
+from .models import Leader, LeaderDocument, IngestionJob
+from .ingestion import enqueue_leader_ingestion
 
-admin.site.register(Leader)
\ No newline at end of file
+
+class LeaderDocumentInline(admin.TabularInline):
+    model = LeaderDocument
+    fields = ('title', 'file', 'chunk_count', 'indexed_at')
+    readonly_fields = ('chunk_count', 'indexed_at')
+    extra = 1
+
+    @admin.display(description="Chunks")
+    def chunk_count(self, document):
+        return len(document.chunks)
+
+
+@admin.register(Leader)
+class LeaderAdmin(admin.ModelAdmin):
+    inlines = [LeaderDocumentInline]
+    list_display = ('name', 'index_status', 'index_progress', 'index_type')
+    readonly_fields = ('index_path', 'pkl_file_path', 'index_status', 'index_progress', 'index_error')
+    actions = ['rebuild_indexes']
+
+    @admin.action(description="Rebuild vector index with the selected index type")
+    def rebuild_indexes(self, request, queryset):
+        from .leader_index import IndexFormatError, read_manifest
+        from .vectorstore import vector_store_registry
+
+        # The ingestion job rebuilds from stored vectors when the index type changed
+        queued = 0
+        for leader in queryset:
+            if leader.index_path:
+                try:
+                    read_manifest(vector_store_registry.resolve_path(leader))
+                except (IndexFormatError, OSError, ValueError) as e:
+                    self.message_user(request, f"{leader.name}: {e}", level=messages.ERROR)
+                    continue
+            enqueue_leader_ingestion(leader)
+            queued += 1
+        if queued:
+            self.message_user(request, f"Queued {queued} leader(s) for reindexing")
+
+
+@admin.register(IngestionJob)
+class IngestionJobAdmin(admin.ModelAdmin):
+    list_display = ('leader', 'status', 'attempts', 'max_attempts', 'run_after', 'updated_at')
+    list_filter = ('status',)
+    readonly_fields = ('stats', 'error')
+    actions = ['retry_jobs']
+
+    @admin.action(description="Retry selected jobs")
+    def retry_jobs(self, request, queryset):
+        for job in queryset.select_related('leader').filter(status=IngestionJob.Status.FAILED):
+            enqueue_leader_ingestion(job.leader)
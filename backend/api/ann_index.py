@@ -0,0 +1,141 @@
+"""FAISS index types for leader vector stores.
+
+A flat index compares a question with every stored float32 vector, so its
+memory and search time grow linearly with a leader's corpus. Leaders can
+instead be indexed with an HNSW graph (sub-linear search, more memory),
+IVF with product quantization (a few dozen bytes per vector, approximate
+distances) or scalar quantization to int8/float16 (exact scan of 4x/2x
+smaller vectors). ``auto`` picks one by corpus size. Every type uses L2
+distance on the normalised embeddings, like the flat index, and can return
+stored vectors, so scores and relevance checks work the same way.
+"""
+import logging
+import time
+
+import faiss
+import numpy as np
+from django.conf import settings
+
+from .models import Leader
+
+logger = logging.getLogger(__name__)
+
+# Product quantizer codebooks have 256 centroids each; FAISS wants ~39 training points per centroid
+IVF_PQ_MIN_VECTORS = 39 * 256
+
+
+def resolve_index_type(index_type, count):
+    """The concrete index type to build for ``count`` vectors"""
+    if index_type == Leader.IndexType.AUTO:
+        if count >= settings.ANN_AUTO_IVF_PQ_MIN_VECTORS:
+            index_type = Leader.IndexType.IVF_PQ
+        elif count >= settings.ANN_AUTO_HNSW_MIN_VECTORS:
+            index_type = Leader.IndexType.HNSW
+        else:
+            index_type = Leader.IndexType.FLAT
+    if index_type == Leader.IndexType.IVF_PQ and count < IVF_PQ_MIN_VECTORS:
+        # Too few vectors to train the quantizers; int8 keeps most of the memory saving
+        logger.info("%d vectors are too few for IVF-PQ, using int8 scalar quantization", count)
+        index_type = Leader.IndexType.SQ8
+    return Leader.IndexType(index_type).value
+
+
+def pq_subquantizers(dimension):
+    """Number of PQ codes per vector: one byte per ~8 dimensions (96 for mpnet's 768)"""
+    for m in range(max(dimension // 8, 1), 0, -1):
+        if dimension % m == 0:
+            return m
+
+
+def factory_string(index_type, dimension, count):
+    """``faiss.index_factory`` description of a concrete index type"""
+    if index_type == Leader.IndexType.HNSW:
+        return f"HNSW{settings.ANN_HNSW_M}"
+    if index_type == Leader.IndexType.IVF_PQ:
+        nlist = max(1, min(int(4 * count ** 0.5), count // 39))
+        return f"IVF{nlist},PQ{pq_subquantizers(dimension)}"
+    if index_type == Leader.IndexType.SQ8:
+        return "SQ8"
+    if index_type == Leader.IndexType.SQ_FP16:
+        return "SQfp16"
+    return "Flat"
+
+
+def configure_search(index):
+    """Apply the configured HNSW/IVF search breadth to a built or loaded index"""
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = settings.ANN_HNSW_EF_SEARCH
+    elif isinstance(index, faiss.IndexIVF):
+        index.nprobe = settings.ANN_IVF_NPROBE
+    return index
+
+
+def build_index(vectors, index_type):
+    """Build a FAISS index over ``vectors`` (rows in docstore order).
+
+    ``index_type`` may be ``auto``. Returns ``(index, concrete index type)``.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    count, dimension = vectors.shape
+    index_type = resolve_index_type(index_type, count)
+    index = faiss.index_factory(dimension, factory_string(index_type, dimension, count), faiss.METRIC_L2)
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efConstruction = settings.ANN_HNSW_EF_CONSTRUCTION
+    if not index.is_trained:
+        sample = vectors
+        if count > settings.ANN_TRAIN_SAMPLE:
+            rows = np.random.default_rng(0).choice(count, settings.ANN_TRAIN_SAMPLE, replace=False)
+            sample = vectors[np.sort(rows)]
+        index.train(sample)
+    index.add(vectors)
+    if isinstance(index, faiss.IndexIVF):
+        # Lets reconstruct() return stored vectors (relevance checks, rebuilds)
+        index.make_direct_map()
+    return configure_search(index), index_type
+
+
+def stored_vectors(index):
+    """All vectors of an index in row order (decoded, so approximate for quantized indexes)"""
+    if not index.ntotal:
+        return np.zeros((0, index.d), dtype=np.float32)
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def index_memory_bytes(index):
+    """Size of an index's data structures, which is what it occupies in memory once loaded"""
+    return int(faiss.serialize_index(index).nbytes)
+
+
+def benchmark_index_types(vectors, queries, k, index_types):
+    """Recall@k against an exact flat index, search latency and memory of each index type.
+
+    Returns ``[{index_type, built_as, recall, build_seconds, latencies, memory_bytes}]``
+    with per-query search latencies in seconds.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    queries = np.ascontiguousarray(queries, dtype=np.float32)
+    k = min(k, len(vectors))
+    exact, _ = build_index(vectors, Leader.IndexType.FLAT)
+    _, truth = exact.search(queries, k)
+
+    results = []
+    for index_type in index_types:
+        started = time.perf_counter()
+        index, built_as = build_index(vectors, index_type)
+        build_seconds = time.perf_counter() - started
+
+        latencies, hits = [], 0
+        for query, expected in zip(queries, truth):
+            started = time.perf_counter()
+            _, ids = index.search(query[None, :], k)
+            latencies.append(time.perf_counter() - started)
+            hits += len(set(ids[0].tolist()) & set(expected.tolist()))
+        results.append({
+            'index_type': index_type,
+            'built_as': built_as,
+            'recall': hits / (len(queries) * k) if len(queries) and k else None,
+            'build_seconds': build_seconds,
+            'latencies': latencies,
+            'memory_bytes': index_memory_bytes(index),
+        })
+    return results
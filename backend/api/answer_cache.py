@@ -0,0 +1,134 @@
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+
+
+class CachedAnswer:
+    __slots__ = ('answer', 'citations', 'created_at', 'similarity')
+
+    def __init__(self, answer, citations, created_at, similarity=None):
+        self.answer = answer
+        self.citations = citations
+        self.created_at = created_at
+        self.similarity = similarity
+
+
+class _LeaderAnswers:
+    """Answers for one leader plus a matrix of their question embeddings"""
+
+    def __init__(self, index_version, dimension):
+        self.index_version = index_version
+        self.vectors = np.empty((0, dimension), dtype=np.float32)
+        self.answers = []
+
+    def drop(self, keep):
+        self.vectors = self.vectors[keep]
+        self.answers = [self.answers[i] for i in np.flatnonzero(keep)]
+
+
+class SemanticAnswerCache:
+    """Per-leader cache of chat answers keyed by question embedding.
+
+    A question reuses a prior answer (and its citations) when the cosine
+    similarity of their embeddings reaches ``threshold``. Entries expire
+    after ``ttl`` seconds, each leader keeps at most ``max_entries``, and all
+    of a leader's entries are dropped when its index version changes.
+    """
+
+    def __init__(self, threshold, ttl, max_entries):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._leaders = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def lookup(self, leader_id, index_version, vector):
+        query = self._normalize(vector)
+        with self._lock:
+            answers = self._answers_for(leader_id, index_version, len(query))
+            self._expire(answers)
+            if answers.answers:
+                similarities = answers.vectors @ query
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    self.hits += 1
+                    cached = answers.answers[best]
+                    return CachedAnswer(cached.answer, cached.citations, cached.created_at,
+                                        float(similarities[best]))
+            self.misses += 1
+            return None
+
+    def store(self, leader_id, index_version, vector, answer, citations):
+        vector = self._normalize(vector)
+        with self._lock:
+            answers = self._answers_for(leader_id, index_version, len(vector))
+            self._expire(answers)
+            if len(answers.answers) >= self.max_entries:
+                # Oldest entries go first
+                overflow = len(answers.answers) - self.max_entries + 1
+                keep = np.ones(len(answers.answers), dtype=bool)
+                keep[:overflow] = False
+                answers.drop(keep)
+                self.evictions += overflow
+            answers.vectors = np.vstack([answers.vectors, vector[None, :]])
+            answers.answers.append(CachedAnswer(answer, list(citations), time.time()))
+
+    def invalidate(self, leader_id):
+        with self._lock:
+            if self._leaders.pop(leader_id, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._leaders.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'entries': sum(len(a.answers) for a in self._leaders.values()),
+            }
+
+    def _answers_for(self, leader_id, index_version, dimension):
+        answers = self._leaders.get(leader_id)
+        if answers is not None and (
+            answers.index_version != index_version or answers.vectors.shape[1] != dimension
+        ):
+            # The leader's index was rebuilt; its answers may no longer hold
+            answers = None
+            self.invalidations += 1
+        if answers is None:
+            answers = self._leaders[leader_id] = _LeaderAnswers(index_version, dimension)
+        return answers
+
+    def _expire(self, answers):
+        if not answers.answers:
+            return
+        cutoff = time.time() - self.ttl
+        keep = np.array([a.created_at >= cutoff for a in answers.answers])
+        if not keep.all():
+            self.evictions += int((~keep).sum())
+            answers.drop(keep)
+
+    def _normalize(self, vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+answer_cache = SemanticAnswerCache(
+    threshold=settings.ANSWER_CACHE_THRESHOLD,
+    ttl=settings.ANSWER_CACHE_TTL,
+    max_entries=settings.ANSWER_CACHE_MAX_ENTRIES,
+)
@@ -1,6 +1,16 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from .db import configure_sqlite
+        connection_created.connect(configure_sqlite, dispatch_uid='api.configure_sqlite')
+
+        if settings.EMBEDDING_WARMUP:
+            from .embeddings import embedding_service
+            embedding_service.warm_up(background=True)
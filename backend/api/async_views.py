@@ -0,0 +1,390 @@
+"""Async variants of the chat and suggestions actions.
+
+Served under ASGI (``uvicorn backend_site.asgi:application``) an open token
+stream only holds a coroutine on the event loop instead of a worker thread.
+Blocking work (vector search, embedding) runs in the thread pool; Ollama is
+streamed through the shared pool's async client (``api.llm``) and chats are
+saved with async ORM calls.
+"""
+import functools
+import json
+import logging
+import time
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponseNotAllowed, JsonResponse
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from . import services
+from .history import condense_question
+from .metrics import RequestTimings, atimed_stream
+from .models import Chat, Leader
+from .scheduler import QueueFull, generation_scheduler
+from .streaming import ChatStream, event_stream_response, stream_protocol
+from .suggestions import FollowUpSplitter, parse_follow_ups, parse_suggestions, split_follow_ups
+from .transcripts import transcript_writer
+from .views import (
+    GENERATION_TIMEOUT_MESSAGE, OLLAMA_UNAVAILABLE_MESSAGE, format_citations, with_citations
+)
+
+logger = logging.getLogger(__name__)
+
+
+def async_post_view(view):
+    """csrf_exempt + require_POST for async views (Django 4.2's decorators are sync-only).
+
+    CSRF is still enforced by the JWT cookie authenticator, as for DRF views.
+    """
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method != 'POST':
+            return HttpResponseNotAllowed(['POST'])
+        return await view(request, *args, **kwargs)
+
+    wrapper.csrf_exempt = True
+    return wrapper
+
+
+def _authenticate(request):
+    drf_request = Request(
+        request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+    )
+    return drf_request.user
+
+
+async def _get_user_and_leader(request, pk):
+    """Return (user, leader, error response) for an authenticated request"""
+    try:
+        user = await sync_to_async(_authenticate)(request)
+    except APIException as e:
+        return None, None, JsonResponse({'detail': str(e.detail)}, status=e.status_code)
+    if not user.is_authenticated:
+        return None, None, JsonResponse(
+            {'detail': 'Authentication credentials were not provided.'}, status=401
+        )
+    try:
+        leader = await Leader.objects.aget(pk=pk)
+    except Leader.DoesNotExist:
+        return None, None, JsonResponse({'detail': 'Not found.'}, status=404)
+    return user, leader, None
+
+
+def _queue_full_response(error):
+    response = JsonResponse({'error': str(error), 'retry_after': error.retry_after}, status=429)
+    response['Retry-After'] = str(error.retry_after)
+    return response
+
+
+class GenerationTimeout(Exception):
+    pass
+
+
+async def _generate(user, prompt, timings):
+    """Non-streaming generation once a slot is free"""
+    with generation_scheduler.submit(user.pk) as ticket:
+        with timings.span('queue'):
+            granted = await ticket.wait_async(generation_scheduler.max_wait)
+        if not granted:
+            ticket.release(timed_out=True)
+            raise GenerationTimeout(GENERATION_TIMEOUT_MESSAGE)
+        with timings.span('generation'):
+            return await services.ollama_pool.agenerate(prompt)
+
+
+def _parse_body(request):
+    try:
+        return json.loads(request.body or b'{}')
+    except ValueError:
+        return {}
+
+
+@async_post_view
+async def leader_chat(request, pk):
+    user, leader, error = await _get_user_and_leader(request, pk)
+    if error:
+        return error
+
+    data = _parse_body(request)
+    user_input = data.get('message')
+    session_id = data.get('session_id', str(uuid.uuid4()))
+    is_streaming = data.get('streaming', False)
+    with_suggestions = bool(data.get('suggestions', False))
+    stream = ChatStream(session_id, protocol=stream_protocol(data)) if is_streaming else None
+
+    if not user_input:
+        if is_streaming:
+            return event_stream_response(stream.error('Message is required'), stream.content_type)
+        return JsonResponse({'error': 'Message is required'}, status=400)
+
+    timings = RequestTimings('async_chat_stream' if is_streaming else 'async_chat')
+    with timings.span('route'):
+        decision = services.intent_router.route(user_input, leader)
+    if decision:
+        if is_streaming:
+            return timings.apply(event_stream_response(
+                stream.done(decision.response, route=decision.route), stream.content_type
+            ))
+        return timings.apply(
+            JsonResponse({'response': decision.response, 'session_id': session_id, 'route': decision.route})
+        )
+
+    if is_streaming:
+        # Stage timings go to /metrics; headers are sent before the stages run
+        return event_stream_response(
+            atimed_stream(_stream_chat(user, leader, user_input, session_id, stream, with_suggestions, timings),
+                          timings),
+            stream.content_type
+        )
+
+    try:
+        result = await _answer(user, leader, user_input, session_id, with_suggestions, timings)
+    except QueueFull as e:
+        return timings.apply(_queue_full_response(e))
+    except GenerationTimeout as e:
+        return timings.apply(JsonResponse({'error': str(e)}, status=503))
+    except services.OllamaUnavailable as e:
+        logger.warning("Error in async chat endpoint: %s", e)
+        return timings.apply(JsonResponse({'error': OLLAMA_UNAVAILABLE_MESSAGE}, status=503))
+    except Exception as e:
+        logger.exception("Error in async chat endpoint: %s", e)
+        return timings.apply(JsonResponse(
+            {'error': f'An error occurred while processing your message: {str(e)}'}, status=500
+        ))
+    return timings.apply(JsonResponse(result, status=result.pop('status', 200)))
+
+
+async def _leader_chain(leader, timings):
+    """The leader's compiled chain, loading its store off the event loop"""
+    with timings.span('index_load'):
+        db, index_version = await sync_to_async(
+            services.vector_store_registry.get_versioned, thread_sensitive=False
+        )(leader)
+    if db is None:
+        return None, None
+    return services.chain_factory.get(leader, db, index_version), index_version
+
+
+async def _retrieve(user, leader, user_input, session_id, timings):
+    """Load the leader's chain, condense a follow-up, check the answer cache and relevance.
+
+    Returns ``(chain, index_version, question, question_vector, cached, routed)``.
+    """
+    chain, index_version = await _leader_chain(leader, timings)
+    if chain is None:
+        return None, None, None, None, None, None
+    with timings.span('condense'):
+        question = await sync_to_async(condense_question)(user, leader, session_id, user_input)
+    question_vector = cached = routed = None
+    if settings.ANSWER_CACHE_ENABLED or services.intent_router.min_relevance:
+        with timings.span('embed'):
+            question_vector = await sync_to_async(
+                services.embedding_service.embed_query, thread_sensitive=False
+            )(question)
+    if settings.ANSWER_CACHE_ENABLED:
+        with timings.span('cache_lookup'):
+            cached = services.answer_cache.lookup(leader.id, index_version, question_vector)
+    if not cached:
+        with timings.span('relevance'):
+            routed = await sync_to_async(services.intent_router.check_relevance, thread_sensitive=False)(
+                chain.db, question_vector, leader
+            )
+    return chain, index_version, question, question_vector, cached, routed
+
+
+async def _answer(user, leader, user_input, session_id, with_suggestions, timings):
+    chain, index_version, question, question_vector, cached, routed = await _retrieve(
+        user, leader, user_input, session_id, timings
+    )
+    if chain is None:
+        return {
+            'error': 'Leader knowledge base not found. Please ensure the PDF has been processed.',
+            'status': 404,
+        }
+    if routed:
+        return {'response': routed.response, 'session_id': session_id, 'route': routed.route}
+
+    extra = {}
+    if cached:
+        ai_response, citations = cached.answer, cached.citations
+        extra['cached'] = True
+    else:
+        with timings.span('retrieval'):
+            docs = await sync_to_async(chain.retriever.invoke, thread_sensitive=False)(question)
+        prompt = chain.render_answer_prompt(docs, question, follow_ups=with_suggestions)
+        ai_response = await _generate(user, prompt, timings)
+        if with_suggestions:
+            ai_response, extra['suggestions'] = split_follow_ups(ai_response, leader.name)
+        citations = format_citations(docs)
+        if settings.ANSWER_CACHE_ENABLED:
+            services.answer_cache.store(leader.id, index_version, question_vector, ai_response, citations)
+
+    full_response = with_citations(ai_response, citations)
+    with timings.span('save'):
+        chat = await Chat.objects.acreate(
+            user=user,
+            leader=leader,
+            user_input=user_input,
+            ai_response=full_response,
+            session_id=session_id
+        )
+    return {'response': full_response, 'session_id': session_id, 'chat_id': chat.id, **extra}
+
+
+async def _stream_chat(user, leader, user_input, session_id, stream, with_suggestions, timings):
+    try:
+        chain, index_version, question, question_vector, cached, routed = await _retrieve(
+            user, leader, user_input, session_id, timings
+        )
+        if chain is None:
+            for event in stream.error('Leader knowledge base not found. Please ensure the PDF has been processed.'):
+                yield event
+            return
+        if routed:
+            for event in stream.done(routed.response, route=routed.route):
+                yield event
+            return
+
+        extra = {}
+        if cached:
+            for event in stream.token(cached.answer):
+                yield event
+            full_response, citations = cached.answer, cached.citations
+            extra['cached'] = True
+        else:
+            with timings.span('retrieval'):
+                docs = await sync_to_async(chain.retriever.invoke, thread_sensitive=False)(question)
+            prompt = chain.render_answer_prompt(docs, question, follow_ups=with_suggestions)
+            splitter = FollowUpSplitter() if with_suggestions else None
+            try:
+                ticket = generation_scheduler.submit(user.pk)
+            except QueueFull as e:
+                for event in stream.error(str(e), retry_after=e.retry_after):
+                    yield event
+                return
+            with ticket:
+                # Tell the client its queue position until a slot frees up
+                queued_at = time.perf_counter()
+                deadline = time.monotonic() + generation_scheduler.max_wait
+                last_position = None
+                while not ticket.granted:
+                    position = ticket.position
+                    if position and position != last_position:
+                        for event in stream.queued(position):
+                            yield event
+                        last_position = position
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        ticket.release(timed_out=True)
+                        for event in stream.error(GENERATION_TIMEOUT_MESSAGE):
+                            yield event
+                        return
+                    await ticket.wait_async(min(settings.GENERATION_QUEUE_UPDATE_INTERVAL, remaining))
+                started = time.perf_counter()
+                timings.record('queue', started - queued_at)
+
+                first_token_at, tokens = None, 0
+                async for token in services.ollama_pool.astream(prompt):
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                        timings.record('first_token', first_token_at - started)
+                    tokens += 1
+                    if splitter:
+                        token = splitter.feed(token)
+                    if token:
+                        for event in stream.token(token):
+                            yield event
+                timings.record('generation', time.perf_counter() - started)
+                if first_token_at is not None:
+                    timings.record_token_rate(tokens, time.perf_counter() - first_token_at)
+            if splitter:
+                # The follow-up questions after the answer go out with the final event
+                rest = splitter.finish()
+                if rest:
+                    for event in stream.token(rest):
+                        yield event
+                extra['suggestions'] = parse_follow_ups(splitter.follow_ups, leader.name)
+            full_response = stream.content
+            citations = format_citations(docs)
+            if settings.ANSWER_CACHE_ENABLED:
+                services.answer_cache.store(leader.id, index_version, question_vector, full_response, citations)
+
+        final_response = with_citations(full_response, citations)
+        for event in stream.done(final_response, **extra):
+            yield event
+
+        try:
+            with timings.span('save'):
+                await sync_to_async(transcript_writer.record)(
+                    user=user,
+                    leader=leader,
+                    user_input=user_input,
+                    ai_response=final_response,
+                    session_id=session_id
+                )
+        except Exception as db_error:
+            logger.exception("Error saving chat to DB: %s", db_error)
+
+    except services.OllamaUnavailable as e:
+        logger.warning("Error in async streaming chat endpoint: %s", e)
+        for event in stream.error(OLLAMA_UNAVAILABLE_MESSAGE):
+            yield event
+
+    except Exception as e:
+        logger.exception("Error in async streaming chat endpoint: %s", e)
+        for event in stream.error(f'An error occurred while processing your message: {str(e)}'):
+            yield event
+
+
+@async_post_view
+async def leader_suggestions(request, pk):
+    user, leader, error = await _get_user_and_leader(request, pk)
+    if error:
+        return error
+
+    data = _parse_body(request)
+    latest_user_message = data.get('latest_user_message', '')
+    if not latest_user_message:
+        return JsonResponse({'error': 'latest_user_message is required'}, status=400)
+
+    timings = RequestTimings('async_suggestions')
+    return timings.apply(await _suggestions(user, leader, data, latest_user_message, timings))
+
+
+async def _suggestions(user, leader, data, latest_user_message, timings):
+    try:
+        chain, _ = await _leader_chain(leader, timings)
+        if chain is None:
+            return JsonResponse(
+                {'error': 'Leader knowledge base not found. Please ensure the PDF has been processed.'},
+                status=404
+            )
+        with timings.span('bank'):
+            suggestions = await sync_to_async(services.suggestion_banks.suggest)(
+                leader, user, data.get('session_id'), latest_user_message
+            )
+        if suggestions:
+            return JsonResponse({'suggestions': suggestions, 'source': 'bank'})
+        with timings.span('retrieval'):
+            docs = await sync_to_async(chain.retriever.invoke, thread_sensitive=False)(latest_user_message)
+        prompt = chain.render_suggestion_prompt(
+            "\n".join(doc.page_content for doc in docs[:3]), latest_user_message
+        )
+        result = await _generate(user, prompt, timings)
+        return JsonResponse({'suggestions': parse_suggestions(result, leader.name), 'source': 'llm'})
+
+    except QueueFull as e:
+        return _queue_full_response(e)
+    except GenerationTimeout as e:
+        return JsonResponse({'error': str(e)}, status=503)
+    except services.OllamaUnavailable as e:
+        logger.warning("Error in async suggestions endpoint: %s", e)
+        return JsonResponse({'error': OLLAMA_UNAVAILABLE_MESSAGE}, status=503)
+    except Exception as e:
+        logger.exception("Error in async suggestions endpoint: %s", e)
+        return JsonResponse(
+            {'error': f'An error occurred while generating suggestions: {str(e)}'}, status=500
+        )
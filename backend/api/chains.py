@@ -0,0 +1,162 @@
+import threading
+import time
+
+from langchain.chains import create_retrieval_chain
+from langchain.chains.combine_documents import create_stuff_documents_chain
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.prompts import ChatPromptTemplate
+
+from .llm import ollama_llm
+from .prompts import ANSWER_PROMPT_TEMPLATE, FOLLOW_UP_INSTRUCTIONS, SUGGESTION_PROMPT_TEMPLATE
+from .retrieval import build_retriever
+from .vectorstore import vector_store_registry
+
+
+class StageTimingCallback(BaseCallbackHandler):
+    """Records a chain run's retrieval, time to first token and generation as ``timings`` spans"""
+
+    def __init__(self, timings):
+        self.timings = timings
+        self._started = {}
+        self._first_token = None
+        self._tokens = 0
+
+    def on_retriever_start(self, serialized, query, *, run_id, **kwargs):
+        self._started[run_id] = time.perf_counter()
+
+    def on_retriever_end(self, documents, *, run_id, **kwargs):
+        self._finish('retrieval', run_id)
+
+    def on_retriever_error(self, error, *, run_id, **kwargs):
+        self._started.pop(run_id, None)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._started[run_id] = time.perf_counter()
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        if self._first_token is None and run_id in self._started:
+            self._first_token = time.perf_counter()
+            self.timings.record('first_token', self._first_token - self._started[run_id])
+        self._tokens += 1
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        if self._finish('generation', run_id) and self._first_token is not None:
+            self.timings.record_token_rate(self._tokens, time.perf_counter() - self._first_token)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._started.pop(run_id, None)
+
+    def _finish(self, stage, run_id):
+        started = self._started.pop(run_id, None)
+        if started is not None:
+            self.timings.record(stage, time.perf_counter() - started)
+        return started is not None
+
+
+class LeaderChain:
+    """Prompts, retriever and chains compiled for one leader's vector store"""
+
+    def __init__(self, db, llm, retriever, answer_template, config):
+        started = time.perf_counter()
+        self.db = db
+        self.llm = llm
+        self.config = config
+        self.prompt = ChatPromptTemplate.from_template(answer_template)
+        self.fused_prompt = ChatPromptTemplate.from_template(FOLLOW_UP_INSTRUCTIONS + answer_template)
+        self._fused_retrieval_chain = None
+        self.retriever = retriever
+        self.retrieval_chain = create_retrieval_chain(
+            self.retriever, create_stuff_documents_chain(llm, self.prompt)
+        )
+        self.suggestion_prompt = ChatPromptTemplate.from_template(SUGGESTION_PROMPT_TEMPLATE)
+        self.suggestion_chain = self.suggestion_prompt | llm
+        self.build_seconds = time.perf_counter() - started
+
+    @property
+    def fused_retrieval_chain(self):
+        """Retrieval chain whose answers end with follow-up questions (built on first use)"""
+        if self._fused_retrieval_chain is None:
+            self._fused_retrieval_chain = create_retrieval_chain(
+                self.retriever, create_stuff_documents_chain(self.llm, self.fused_prompt)
+            )
+        return self._fused_retrieval_chain
+
+    def render_answer_prompt(self, docs, question, follow_ups=False):
+        """The prompt string the retrieval chain would send for ``docs``"""
+        prompt = self.fused_prompt if follow_ups else self.prompt
+        return prompt.format_prompt(
+            context="\n\n".join(doc.page_content for doc in docs),
+            input=question
+        ).to_string()
+
+    @staticmethod
+    def run_config(timings):
+        """Chain run config that records its stages in ``timings``"""
+        return {'callbacks': [StageTimingCallback(timings)]}
+
+    def render_suggestion_prompt(self, context, latest_user_message):
+        return self.suggestion_prompt.format_prompt(
+            context=context,
+            latest_user_message=latest_user_message
+        ).to_string()
+
+
+class ChainFactory:
+    """Per-leader cache of compiled chains.
+
+    A leader's chain is reused while its vector store object, index version
+    and retrieval settings (``retrieval_k``, ``retrieval_mode``,
+    ``rerank_top_n``, ``answer_prompt``) stay the same, and is rebuilt on the
+    first request after any of them changes. Chains are dropped together with
+    their store when it leaves the vector store registry.
+    """
+
+    def __init__(self, llm):
+        self.llm = llm
+        self._chains = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.builds = 0
+        self.build_seconds = 0.0
+
+    def get(self, leader, db, index_version):
+        config = (
+            index_version, leader.retrieval_k, leader.answer_prompt or ANSWER_PROMPT_TEMPLATE,
+            leader.retrieval_mode, leader.rerank_top_n,
+        )
+        with self._lock:
+            chain = self._chains.get(leader.id)
+            if chain is not None and chain.db is db and chain.config == config:
+                self.hits += 1
+                return chain
+
+        retriever = build_retriever(leader, db, index_version)
+        chain = LeaderChain(db, self.llm, retriever, config[2], config)
+        with self._lock:
+            self._chains[leader.id] = chain
+            self.builds += 1
+            self.build_seconds += chain.build_seconds
+        return chain
+
+    def invalidate(self, leader_id):
+        with self._lock:
+            self._chains.pop(leader_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._chains.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.builds
+            return {
+                'hits': self.hits,
+                'builds': self.builds,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': len(self._chains),
+                'build_seconds_avg': self.build_seconds / self.builds if self.builds else 0.0,
+            }
+
+
+chain_factory = ChainFactory(ollama_llm)
+vector_store_registry.add_listener(chain_factory.invalidate)
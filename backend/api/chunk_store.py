@@ -0,0 +1,83 @@
+"""Content-addressed store of chunk texts and their embeddings.
+
+Chunks are keyed by the SHA-256 of their text and the embedding model, so
+each distinct chunk is embedded once however many documents (or leaders)
+contain it and however often their indexes are updated.
+"""
+import hashlib
+
+import numpy as np
+
+from .models import ChunkEmbedding
+
+# Keeps IN (...) lookups under SQLite's variable limit
+LOOKUP_BATCH_SIZE = 500
+
+
+def chunk_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def file_hash(field_file):
+    """SHA-256 of an uploaded file's contents"""
+    digest = hashlib.sha256()
+    field_file.open('rb')
+    try:
+        for block in field_file.chunks():
+            digest.update(block)
+    finally:
+        field_file.close()
+    return digest.hexdigest()
+
+
+def _batches(items):
+    for start in range(0, len(items), LOOKUP_BATCH_SIZE):
+        yield items[start:start + LOOKUP_BATCH_SIZE]
+
+
+def stored_hashes(embedding_model, hashes):
+    """The subset of ``hashes`` already embedded with ``embedding_model``"""
+    found = set()
+    for batch in _batches(list(set(hashes))):
+        found.update(ChunkEmbedding.objects.filter(
+            embedding_model=embedding_model, content_hash__in=batch
+        ).values_list('content_hash', flat=True))
+    return found
+
+
+def store_chunks(embedding_model, texts, vectors):
+    """Save chunk texts with their embeddings (existing entries are left alone)"""
+    ChunkEmbedding.objects.bulk_create(
+        [
+            ChunkEmbedding(
+                content_hash=chunk_hash(text), embedding_model=embedding_model, text=text,
+                vector=np.asarray(vector, dtype=np.float32).tobytes(),
+            )
+            for text, vector in zip(texts, vectors)
+        ],
+        batch_size=LOOKUP_BATCH_SIZE, ignore_conflicts=True,
+    )
+
+
+def load_vectors(embedding_model, hashes):
+    """Float32 matrix of the embeddings of ``hashes``, in their order"""
+    rows = {}
+    for batch in _batches(list(set(hashes))):
+        rows.update(ChunkEmbedding.objects.filter(
+            embedding_model=embedding_model, content_hash__in=batch
+        ).values_list('content_hash', 'vector'))
+    missing = [h for h in hashes if h not in rows]
+    if missing:
+        raise KeyError(f"{len(missing)} chunk(s) have no {embedding_model} embedding")
+    return np.stack([np.frombuffer(rows[h], dtype=np.float32) for h in hashes])
+
+
+def chunk_texts(hashes):
+    """Texts of ``hashes`` in their order, from entries of any embedding model"""
+    rows = {}
+    for batch in _batches(list(set(hashes))):
+        rows.update(ChunkEmbedding.objects.filter(content_hash__in=batch).values_list('content_hash', 'text'))
+    missing = [h for h in hashes if h not in rows]
+    if missing:
+        raise KeyError(f"{len(missing)} chunk(s) missing from the chunk store")
+    return [rows[h] for h in hashes]
@@ -0,0 +1,22 @@
+from django.conf import settings
+
+JOURNAL_MODES = {'DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF'}
+SYNCHRONOUS_MODES = {'OFF', 'NORMAL', 'FULL', 'EXTRA'}
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """Tune each new SQLite connection for concurrent readers and writers.
+
+    The busy timeout is set through the connection's ``timeout`` option.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    journal_mode = settings.SQLITE_JOURNAL_MODE.upper()
+    synchronous = settings.SQLITE_SYNCHRONOUS.upper()
+    if journal_mode not in JOURNAL_MODES:
+        raise ValueError(f"Unknown SQLITE_JOURNAL_MODE {settings.SQLITE_JOURNAL_MODE!r}")
+    if synchronous not in SYNCHRONOUS_MODES:
+        raise ValueError(f"Unknown SQLITE_SYNCHRONOUS {settings.SQLITE_SYNCHRONOUS!r}")
+    with connection.cursor() as cursor:
+        cursor.execute(f'PRAGMA journal_mode={journal_mode}')
+        cursor.execute(f'PRAGMA synchronous={synchronous}')
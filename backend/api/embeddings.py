@@ -0,0 +1,345 @@
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+
+class _LatencyStats:
+    __slots__ = ('calls', 'texts', 'total_seconds', 'max_seconds')
+
+    def __init__(self):
+        self.calls = 0
+        self.texts = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def record(self, texts, seconds):
+        self.calls += 1
+        self.texts += texts
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+
+    def as_dict(self):
+        return {
+            'calls': self.calls,
+            'texts': self.texts,
+            'total_seconds': self.total_seconds,
+            'avg_seconds': self.total_seconds / self.calls if self.calls else 0.0,
+            'max_seconds': self.max_seconds,
+        }
+
+
+def normalize_query(text, casefold=True):
+    """Cache key for a query: NFC, collapsed whitespace and (by default) case-folded"""
+    text = re.sub(r'\s+', ' ', unicodedata.normalize('NFC', text)).strip()
+    return text.casefold() if casefold else text
+
+
+def tokenizer_config(model_name):
+    """A model's ``tokenizer_config.json``, from its directory or the Hugging Face
+    cache (never the network or the model itself), or None if it isn't there"""
+    from .fake_embeddings import WordTokenizer, is_fake_embedding_model
+
+    if is_fake_embedding_model(model_name):
+        return {'do_lower_case': WordTokenizer.do_lower_case}
+    path = os.path.join(model_name, 'tokenizer_config.json')
+    if not os.path.isdir(model_name):
+        from huggingface_hub import try_to_load_from_cache
+
+        # sentence-transformers resolves bare names in its own namespace
+        repo_id = model_name if '/' in model_name else f'sentence-transformers/{model_name}'
+        path = try_to_load_from_cache(repo_id, 'tokenizer_config.json')
+        if not isinstance(path, str):
+            return None
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class QueryEmbeddingCache:
+    """LRU cache of query embeddings, optionally backed by a local sqlite file.
+
+    The in-memory LRU holds ``max_entries`` vectors. With a ``path`` every new
+    embedding is also written to sqlite, so the cache survives restarts;
+    memory misses fall through to it before the model is called.
+    """
+
+    def __init__(self, model_name, max_entries, path=None):
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.path = path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._writes = 0
+        self.hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_many(self, keys):
+        """Return ``{key: vector}`` for the cached keys among ``keys``"""
+        found = {}
+        with self._lock:
+            for key in keys:
+                vector = self._entries.get(key)
+                if vector is not None:
+                    self._entries.move_to_end(key)
+                    found[key] = vector
+        missing = [key for key in keys if key not in found]
+        if missing and self.path:
+            stored = self._db_get(missing)
+            with self._lock:
+                for key, vector in stored.items():
+                    self._remember(key, vector)
+                self.persistent_hits += len(stored)
+            found.update(stored)
+        with self._lock:
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, items):
+        with self._lock:
+            for key, vector in items.items():
+                self._remember(key, vector)
+        if self.path:
+            self._db_put(items)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'persistent_hits': self.persistent_hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'persistent': bool(self.path),
+            }
+
+    def _remember(self, key, vector):
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS query_embeddings ('
+                ' model TEXT NOT NULL, query TEXT NOT NULL, vector BLOB NOT NULL,'
+                ' used_at REAL NOT NULL, PRIMARY KEY (model, query))'
+            )
+            self._local.connection = connection
+        return connection
+
+    def _db_get(self, keys):
+        try:
+            connection = self._connection()
+            placeholders = ','.join('?' * len(keys))
+            rows = connection.execute(
+                f'SELECT query, vector FROM query_embeddings WHERE model = ? AND query IN ({placeholders})',
+                [self.model_name, *keys]
+            ).fetchall()
+            if rows:
+                with connection:
+                    connection.executemany(
+                        'UPDATE query_embeddings SET used_at = ? WHERE model = ? AND query = ?',
+                        [(time.time(), self.model_name, query) for query, _ in rows]
+                    )
+            return {query: np.frombuffer(blob, dtype=np.float32) for query, blob in rows}
+        except sqlite3.Error as e:
+            logger.warning("Error reading query embedding cache: %s", e)
+            return {}
+
+    def _db_put(self, items):
+        try:
+            connection = self._connection()
+            now = time.time()
+            with connection:
+                connection.executemany(
+                    'INSERT OR REPLACE INTO query_embeddings (model, query, vector, used_at) VALUES (?, ?, ?, ?)',
+                    [(self.model_name, key, vector.astype(np.float32).tobytes(), now)
+                     for key, vector in items.items()]
+                )
+                self._writes += len(items)
+                # Keep the persistent store bounded to ~10x the memory cache
+                if self._writes >= self.max_entries:
+                    self._writes = 0
+                    connection.execute(
+                        'DELETE FROM query_embeddings WHERE rowid IN ('
+                        ' SELECT rowid FROM query_embeddings ORDER BY used_at DESC LIMIT -1 OFFSET ?)',
+                        [self.max_entries * 10]
+                    )
+        except sqlite3.Error as e:
+            logger.warning("Error writing query embedding cache: %s", e)
+
+
+class EmbeddingService(Embeddings):
+    """Process-wide sentence-transformers model shared by ingestion and retrieval.
+
+    The model is loaded on first use (or by ``warm_up``) and reused for every
+    leader, so neither indexing nor queries pay model construction cost.
+    """
+
+    def __init__(self, model_name, batch_size, query_cache=None):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.query_cache = query_cache
+        self.load_seconds = None
+        self._embeddings = None
+        self._lowercases_input = None
+        self._load_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._latency = {'documents': _LatencyStats(), 'queries': _LatencyStats()}
+
+    @property
+    def loaded(self):
+        return self._embeddings is not None
+
+    @property
+    def tokenizer(self):
+        return self._model().client.tokenizer
+
+    @property
+    def lowercases_input(self):
+        """Whether the model lower-cases text first (all-mpnet-base-v2 does), so case doesn't change a vector.
+
+        Read from the tokenizer config, so cache lookups don't load the model.
+        Until that can be told (no config yet and the model not loaded), False:
+        keys that keep their case only miss more often.
+        """
+        if self._lowercases_input is None:
+            if self.loaded:
+                self._lowercases_input = bool(getattr(self.tokenizer, 'do_lower_case', False))
+            else:
+                config = tokenizer_config(self.model_name)
+                if config is None:
+                    return False
+                self._lowercases_input = bool(config.get('do_lower_case', False))
+        return self._lowercases_input
+
+    def warm_up(self, background=False):
+        """Load the model now instead of on the first request"""
+        if background:
+            threading.Thread(target=self._warm_up, name='embedding-warmup', daemon=True).start()
+        else:
+            self._model()
+
+    def _warm_up(self):
+        try:
+            self._model()
+        except Exception as e:
+            logger.exception("Error warming up embedding model %s: %s", self.model_name, e)
+
+    def embed_documents(self, texts):
+        return self._embed('documents', texts)
+
+    def embed_queries(self, texts):
+        """Embed several queries in one batched forward pass.
+
+        Queries are looked up in the query cache first; only the misses
+        reach the model, as the text that was asked. Keys are case-folded
+        only for models that lower-case their input anyway.
+        """
+        if self.query_cache is None:
+            return self._embed('queries', texts)
+
+        keys = [normalize_query(text, casefold=self.lowercases_input) for text in texts]
+        originals = {}
+        for key, text in zip(keys, texts):
+            originals.setdefault(key, text)
+        found = self.query_cache.get_many(list(originals))
+        missing = [key for key in originals if key not in found]
+        if missing:
+            computed = {
+                key: np.asarray(vector, dtype=np.float32)
+                for key, vector in zip(missing, self._embed('queries', [originals[key] for key in missing]))
+            }
+            self.query_cache.put_many(computed)
+            found.update(computed)
+        return [found[key].tolist() for key in keys]
+
+    def embed_query(self, text):
+        return self.embed_queries([text])[0]
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'model_name': self.model_name,
+                'loaded': self.loaded,
+                'load_seconds': self.load_seconds,
+                'query_cache': self.query_cache.stats() if self.query_cache else None,
+                **{kind: latency.as_dict() for kind, latency in self._latency.items()},
+            }
+
+    def _embed(self, kind, texts):
+        texts = list(texts)
+        if not texts:
+            return []
+        model = self._model()
+        started = time.perf_counter()
+        vectors = model.embed_documents(texts)
+        elapsed = time.perf_counter() - started
+        with self._stats_lock:
+            self._latency[kind].record(len(texts), elapsed)
+        return vectors
+
+    def _model(self):
+        if self._embeddings is None:
+            with self._load_lock:
+                if self._embeddings is None:
+                    from .fake_embeddings import HashingEmbeddings, is_fake_embedding_model
+
+                    started = time.perf_counter()
+                    if is_fake_embedding_model(self.model_name):
+                        embeddings = HashingEmbeddings.from_model_name(self.model_name)
+                    else:
+                        from langchain_community.embeddings import HuggingFaceEmbeddings
+
+                        embeddings = HuggingFaceEmbeddings(
+                            model_name=self.model_name,
+                            encode_kwargs={
+                                "normalize_embeddings": True,
+                                "batch_size": self.batch_size,
+                            }
+                        )
+                    self.load_seconds = time.perf_counter() - started
+                    self._embeddings = embeddings
+                    logger.info("Loaded embedding model %s in %.2fs", self.model_name, self.load_seconds)
+        return self._embeddings
+
+
+embedding_service = EmbeddingService(
+    model_name=settings.EMBEDDING_MODEL_NAME,
+    batch_size=settings.INGESTION_EMBED_BATCH_SIZE,
+    query_cache=QueryEmbeddingCache(
+        model_name=settings.EMBEDDING_MODEL_NAME,
+        max_entries=settings.QUERY_EMBEDDING_CACHE_SIZE,
+        path=settings.QUERY_EMBEDDING_CACHE_PATH or None,
+    ) if settings.QUERY_EMBEDDING_CACHE_SIZE else None,
+)
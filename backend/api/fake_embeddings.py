@@ -0,0 +1,65 @@
+"""A deterministic stand-in for the sentence-transformers model, for offline runs.
+
+Set ``EMBEDDING_MODEL_NAME`` to ``fake-hashing`` (or ``fake-hashing-<dimensions>``)
+and the embedding service uses ``HashingEmbeddings`` instead of downloading a
+model: no torch, no network, and the same vector for the same text on every
+machine, so benchmark runs can be compared.
+"""
+import hashlib
+import re
+from types import SimpleNamespace
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+FAKE_EMBEDDING_PREFIX = 'fake-hashing'
+FAKE_EMBEDDING_MODEL = f'{FAKE_EMBEDDING_PREFIX}-384'
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def is_fake_embedding_model(model_name):
+    return model_name.startswith(FAKE_EMBEDDING_PREFIX)
+
+
+class WordTokenizer:
+    """Lowercased word tokens; ``encode`` mirrors a Hugging Face tokenizer's for chunk sizing"""
+
+    do_lower_case = True
+
+    def encode(self, text):
+        return TOKEN_PATTERN.findall(text.lower())
+
+
+class HashingEmbeddings(Embeddings):
+    """Signed feature hashing of a text's words, L2-normalised.
+
+    Texts that share words get similar vectors, so retrieval, the answer
+    cache and the suggestion bank behave much as they do with a real model.
+    """
+
+    def __init__(self, dimensions=384):
+        self.dimensions = dimensions
+        self.tokenizer = WordTokenizer()
+        # Same shape as HuggingFaceEmbeddings, whose tokenizer sizes ingestion chunks
+        self.client = SimpleNamespace(tokenizer=self.tokenizer)
+
+    @classmethod
+    def from_model_name(cls, model_name):
+        suffix = model_name[len(FAKE_EMBEDDING_PREFIX):].lstrip('-')
+        return cls(int(suffix)) if suffix.isdigit() else cls()
+
+    def _vector(self, text):
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for token in self.tokenizer.encode(text) or ['']:
+            digest = hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest()
+            index = int.from_bytes(digest[:4], 'little') % self.dimensions
+            vector[index] += 1.0 if digest[4] & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._vector(text)
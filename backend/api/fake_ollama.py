@@ -0,0 +1,154 @@
+"""A stand-in for the Ollama HTTP API, for local development and tests.
+
+Implements ``/api/tags`` and ``/api/generate`` (streamed NDJSON or a single
+JSON response) with a configurable time to first token and token rate, so
+the chat endpoints can be exercised without a GPU or a downloaded model.
+"""
+import json
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_RESPONSE = (
+    "According to the provided documents, he devoted his life to the independence "
+    "movement and is remembered for his leadership, his writing and his speeches."
+)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/api/tags':
+            self._send_json({'models': [{'name': self.server.model, 'model': self.server.model}]})
+        elif self.path.rstrip('/') == '/api/version':
+            self._send_json({'version': 'fake'})
+        else:
+            self._send_json({'error': 'not found'}, status=404)
+
+    def do_POST(self):
+        if self.path.rstrip('/') != '/api/generate':
+            self._send_json({'error': 'not found'}, status=404)
+            return
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            self._send_json({'error': 'invalid JSON body'}, status=400)
+            return
+        if body.get('model') not in (self.server.model, f"{self.server.model}:latest"):
+            self._send_json({'error': f"model '{body.get('model')}' not found"}, status=404)
+            return
+
+        self.server.record(body)
+        tokens = self.server.tokens_for(body.get('prompt', ''))
+        time.sleep(self.server.first_token_delay)
+        if not body.get('stream', True):
+            time.sleep(len(tokens) * self.server.token_interval)
+            self._send_json(self._final({'response': ''.join(tokens)}, tokens))
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        try:
+            for i, token in enumerate(tokens):
+                if i:
+                    time.sleep(self.server.token_interval)
+                self._write_chunk({'model': self.server.model, 'response': token, 'done': False})
+            self._write_chunk(self._final({'response': ''}, tokens))
+            self.wfile.write(b'0\r\n\r\n')
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _final(self, data, tokens):
+        return {'model': self.server.model, **data, 'done': True, 'eval_count': len(tokens)}
+
+    def _write_chunk(self, data):
+        line = (json.dumps(data) + '\n').encode('utf-8')
+        self.wfile.write(b'%x\r\n%s\r\n' % (len(line), line))
+        self.wfile.flush()
+
+    def _send_json(self, data, status=200):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class FakeOllamaServer(ThreadingHTTPServer):
+    """Fake Ollama listening on ``host:port`` (port 0 picks a free one).
+
+    Every generate request answers with ``response`` split into word tokens,
+    sent ``first_token_delay`` seconds after the request and then at
+    ``tokens_per_second``. ``requests`` keeps the received payloads.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=11434, model='qwen2.5', response=DEFAULT_RESPONSE,
+                 tokens_per_second=50.0, first_token_delay=0.0):
+        super().__init__((host, port), _Handler)
+        self.model = model
+        self.response = response
+        self.token_interval = 1.0 / tokens_per_second if tokens_per_second else 0.0
+        self.first_token_delay = first_token_delay
+        self.requests = []
+        self._lock = threading.Lock()
+        self._thread = None
+        self._connections = set()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def tokens_for(self, prompt):
+        words = self.response.split(' ')
+        return [word + ' ' for word in words[:-1]] + words[-1:]
+
+    def record(self, body):
+        with self._lock:
+            self.requests.append(body)
+
+    def process_request(self, request, client_address):
+        with self._lock:
+            self._connections.add(request)
+        super().process_request(request, client_address)
+
+    def shutdown_request(self, request):
+        with self._lock:
+            self._connections.discard(request)
+        super().shutdown_request(request)
+
+    def handle_error(self, request, client_address):
+        # Clients hanging up mid-stream is expected
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    def start(self):
+        """Serve from a daemon thread; returns the server"""
+        self._thread = threading.Thread(target=self.serve_forever, name='fake-ollama', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving and drop open keep-alive connections, like a dead replica"""
+        self.shutdown()
+        with self._lock:
+            connections = list(self._connections)
+        for connection in connections:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        self.server_close()
@@ -0,0 +1,76 @@
+import re
+
+from django.conf import settings
+
+from .models import Chat
+
+# Words that only make sense with earlier turns ("what happened after that?")
+FOLLOW_UP_PATTERN = re.compile(
+    r"\b(he|him|his|she|her|hers|they|them|their|theirs|it|its|that|this|those|these|"
+    r"there|then|after|before|later|earlier|also|else|more|same|other|another)\b",
+    re.IGNORECASE
+)
+LEADING_CONNECTIVE_PATTERN = re.compile(r"^\s*(and|but|so|or|what about|how about|then)\b", re.IGNORECASE)
+PROPER_NOUN_PATTERN = re.compile(r"(?<!^)(?<![.?!]\s)\b[A-Z][a-z]+")
+
+
+def estimate_tokens(text):
+    """Rough LLM token count (about four characters per token)"""
+    return (len(text) + 3) // 4
+
+
+def is_self_contained(question, leader_name=''):
+    """Heuristic: can ``question`` be retrieved for without earlier turns?"""
+    if LEADING_CONNECTIVE_PATTERN.search(question):
+        return False
+    names_entity = bool(PROPER_NOUN_PATTERN.search(question.strip())) or (
+        leader_name and leader_name.lower() in question.lower()
+    )
+    if names_entity:
+        return True
+    if FOLLOW_UP_PATTERN.search(question):
+        return False
+    return len(question.split()) > 3
+
+
+def recent_questions(user, leader, session_id, turns):
+    """The session's last ``turns`` user messages, oldest first.
+
+    Served by the (session_id, leader, user, timestamp) index and reads only
+    the question column, not the answers.
+    """
+    questions = list(
+        Chat.objects.filter(session_id=session_id, leader=leader, user=user)
+        .order_by('-timestamp')
+        .values_list('user_input', flat=True)[:turns]
+    )
+    questions.reverse()
+    return questions
+
+
+def condense_question(user, leader, session_id, question):
+    """Standalone form of ``question`` for retrieval, caching and answering.
+
+    A follow-up gets the session's previous questions appended as context,
+    newest first, within ``CHAT_HISTORY_TOKEN_BUDGET`` tokens. Self-contained
+    questions (and first turns) are returned unchanged, without a query.
+    """
+    turns = settings.CHAT_HISTORY_TURNS
+    if not turns or not session_id or is_self_contained(question, leader.name):
+        return question
+
+    budget = settings.CHAT_HISTORY_TOKEN_BUDGET
+    context = []
+    for previous in reversed(recent_questions(user, leader, session_id, turns)):
+        previous = ' '.join(previous.split())
+        cost = estimate_tokens(previous) + 1
+        if cost > budget:
+            if not context:
+                # Keep the head of an overly long previous question
+                context.append(previous[:budget * 4].rstrip())
+            break
+        context.append(previous)
+        budget -= cost
+    if not context:
+        return question
+    return f"{question.strip()} (following up on: {' / '.join(context)})"
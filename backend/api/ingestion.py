@@ -0,0 +1,487 @@
+import logging
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import IngestionJob, Leader, LeaderDocument
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_leader_ingestion(leader):
+    """Queue an update of a leader's index from its documents; returns the job (existing or new).
+
+    A job that is already running may have listed the documents before this
+    change, so only a queued one is reused.
+    """
+    queued = IngestionJob.objects.filter(leader=leader, status=IngestionJob.Status.QUEUED).first()
+    if queued:
+        return queued
+
+    job = IngestionJob.objects.create(
+        leader=leader,
+        max_attempts=settings.INGESTION_MAX_ATTEMPTS
+    )
+    Leader.objects.filter(id=leader.id).update(
+        index_status=Leader.IndexStatus.QUEUED, index_progress=0, index_error=''
+    )
+    if settings.INGESTION_RUN_IN_PROCESS:
+        # Wake the local pool once the job row is visible to its threads
+        transaction.on_commit(lambda: ingestion_pool.start().wake())
+    return job
+
+
+def split_into_chunks(documents, tokenizer):
+    """Split page documents into overlapping chunks measured in model tokens.
+
+    ``tokenizer`` is the embedding model's (anything with ``encode``). Each
+    chunk keeps its page's metadata (source, page number).
+    """
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    splitter = RecursiveCharacterTextSplitter(
+        length_function=lambda text: len(tokenizer.encode(text)),
+        chunk_size=settings.INGESTION_CHUNK_TOKENS,
+        chunk_overlap=settings.INGESTION_CHUNK_OVERLAP,
+    )
+    chunks = splitter.split_documents(documents)
+    for i, chunk in enumerate(chunks):
+        chunk.metadata['chunk'] = i
+    return chunks
+
+
+def embed_in_batches(embeddings, texts, batch_size, progress=None):
+    """Embed texts in batches of similar length to minimise padding.
+
+    Vectors are returned in the original order of ``texts``.
+    """
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    vectors = [None] * len(texts)
+    for start in range(0, len(order), batch_size):
+        batch = order[start:start + batch_size]
+        for i, vector in zip(batch, embeddings.embed_documents([texts[i] for i in batch])):
+            vectors[i] = vector
+        if progress:
+            progress(min(start + batch_size, len(order)), len(order))
+    return vectors
+
+
+def parse_pdf(path, progress=None):
+    """Page documents of a PDF; ``progress(done, total)`` is called per page"""
+    from langchain_community.document_loaders import PyPDFLoader
+    from pypdf import PdfReader
+
+    total_pages = max(len(PdfReader(path).pages), 1)
+    pages = []
+    for page in PyPDFLoader(path).lazy_load():
+        pages.append(page)
+        if progress:
+            progress(len(pages), total_pages)
+    return pages
+
+
+def import_leader_index(leader, directory, manifest):
+    """Record an index built before documents were tracked as one of the leader's documents.
+
+    Its chunks go into the chunk store with their existing vectors, so later
+    updates keep them without the (long deleted) PDF.
+    """
+    from .ann_index import stored_vectors
+    from .chunk_store import chunk_hash, store_chunks
+    from .leader_index import open_leader_index
+
+    db = open_leader_index(directory)
+    records = [db.docstore.search(row) for row in range(db.index.ntotal)]
+    texts = [record.page_content for record in records]
+    store_chunks(manifest['embedding_model'], texts, stored_vectors(db.index))
+    hashes = [chunk_hash(text) for text in texts]
+    content_hash = chunk_hash(''.join(hashes))
+    # A retried job may have imported it already
+    existing = LeaderDocument.objects.filter(leader=leader, content_hash=content_hash).first()
+    return existing or LeaderDocument.objects.create(
+        leader=leader,
+        title=f"Imported index ({manifest['created_at']})",
+        content_hash=content_hash,
+        chunks=[{'hash': h, 'metadata': record.metadata} for h, record in zip(hashes, records)],
+        indexed_at=timezone.now(),
+    )
+
+
+def build_leader_index(leader, report):
+    """Bring a leader's FAISS index up to date with its documents.
+
+    New and replaced documents are parsed and chunked, and only chunks the
+    chunk store has no embedding for are embedded. When documents were only
+    added, their vectors are appended to the existing index; otherwise (or
+    when the leader's ``index_type`` now resolves to another type) the index
+    is assembled again from stored vectors. A file identical to one already
+    indexed is dropped, leaving the index untouched.
+
+    ``report(status, progress)`` is called as the pipeline moves through its
+    stages. Returns a dict of ingestion stats.
+    """
+    import faiss
+    from langchain_core.documents import Document
+
+    from .ann_index import build_index, configure_search, resolve_index_type
+    from .answer_cache import answer_cache
+    from .chunk_store import chunk_hash, chunk_texts, file_hash, load_vectors, stored_hashes, store_chunks
+    from .embeddings import embedding_service
+    from .leader_index import leader_index_dir, read_manifest, write_leader_index
+    from .retrieval import write_keyword_index
+    from .vectorstore import vector_store_registry
+
+    if leader.pkl_file_path and not leader.index_path:
+        raise ValueError(f"{leader.name} has a pickled index; run convert_leader_indexes first")
+    if settings.INGESTION_TORCH_THREADS:
+        import torch
+        torch.set_num_threads(settings.INGESTION_TORCH_THREADS)
+
+    model_name = embedding_service.model_name
+    relative_path = leader.index_path or leader_index_dir(leader.name)
+    index_dir = os.path.join(settings.MEDIA_ROOT, relative_path)
+    manifest = read_manifest(index_dir) if leader.index_path else None
+    if manifest is not None and manifest.get('sources') is None:
+        import_leader_index(leader, index_dir, manifest)
+    started = time.perf_counter()
+
+    # Documents whose file is new or was replaced since it was chunked
+    report(Leader.IndexStatus.PARSING, 0)
+    digests = [
+        (document, file_hash(document.file) if document.file else document.content_hash)
+        for document in LeaderDocument.objects.filter(leader=leader)
+    ]
+    # Changed documents are compared with every unchanged one, wherever it comes in the order
+    seen = {digest for document, digest in digests if digest and digest == document.content_hash}
+    documents, changed, duplicates = [], [], 0
+    for document, digest in digests:
+        if digest != document.content_hash:
+            if digest in seen:
+                # The same file uploaded again
+                document.delete()
+                duplicates += 1
+                continue
+            changed.append((document, digest))
+            seen.add(digest)
+        documents.append(document)
+
+    # Parse and chunk them
+    parse_seconds = chunk_seconds = 0.0
+    pages = 0
+    new_texts = {}
+    for i, (document, digest) in enumerate(changed):
+        stage = time.perf_counter()
+        parsed = parse_pdf(
+            document.file.path,
+            lambda done, total: report(Leader.IndexStatus.PARSING, int(20 * (i + done / total) / len(changed)))
+        )
+        if not parsed:
+            raise ValueError(f"No documents found in {document} for {leader.name}")
+        pages += len(parsed)
+        parse_seconds += time.perf_counter() - stage
+        stage = time.perf_counter()
+        chunks = split_into_chunks(parsed, embedding_service.tokenizer)
+        chunk_seconds += time.perf_counter() - stage
+        document.content_hash = digest
+        document.chunks = []
+        for chunk in chunks:
+            h = chunk_hash(chunk.page_content)
+            new_texts[h] = chunk.page_content
+            document.chunks.append({'hash': h, 'metadata': chunk.metadata})
+
+    # Embed the chunks the store has no vector for (with the current model)
+    hashes = [entry['hash'] for document in documents for entry in document.chunks]
+    stored = stored_hashes(model_name, hashes)
+    missing = [h for h in dict.fromkeys(hashes) if h not in stored]
+    texts_to_embed = [new_texts[h] for h in missing if h in new_texts]
+    # Chunks of already indexed documents need embedding again if the model changed
+    texts_to_embed += chunk_texts([h for h in missing if h not in new_texts])
+
+    report(Leader.IndexStatus.EMBEDDING, 25)
+    stage = time.perf_counter()
+    vectors = embed_in_batches(
+        embedding_service, texts_to_embed, settings.INGESTION_EMBED_BATCH_SIZE,
+        progress=lambda done, total: report(Leader.IndexStatus.EMBEDDING, 25 + int(65 * done / total))
+    )
+    store_chunks(model_name, texts_to_embed, vectors)
+    embed_seconds = time.perf_counter() - stage
+
+    now = timezone.now()
+    for document, _ in changed:
+        document.indexed_at = now
+        document.save(update_fields=['content_hash', 'chunks', 'indexed_at'])
+
+    # Append to, or assemble, the index over all documents' chunks in order
+    stage = time.perf_counter()
+    entries = [[document.id, document.content_hash, len(document.chunks)] for document in documents if document.chunks]
+    previous = manifest.get('sources') if manifest and manifest['embedding_model'] == model_name else None
+    index_type = resolve_index_type(leader.index_type, len(hashes))
+    if manifest is None and not entries:
+        update = 'unchanged'
+    elif previous == entries and index_type == manifest['index_type']:
+        update = 'unchanged'
+    elif not hashes:
+        update, index_type = 'removed', None
+        shutil.rmtree(index_dir, ignore_errors=True)
+        Leader.objects.filter(id=leader.id).update(index_path=None)
+    else:
+        texts = chunk_texts(hashes)
+        offset = sum(count for _, _, count in previous or [])
+        if previous and entries[:len(previous)] == previous and index_type == manifest['index_type']:
+            update = 'extended'
+            index = configure_search(faiss.read_index(os.path.join(index_dir, manifest['index_file'])))
+            index.add(load_vectors(model_name, hashes[offset:]))
+        else:
+            update = 'rebuilt'
+            index, index_type = build_index(load_vectors(model_name, hashes), leader.index_type)
+        metadatas = [entry['metadata'] for document in documents for entry in document.chunks]
+        manifest = write_leader_index(
+            index_dir, index, [Document(page_content=t, metadata=m) for t, m in zip(texts, metadatas)],
+            model_name, index_type=index_type, sources=entries,
+        )
+        write_keyword_index(index_dir, texts, manifest['created_at'])
+        # Using update to avoid triggering the signal again
+        Leader.objects.filter(id=leader.id).update(index_path=relative_path)
+    if update != 'unchanged':
+        # Drop any stale copy of the previous index (and answers built on it)
+        vector_store_registry.invalidate(leader.id)
+        answer_cache.invalidate(leader.id)
+    index_seconds = time.perf_counter() - stage
+
+    total = time.perf_counter() - started
+    stats = {
+        'pages': pages,
+        'documents': len(entries),
+        'documents_updated': len(changed),
+        'duplicates_dropped': duplicates,
+        'chunks': len(hashes),
+        'chunks_embedded': len(texts_to_embed),
+        'chunks_reused': sum(1 for h in hashes if h in stored),
+        'parse_seconds': round(parse_seconds, 3),
+        'chunk_seconds': round(chunk_seconds, 3),
+        'embed_seconds': round(embed_seconds, 3),
+        'index_type': index_type,
+        'index_update': update,
+        'index_seconds': round(index_seconds, 3),
+        'total_seconds': round(total, 3),
+        'pages_per_second': round(pages / total, 2),
+        'chunks_per_second': round(len(texts_to_embed) / max(embed_seconds, 1e-9), 2),
+    }
+    logger.info(
+        "FAISS %s index %s for %s at %s: %d documents, %d chunks (%d embedded, %d reused)",
+        index_type or 'leader', update, leader.name, index_dir, stats['documents'], stats['chunks'],
+        stats['chunks_embedded'], stats['chunks_reused'],
+    )
+
+    if settings.SUGGESTION_BANK_BUILD_ON_INGEST and update in ('extended', 'rebuilt'):
+        from .suggestion_bank import build_suggestion_bank
+        leader.index_path = relative_path
+        try:
+            bank = build_suggestion_bank(
+                leader,
+                chunks=settings.SUGGESTION_BANK_CHUNKS,
+                per_chunk=settings.SUGGESTION_BANK_QUESTIONS_PER_CHUNK,
+            )
+            stats['suggestion_bank_questions'] = bank['questions']
+            stats['suggestion_bank_seconds'] = bank['total_seconds']
+        except Exception as e:
+            # Suggestions fall back to the LLM; the index itself is fine
+            logger.exception("Error building the suggestion bank for %s: %s", leader.name, e)
+    return stats
+
+
+def rebuild_leader_index(leader, index_type=None):
+    """Rebuild a leader's vector index as ``index_type`` (default: the leader's setting).
+
+    The vectors and documents come from the current index, so no PDF or
+    embedding model is needed. Rows keep their order and the manifest keeps
+    its ``created_at``, so the keyword index and suggestion bank stay valid.
+    Vectors read back from a quantized index are approximations; rebuilding
+    from one loses precision. Returns the new manifest.
+    """
+    from .ann_index import build_index, stored_vectors
+    from .leader_index import open_leader_index, read_manifest, write_leader_index
+    from .vectorstore import vector_store_registry
+
+    if not leader.index_path:
+        raise ValueError(f"{leader.name} has no index directory; run convert_leader_indexes first")
+    directory = vector_store_registry.resolve_path(leader)
+    previous = read_manifest(directory)
+    db = open_leader_index(directory)
+    documents = [db.docstore.search(row) for row in range(db.index.ntotal)]
+    index, index_type = build_index(stored_vectors(db.index), index_type or leader.index_type)
+    manifest = write_leader_index(
+        directory, index, documents, previous['embedding_model'],
+        index_type=index_type, created_at=previous['created_at'], sources=previous.get('sources'),
+    )
+    vector_store_registry.invalidate(leader.id)
+    return manifest
+
+
+class IngestionWorkerPool:
+    """Local worker pool that drains the database-backed ingestion queue.
+
+    A dispatcher thread claims due jobs (at most ``concurrency`` at a time, so
+    several uploads don't oversubscribe the CPU) and runs them on a thread
+    pool. Failed jobs are retried with exponential backoff until they run out
+    of attempts.
+    """
+
+    def __init__(self, concurrency, poll_interval, retry_backoff, stale_after):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.retry_backoff = retry_backoff
+        self.stale_after = stale_after
+        self._executor = None
+        self._dispatcher = None
+        self._active = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+
+    def start(self):
+        with self._lock:
+            if self._dispatcher is None:
+                self._stopped.clear()
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.concurrency, thread_name_prefix='ingestion'
+                )
+                self._dispatcher = threading.Thread(
+                    target=self._dispatch_loop, name='ingestion-dispatcher', daemon=True
+                )
+                self._dispatcher.start()
+        return self
+
+    def wake(self):
+        self._wake.set()
+
+    def stop(self, wait=True):
+        self._stopped.set()
+        self._wake.set()
+        with self._lock:
+            dispatcher, executor = self._dispatcher, self._executor
+            self._dispatcher = self._executor = None
+        if dispatcher is not None:
+            dispatcher.join()
+            executor.shutdown(wait=wait)
+
+    def run_forever(self):
+        self.start()
+        try:
+            while not self._stopped.wait(1):
+                pass
+        except KeyboardInterrupt:
+            self.stop()
+
+    def _dispatch_loop(self):
+        try:
+            self._requeue_stale_jobs()
+            while not self._stopped.is_set():
+                with self._lock:
+                    free = self.concurrency - len(self._active)
+                for job_id in self._claim(free):
+                    with self._lock:
+                        self._active.add(job_id)
+                    self._executor.submit(self._run, job_id)
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+        finally:
+            close_old_connections()
+
+    def _requeue_stale_jobs(self):
+        """Put back jobs left running by a worker that died mid-ingestion"""
+        cutoff = timezone.now() - timedelta(seconds=self.stale_after)
+        IngestionJob.objects.filter(
+            status=IngestionJob.Status.RUNNING, updated_at__lt=cutoff
+        ).update(status=IngestionJob.Status.QUEUED, updated_at=timezone.now())
+
+    def _claim(self, limit):
+        if limit <= 0:
+            return []
+        close_old_connections()
+        # One job per leader at a time; another waits until the running one is done
+        running = IngestionJob.objects.filter(status=IngestionJob.Status.RUNNING).values('leader_id')
+        candidates = IngestionJob.objects.filter(
+            status=IngestionJob.Status.QUEUED, run_after__lte=timezone.now()
+        ).exclude(leader_id__in=running).values_list('id', flat=True)[:limit]
+        claimed = []
+        for job_id in candidates:
+            # Conditional update so only one worker (in any process) wins the job
+            won = IngestionJob.objects.filter(id=job_id, status=IngestionJob.Status.QUEUED).update(
+                status=IngestionJob.Status.RUNNING,
+                attempts=F('attempts') + 1,
+                updated_at=timezone.now()
+            )
+            if won:
+                claimed.append(job_id)
+        return claimed
+
+    def _run(self, job_id):
+        try:
+            job = IngestionJob.objects.select_related('leader').get(id=job_id)
+            leader = job.leader
+
+            def report(index_status, progress):
+                Leader.objects.filter(id=leader.id).update(
+                    index_status=index_status, index_progress=progress
+                )
+                # Heartbeat so the job isn't mistaken for a stale one
+                IngestionJob.objects.filter(id=job.id).update(updated_at=timezone.now())
+
+            try:
+                stats = build_leader_index(leader, report)
+            except Exception as e:
+                self._fail(job, leader, e)
+                return
+
+            IngestionJob.objects.filter(id=job.id).update(
+                status=IngestionJob.Status.SUCCEEDED, stats=stats, error='', updated_at=timezone.now()
+            )
+            Leader.objects.filter(id=leader.id).update(
+                index_status=Leader.IndexStatus.INDEXED, index_progress=100, index_error=''
+            )
+        except Exception as e:
+            logger.exception("Error running ingestion job %s: %s", job_id, e)
+        finally:
+            with self._lock:
+                self._active.discard(job_id)
+            self._wake.set()
+            close_old_connections()
+
+    def _fail(self, job, leader, error):
+        logger.error(
+            "Error processing PDF for %s (attempt %d/%d): %s", leader.name, job.attempts, job.max_attempts, error
+        )
+        if job.attempts < job.max_attempts:
+            delay = self.retry_backoff * 2 ** (job.attempts - 1)
+            IngestionJob.objects.filter(id=job.id).update(
+                status=IngestionJob.Status.QUEUED,
+                run_after=timezone.now() + timedelta(seconds=delay),
+                error=str(error),
+                updated_at=timezone.now()
+            )
+            index_status = Leader.IndexStatus.QUEUED
+        else:
+            IngestionJob.objects.filter(id=job.id).update(
+                status=IngestionJob.Status.FAILED, error=str(error), updated_at=timezone.now()
+            )
+            index_status = Leader.IndexStatus.FAILED
+        Leader.objects.filter(id=leader.id).update(
+            index_status=index_status, index_progress=0, index_error=str(error)
+        )
+
+
+ingestion_pool = IngestionWorkerPool(
+    concurrency=settings.INGESTION_CONCURRENCY,
+    poll_interval=settings.INGESTION_POLL_INTERVAL,
+    retry_backoff=settings.INGESTION_RETRY_BACKOFF,
+    stale_after=settings.INGESTION_STALE_AFTER,
+)
@@ -0,0 +1,315 @@
+"""On-disk layout for leader vector indexes.
+
+Each leader gets a directory under ``MEDIA_ROOT/leader_indexes/`` holding:
+
+* ``index.<build>.faiss``         native FAISS index, opened with ``IO_FLAG_MMAP``
+* ``docstore.<build>.bin``        chunk records (JSON) packed back to back
+* ``docstore.<build>.offsets.npy`` int64 byte offsets into the docstore
+* ``manifest.json``               format version, embedding model, index type and file names
+
+Every build writes its files under new names and then replaces the manifest,
+so switching a directory to a new build is one atomic step and its mtime marks
+a complete index. The previous build's files are kept for readers that read
+the old manifest just before; older ones are removed. Indexes written before
+builds were versioned use the unversioned names, which the manifest records.
+An opened index is read-only: changes go through ingestion, which writes a
+new one.
+"""
+import json
+import mmap
+import os
+import time
+from datetime import datetime, timezone
+from functools import lru_cache
+
+import faiss
+import numpy as np
+from langchain_core.documents import Document
+from langchain_community.vectorstores import FAISS
+
+from .ann_index import configure_search
+from .embeddings import embedding_service
+
+INDEX_FORMAT_VERSION = 1
+INDEX_ROOT = 'leader_indexes'
+MANIFEST_FILE = 'manifest.json'
+# Unversioned names, used by indexes written before builds were versioned
+INDEX_FILE = 'index.faiss'
+DOCSTORE_FILE = 'docstore.bin'
+OFFSETS_FILE = 'docstore.offsets.npy'
+INDEX_FILE_KEYS = ('index_file', 'docstore_file', 'offsets_file')
+DEFAULT_EMBEDDING_MODEL = "sentence-transformers/all-mpnet-base-v2"
+
+
+class IndexFormatError(Exception):
+    pass
+
+
+class ReadOnlyIndexError(Exception):
+    pass
+
+
+class MmapDocstore:
+    """Read-only docstore that decodes chunk records on demand by offset.
+
+    It has no ``add``/``delete``, so LangChain treats it as not addable.
+    """
+
+    def __init__(self, docstore_path, offsets_path):
+        self._offsets = np.load(offsets_path, mmap_mode='r')
+        self._file = open(docstore_path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        # mmap refuses empty files; an empty index simply has no records
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def search(self, search):
+        i = int(search)
+        if i < 0 or i >= len(self):
+            return f"ID {search} not found."
+        start, end = int(self._offsets[i]), int(self._offsets[i + 1])
+        record = json.loads(self._data[start:end])
+        return Document(page_content=record['page_content'], metadata=record['metadata'])
+
+
+class LeaderFAISS(FAISS):
+    """FAISS store over an opened leader index; adding or deleting raises ``ReadOnlyIndexError``.
+
+    LangChain changes the FAISS index before the docstore, so these are refused
+    up front rather than leaving the two out of step.
+    """
+
+    def _read_only(self, *args, **kwargs):
+        raise ReadOnlyIndexError("Leader indexes are read-only; add or remove the leader's documents instead")
+
+    add_texts = add_embeddings = delete = merge_from = _read_only
+
+    async def aadd_texts(self, *args, **kwargs):
+        self._read_only()
+
+
+class _PositionalIds:
+    """Maps FAISS row numbers to docstore ids, which are the row numbers themselves"""
+
+    def __init__(self, count):
+        self._count = count
+
+    def __getitem__(self, i):
+        if i < 0 or i >= self._count:
+            raise KeyError(i)
+        return int(i)
+
+    def __len__(self):
+        return self._count
+
+    def values(self):
+        return range(self._count)
+
+
+@lru_cache(maxsize=None)
+def _standalone_embeddings(model_name):
+    from .fake_embeddings import HashingEmbeddings, is_fake_embedding_model
+    if is_fake_embedding_model(model_name):
+        return HashingEmbeddings.from_model_name(model_name)
+
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(
+        model_name=model_name,
+        encode_kwargs={"normalize_embeddings": True}
+    )
+
+
+def embeddings_for(model_name):
+    """Embedding function for an index built with ``model_name``.
+
+    Indexes built with the configured model share the process-wide service;
+    anything else gets its own (cached) model instance.
+    """
+    if model_name == embedding_service.model_name:
+        return embedding_service
+    return _standalone_embeddings(model_name)
+
+
+def leader_index_dir(leader_name):
+    """Index directory (relative to MEDIA_ROOT) for a leader"""
+    return os.path.join(INDEX_ROOT, leader_name.replace(' ', '_').lower())
+
+
+def manifest_path(directory):
+    return os.path.join(directory, MANIFEST_FILE)
+
+
+def read_manifest(directory):
+    with open(manifest_path(directory)) as f:
+        manifest = json.load(f)
+    if manifest.get('format_version') != INDEX_FORMAT_VERSION:
+        raise IndexFormatError(
+            f"Unsupported index format {manifest.get('format_version')} in {directory}"
+        )
+    return manifest
+
+
+def build_file_names(build):
+    """Names of the index, docstore and offsets files of one build"""
+    return f'index.{build}.faiss', f'docstore.{build}.bin', f'docstore.{build}.offsets.npy'
+
+
+def _build_files(manifest):
+    return {manifest[key] for key in INDEX_FILE_KEYS if manifest.get(key)}
+
+
+def _is_build_file(name):
+    return (
+        name in (INDEX_FILE, DOCSTORE_FILE, OFFSETS_FILE)
+        or (name.startswith('index.') and name.endswith('.faiss'))
+        or (name.startswith('docstore.') and name.endswith(('.bin', '.offsets.npy')))
+    )
+
+
+def _remove_old_builds(directory, keep):
+    for name in os.listdir(directory):
+        if _is_build_file(name) and name not in keep:
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                # Still mapped on a platform that refuses that; the next build retries
+                pass
+
+
+def index_nbytes(directory):
+    """On-disk size of the current build of an index directory, used for cache budgeting"""
+    manifest = read_manifest(directory)
+    return sum(
+        os.path.getsize(os.path.join(directory, name))
+        for name in (*_build_files(manifest), MANIFEST_FILE)
+        if os.path.exists(os.path.join(directory, name))
+    )
+
+
+def _replace(path, write):
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def write_leader_index(directory, index, documents, embedding_model=DEFAULT_EMBEDDING_MODEL,
+                       index_type='flat', created_at=None, sources=None):
+    """Write a FAISS index and its documents (in index row order) to ``directory``.
+
+    ``created_at`` identifies the indexed content; pass the previous value
+    when only the index type changes so files built on it stay valid.
+    ``sources`` lists the ``[id, content hash, chunk count]`` of the leader
+    documents the rows come from, in order.
+    """
+    if index.ntotal != len(documents):
+        raise IndexFormatError(f"Index has {index.ntotal} vectors but {len(documents)} documents")
+    os.makedirs(directory, exist_ok=True)
+    try:
+        previous_files = _build_files(read_manifest(directory))
+    except (FileNotFoundError, IndexFormatError, ValueError):
+        previous_files = set()
+    index_file, docstore_file, offsets_file = build_file_names(f'{time.time_ns():x}')
+
+    _replace(os.path.join(directory, index_file), lambda p: faiss.write_index(index, p))
+
+    offsets = np.zeros(len(documents) + 1, dtype=np.int64)
+
+    def write_docstore(path):
+        with open(path, 'wb') as f:
+            for i, doc in enumerate(documents):
+                record = json.dumps(
+                    {'page_content': doc.page_content, 'metadata': doc.metadata},
+                    ensure_ascii=False, default=str
+                ).encode('utf-8')
+                f.write(record)
+                offsets[i + 1] = offsets[i] + len(record)
+
+    _replace(os.path.join(directory, docstore_file), write_docstore)
+    # np.save appends .npy to names without it, so write through a file object
+    def write_offsets(path):
+        with open(path, 'wb') as f:
+            np.save(f, offsets)
+
+    _replace(os.path.join(directory, offsets_file), write_offsets)
+
+    manifest = {
+        'format_version': INDEX_FORMAT_VERSION,
+        'embedding_model': embedding_model,
+        'dimension': index.d,
+        'count': index.ntotal,
+        'index_type': index_type,
+        'sources': sources,
+        'index_file': index_file,
+        'docstore_file': docstore_file,
+        'offsets_file': offsets_file,
+        'created_at': created_at or datetime.now(timezone.utc).isoformat(),
+    }
+
+    def write_manifest(path):
+        with open(path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+    _replace(manifest_path(directory), write_manifest)
+    _remove_old_builds(directory, keep=_build_files(manifest) | previous_files)
+    return manifest
+
+
+def write_vector_store(directory, db, embedding_model=DEFAULT_EMBEDDING_MODEL):
+    """Write an in-memory LangChain FAISS store in the on-disk layout"""
+    documents = [
+        db.docstore.search(db.index_to_docstore_id[i])
+        for i in range(db.index.ntotal)
+    ]
+    return write_leader_index(directory, db.index, documents, embedding_model)
+
+
+def _read_index(directory, manifest):
+    """The FAISS index of the build ``manifest`` points at, mapped if possible"""
+    index_path = os.path.join(directory, manifest['index_file'])
+    if not os.path.exists(index_path):
+        raise FileNotFoundError(index_path)
+    try:
+        index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+    except RuntimeError:
+        # Not every index type can be mapped; fall back to a regular read
+        index = faiss.read_index(index_path)
+    return configure_search(index)
+
+
+def _open_build(directory):
+    manifest = read_manifest(directory)
+    index = _read_index(directory, manifest)
+    docstore = MmapDocstore(
+        os.path.join(directory, manifest['docstore_file']),
+        os.path.join(directory, manifest['offsets_file']),
+    )
+    if not manifest['count'] == index.ntotal == len(docstore):
+        raise IndexFormatError(
+            f"{directory} has {index.ntotal} vectors and {len(docstore)} documents "
+            f"but its manifest lists {manifest['count']}"
+        )
+    return manifest, index, docstore
+
+
+def open_leader_index(directory, attempts=3):
+    """Open an index directory as a LangChain FAISS store backed by mmap.
+
+    A build that is removed or replaced while it is being opened is retried
+    with the current manifest; ``IndexFormatError`` if its files still disagree.
+    """
+    for attempt in range(attempts):
+        try:
+            manifest, index, docstore = _open_build(directory)
+            break
+        except (FileNotFoundError, IndexFormatError):
+            if attempt == attempts - 1:
+                raise
+            time.sleep(0.05)
+    return LeaderFAISS(
+        embedding_function=embeddings_for(manifest['embedding_model']),
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id=_PositionalIds(index.ntotal),
+    )
@@ -0,0 +1,361 @@
+"""Shared Ollama client pool and the LangChain LLM that uses it.
+
+Requests go through long-lived httpx clients (one sync client per process,
+one async client per event loop), so connections to Ollama are kept alive
+and reused. Every request sends ``keep_alive`` so the model stays loaded.
+With several ``OLLAMA_BASE_URLS`` each request goes to the least loaded (or
+next, round robin) healthy replica. A replica that fails to connect is taken
+out of rotation until a request to it or a health check against
+``/api/tags`` succeeds again. When every replica is marked down they are all
+still tried, so a recovered Ollama serves the next request; callers get
+``OllamaUnavailable`` only once each replica has failed that request.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import threading
+import time
+import weakref
+from typing import Any, Dict, Optional
+
+import httpx
+from django.conf import settings
+from langchain_core.language_models.llms import LLM
+from langchain_core.outputs import GenerationChunk
+
+logger = logging.getLogger(__name__)
+
+ROUND_ROBIN = 'round_robin'
+LEAST_LOADED = 'least_loaded'
+
+
+class OllamaUnavailable(Exception):
+    pass
+
+
+class OllamaBackend:
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.healthy = True
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+        self.last_error = None
+        self.checked_at = 0.0
+        self.models = None
+
+    def as_dict(self):
+        return {
+            'base_url': self.base_url,
+            'healthy': self.healthy,
+            'in_flight': self.in_flight,
+            'requests': self.requests,
+            'failures': self.failures,
+            'last_error': self.last_error,
+            'models': self.models,
+        }
+
+
+class OllamaPool:
+    """Dispatches generate requests across one or more Ollama replicas.
+
+    Connection errors mark a replica unhealthy and the request is retried on
+    the next one, as long as no output has been returned yet. HTTP errors
+    from Ollama (e.g. an unknown model) are raised as they are.
+    """
+
+    def __init__(self, base_urls, model, connect_timeout, read_timeout, keep_alive,
+                 dispatch=LEAST_LOADED, health_check_interval=15.0, max_connections=32):
+        if dispatch not in (ROUND_ROBIN, LEAST_LOADED):
+            raise ValueError(f"Unknown Ollama dispatch strategy {dispatch!r}")
+        self.backends = [OllamaBackend(url) for url in base_urls]
+        self.model = model
+        self.keep_alive = keep_alive
+        self.dispatch = dispatch
+        self.health_check_interval = health_check_interval
+        self._timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self._limits = httpx.Limits(
+            max_connections=max_connections, max_keepalive_connections=max_connections
+        )
+        self._client = None
+        self._async_clients = weakref.WeakKeyDictionary()
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._monitor = None
+
+    # Selection
+
+    def _select(self, tried):
+        self._ensure_monitor()
+        with self._lock:
+            candidates = [b for b in self.backends if b not in tried]
+            # With every replica marked down, still try them rather than fail outright
+            candidates = [b for b in candidates if b.healthy] or candidates
+            if not candidates:
+                return None
+            turn = next(self._counter)
+            if self.dispatch == ROUND_ROBIN:
+                backend = candidates[turn % len(candidates)]
+            else:
+                # Rotate before taking the minimum so ties are spread evenly
+                shift = turn % len(candidates)
+                rotated = candidates[shift:] + candidates[:shift]
+                backend = min(rotated, key=lambda b: b.in_flight)
+            backend.in_flight += 1
+            backend.requests += 1
+            return backend
+
+    def _release(self, backend, error=None):
+        with self._lock:
+            backend.in_flight -= 1
+            if error is not None:
+                backend.failures += 1
+                backend.healthy = False
+                backend.last_error = str(error) or error.__class__.__name__
+                backend.checked_at = time.monotonic()
+                logger.warning("Error reaching Ollama at %s: %s", backend.base_url, backend.last_error)
+            else:
+                backend.healthy = True
+
+    def _unavailable(self, tried):
+        urls = ', '.join(b.base_url for b in tried) or 'no backends configured'
+        return OllamaUnavailable(f"Could not reach Ollama ({urls})")
+
+    # Requests
+
+    def _payload(self, prompt, stream, options):
+        payload = {
+            'model': self.model,
+            'prompt': prompt,
+            'stream': stream,
+            'keep_alive': self.keep_alive,
+        }
+        if options:
+            payload['options'] = options
+        return payload
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = httpx.Client(timeout=self._timeout, limits=self._limits)
+        return self._client
+
+    @property
+    def async_client(self):
+        # httpx async clients are bound to the loop they were first used on
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = self._async_clients[loop] = httpx.AsyncClient(
+                timeout=self._timeout, limits=self._limits
+            )
+        return client
+
+    def generate(self, prompt, options=None):
+        payload = self._payload(prompt, False, options)
+        tried = []
+        while (backend := self._select(tried)) is not None:
+            tried.append(backend)
+            try:
+                response = self.client.post(f"{backend.base_url}/api/generate", json=payload)
+            except httpx.TransportError as e:
+                self._release(backend, e)
+                continue
+            self._release(backend)
+            response.raise_for_status()
+            return response.json().get('response', '')
+        raise self._unavailable(tried)
+
+    def stream(self, prompt, options=None):
+        """Yield response tokens from the streaming generate API"""
+        payload = self._payload(prompt, True, options)
+        tried = []
+        while (backend := self._select(tried)) is not None:
+            tried.append(backend)
+            started = False
+            try:
+                with self.client.stream('POST', f"{backend.base_url}/api/generate", json=payload) as response:
+                    response.raise_for_status()
+                    for token in _tokens(response.iter_lines()):
+                        started = True
+                        yield token
+            except httpx.TransportError as e:
+                self._release(backend, e)
+                if started:
+                    raise
+                continue
+            except BaseException:
+                self._release(backend)
+                raise
+            self._release(backend)
+            return
+        raise self._unavailable(tried)
+
+    async def agenerate(self, prompt, options=None):
+        payload = self._payload(prompt, False, options)
+        tried = []
+        while (backend := self._select(tried)) is not None:
+            tried.append(backend)
+            try:
+                response = await self.async_client.post(f"{backend.base_url}/api/generate", json=payload)
+            except httpx.TransportError as e:
+                self._release(backend, e)
+                continue
+            self._release(backend)
+            response.raise_for_status()
+            return response.json().get('response', '')
+        raise self._unavailable(tried)
+
+    async def astream(self, prompt, options=None):
+        payload = self._payload(prompt, True, options)
+        tried = []
+        while (backend := self._select(tried)) is not None:
+            tried.append(backend)
+            started = False
+            try:
+                async with self.async_client.stream(
+                    'POST', f"{backend.base_url}/api/generate", json=payload
+                ) as response:
+                    response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        for token in _tokens([line]):
+                            started = True
+                            yield token
+            except httpx.TransportError as e:
+                self._release(backend, e)
+                if started:
+                    raise
+                continue
+            except BaseException:
+                self._release(backend)
+                raise
+            self._release(backend)
+            return
+        raise self._unavailable(tried)
+
+    # Health checks
+
+    def check_health(self):
+        """Probe every replica's /api/tags and update its rotation status"""
+        timeout = httpx.Timeout(self._timeout.connect, connect=self._timeout.connect)
+        for backend in self.backends:
+            try:
+                response = self.client.get(f"{backend.base_url}/api/tags", timeout=timeout)
+                response.raise_for_status()
+                models = [m.get('name') for m in response.json().get('models', [])]
+                error = None
+            except (httpx.HTTPError, ValueError) as e:
+                models, error = None, str(e) or e.__class__.__name__
+            with self._lock:
+                backend.checked_at = time.monotonic()
+                backend.models = models
+                if error is None:
+                    backend.healthy = True
+                else:
+                    if backend.healthy:
+                        logger.warning("Ollama at %s failed its health check: %s", backend.base_url, error)
+                    backend.healthy = False
+                    backend.last_error = error
+        return [backend.as_dict() for backend in self.backends]
+
+    def _ensure_monitor(self):
+        if self._monitor is not None or not self.health_check_interval:
+            return
+        with self._lock:
+            if self._monitor is None:
+                self._monitor = threading.Thread(
+                    target=self._monitor_loop, name='ollama-health', daemon=True
+                )
+                self._monitor.start()
+
+    def _monitor_loop(self):
+        while True:
+            time.sleep(self.health_check_interval)
+            try:
+                self.check_health()
+            except Exception as e:
+                logger.exception("Error checking Ollama health: %s", e)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'model': self.model,
+                'dispatch': self.dispatch,
+                'backends': [backend.as_dict() for backend in self.backends],
+            }
+
+    def close(self):
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+
+def _tokens(lines):
+    for line in lines:
+        if not line:
+            continue
+        data = json.loads(line)
+        if data.get('error'):
+            raise OllamaUnavailable(data['error'])
+        if data.get('response'):
+            yield data['response']
+        if data.get('done'):
+            return
+
+
+ollama_pool = OllamaPool(
+    base_urls=settings.OLLAMA_BASE_URLS,
+    model=settings.OLLAMA_MODEL,
+    connect_timeout=settings.OLLAMA_CONNECT_TIMEOUT,
+    read_timeout=settings.OLLAMA_READ_TIMEOUT,
+    keep_alive=settings.OLLAMA_KEEP_ALIVE,
+    dispatch=settings.OLLAMA_DISPATCH,
+    health_check_interval=settings.OLLAMA_HEALTH_CHECK_INTERVAL,
+    max_connections=settings.OLLAMA_MAX_CONNECTIONS,
+)
+
+
+class PooledOllama(LLM):
+    """LangChain completion model backed by the shared ``ollama_pool``"""
+
+    options: Optional[Dict[str, Any]] = None
+
+    @property
+    def _llm_type(self):
+        return 'pooled-ollama'
+
+    @property
+    def _identifying_params(self):
+        return {'model': ollama_pool.model, 'options': self.options}
+
+    def _options(self, stop):
+        options = dict(self.options or {})
+        if stop:
+            options['stop'] = stop
+        return options
+
+    def _call(self, prompt, stop=None, run_manager=None, **kwargs):
+        return ollama_pool.generate(prompt, self._options(stop))
+
+    async def _acall(self, prompt, stop=None, run_manager=None, **kwargs):
+        return await ollama_pool.agenerate(prompt, self._options(stop))
+
+    def _stream(self, prompt, stop=None, run_manager=None, **kwargs):
+        for token in ollama_pool.stream(prompt, self._options(stop)):
+            chunk = GenerationChunk(text=token)
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, prompt, stop=None, run_manager=None, **kwargs):
+        async for token in ollama_pool.astream(prompt, self._options(stop)):
+            chunk = GenerationChunk(text=token)
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+
+ollama_llm = PooledOllama()
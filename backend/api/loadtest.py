@@ -0,0 +1,283 @@
+"""Offline end-to-end load test of the chat API.
+
+``benchmark_environment`` points this process at a throwaway database and
+media directory, a ``FakeOllamaServer`` and the hashing fake embeddings;
+``build_fixture_leaders`` then indexes the PDFs in ``PDF/`` through the real
+ingestion pipeline. ``LoadTest`` serves the WSGI application on a local port
+and drives chat (regular and streaming), suggestions and chat history with
+concurrent clients, recording latency, time to first token, response size
+and throughput per scenario. Used by ``manage.py benchmark_load``.
+"""
+import asyncio
+import contextlib
+import glob
+import os
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+
+import httpx
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files import File
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.test.utils import override_settings
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import services
+from .fake_embeddings import FAKE_EMBEDDING_MODEL
+from .fake_ollama import DEFAULT_RESPONSE, FakeOllamaServer
+from .models import IngestionJob, Leader
+
+SCENARIOS = ('chat', 'stream', 'suggestions', 'history')
+QUESTIONS = (
+    "What were {leader}'s major achievements?",
+    "Where was {leader} born?",
+    "What did {leader} write about freedom?",
+    "Who influenced {leader}'s ideas?",
+    "How is {leader} remembered today?",
+    "What challenges did {leader} face?",
+)
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def summarize(values):
+    """p50/p95/p99/mean/max of ``values``, or None if there are none"""
+    if not values:
+        return None
+    return {
+        'p50': percentile(values, 50),
+        'p95': percentile(values, 95),
+        'p99': percentile(values, 99),
+        'mean': statistics.mean(values),
+        'max': max(values),
+    }
+
+
+def sse_event_names(data):
+    """Names of the complete server-sent events in ``data``, and the unfinished rest"""
+    *events, rest = data.replace(b'\r\n', b'\n').split(b'\n\n')
+    names = []
+    for event in events:
+        name = 'message'
+        for line in event.split(b'\n'):
+            if line.startswith(b'event:'):
+                name = line[6:].strip().decode()
+        names.append(name)
+    return names, rest
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+@contextlib.contextmanager
+def benchmark_environment(tokens_per_second=50.0, first_token_delay=0.0, response=DEFAULT_RESPONSE):
+    """Run the enclosed code against a test database, fake Ollama and fake embeddings.
+
+    Must be entered before the chat stack (``api.embeddings``, ``api.llm``)
+    is imported, as their singletons read these settings once. Yields the
+    fake Ollama server.
+    """
+    for name in ('embedding_service', 'ollama_pool'):
+        if services.is_loaded(name):
+            raise RuntimeError(f"{name} was loaded before the benchmark environment was set up")
+
+    workdir = tempfile.mkdtemp(prefix='silai-benchmark-')
+    ollama = FakeOllamaServer(
+        port=0, model=settings.OLLAMA_MODEL, response=response,
+        tokens_per_second=tokens_per_second, first_token_delay=first_token_delay,
+    ).start()
+    overrides = override_settings(
+        ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, '127.0.0.1'],
+        MEDIA_ROOT=os.path.join(workdir, 'media'),
+        EMBEDDING_MODEL_NAME=FAKE_EMBEDDING_MODEL,
+        QUERY_EMBEDDING_CACHE_PATH='',
+        OLLAMA_BASE_URLS=[ollama.url],
+        OLLAMA_HEALTH_CHECK_INTERVAL=0,
+        INGESTION_RUN_IN_PROCESS=False,
+        SUGGESTION_BANK_BUILD_ON_INGEST=False,
+    )
+    overrides.enable()
+    test_settings = connection.settings_dict.setdefault('TEST', {})
+    previous_test_name = test_settings.get('NAME')
+    if connection.vendor == 'sqlite':
+        # A file rather than shared-cache memory, so server threads don't lock each other out
+        test_settings['NAME'] = os.path.join(workdir, 'benchmark.sqlite3')
+    database_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield ollama
+    finally:
+        connection.creation.destroy_test_db(database_name, verbosity=0)
+        test_settings['NAME'] = previous_test_name
+        overrides.disable()
+        ollama.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def build_fixture_leaders(pdf_dir, limit=None):
+    """Create and index one leader per PDF in ``pdf_dir``; returns ``[(leader, ingestion stats)]``"""
+    from .ingestion import build_leader_index
+
+    paths = sorted(glob.glob(os.path.join(pdf_dir, '*.pdf')))[:limit]
+    if not paths:
+        raise ValueError(f"No PDFs found in {pdf_dir}")
+    fixtures = []
+    for path in paths:
+        filename = os.path.basename(path)
+        leader = Leader(
+            name=filename.split('.')[0].replace('_', ' '),
+            bio=f"Benchmark fixture built from {filename}",
+            created_at=timezone.now(),
+        )
+        with open(path, 'rb') as f:
+            # Queues an ingestion job, which is run here instead of by the worker pool
+            leader.pdf_file.save(filename, File(f), save=True)
+
+        stats = build_leader_index(
+            leader, lambda status, progress: Leader.objects.filter(id=leader.id).update(index_status=status)
+        )
+        Leader.objects.filter(id=leader.id).update(index_status=Leader.IndexStatus.INDEXED, index_progress=100)
+        IngestionJob.objects.filter(leader=leader).update(status=IngestionJob.Status.SUCCEEDED, stats=stats)
+        fixtures.append((Leader.objects.get(id=leader.id), stats))
+    return fixtures
+
+
+def create_benchmark_users(count):
+    """``count`` users with JWT access tokens, so per-user queue limits aren't hit by one client"""
+    users = []
+    for i in range(count):
+        user = get_user_model().objects.create_user(
+            email=f'benchmark{i}@example.com', first_name='Benchmark', password=None
+        )
+        users.append((user, str(RefreshToken.for_user(user).access_token)))
+    return users
+
+
+class LoadTest:
+    """Concurrent clients against this process's WSGI application.
+
+    Request ``i`` of a scenario goes to leader ``i % len(leaders)`` as user
+    ``i % len(users)``, in that user's session with the leader, asking one of
+    ``QUESTIONS``. Only successful responses contribute latency samples;
+    others are counted by status code. A stream that sends an ``error``
+    event, or ends without ``done``, is not successful.
+    """
+
+    def __init__(self, leaders, users, concurrency, requests):
+        self.leaders = leaders
+        self.users = users
+        self.concurrency = concurrency
+        self.requests = requests
+
+    def run(self, scenarios=SCENARIOS):
+        """Run each scenario in turn; returns ``{scenario: results}``"""
+        server = ThreadedWSGIServer(('127.0.0.1', 0), _QuietHandler, allow_reuse_address=False)
+        server.set_app(get_wsgi_application())
+        thread = threading.Thread(target=server.serve_forever, name='benchmark-server', daemon=True)
+        thread.start()
+        base_url = f"http://127.0.0.1:{server.server_address[1]}"
+        try:
+            return {name: asyncio.run(self._scenario(base_url, name)) for name in scenarios}
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def _request(self, i):
+        leader = self.leaders[i % len(self.leaders)]
+        user_index = i % len(self.users)
+        question = QUESTIONS[(i // len(self.leaders)) % len(QUESTIONS)].format(leader=leader.name)
+        headers = {'Authorization': f"Bearer {self.users[user_index][1]}"}
+        return leader, question, f'benchmark-{user_index}-{leader.id}', headers
+
+    async def _scenario(self, base_url, name):
+        semaphore = asyncio.Semaphore(self.concurrency)
+        limits = httpx.Limits(max_connections=self.concurrency)
+        latencies, ttfts, sizes, errors = [], [], [], {}
+
+        async def one(client, i):
+            async with semaphore:
+                try:
+                    sample = await getattr(self, f'_{name}')(client, *self._request(i))
+                except httpx.HTTPError as e:
+                    sample = (type(e).__name__, None, None, None)
+            status, latency, ttft, size = sample
+            if status != 200:
+                errors[str(status)] = errors.get(str(status), 0) + 1
+                return
+            latencies.append(latency)
+            sizes.append(size)
+            if ttft is not None:
+                ttfts.append(ttft)
+
+        started = time.perf_counter()
+        async with httpx.AsyncClient(base_url=base_url, timeout=300, limits=limits) as client:
+            await asyncio.gather(*(one(client, i) for i in range(self.requests)))
+        elapsed = time.perf_counter() - started
+
+        return {
+            'requests': self.requests,
+            'succeeded': len(latencies),
+            'errors': errors,
+            'elapsed_seconds': elapsed,
+            'throughput_rps': len(latencies) / elapsed if elapsed else 0.0,
+            'latency_seconds': summarize(latencies),
+            'ttft_seconds': summarize(ttfts),
+            'response_bytes': summarize(sizes),
+        }
+
+    async def _chat(self, client, leader, question, session_id, headers):
+        started = time.perf_counter()
+        response = await client.post(
+            f'/api/leaders/{leader.id}/chat/', json={'message': question, 'session_id': session_id},
+            headers=headers,
+        )
+        return response.status_code, time.perf_counter() - started, None, len(response.content)
+
+    async def _stream(self, client, leader, question, session_id, headers):
+        payload = {'message': question, 'session_id': session_id, 'streaming': True, 'stream_protocol': 2}
+        started = time.perf_counter()
+        ttft, size, pending, events = None, 0, b'', set()
+        async with client.stream('POST', f'/api/leaders/{leader.id}/chat/', json=payload,
+                                 headers=headers) as response:
+            async for chunk in response.aiter_bytes():
+                size += len(chunk)
+                names, pending = sse_event_names(pending + chunk)
+                events.update(names)
+                # The first answer text arrives as a delta event (queued events come before it)
+                if ttft is None and 'delta' in events:
+                    ttft = time.perf_counter() - started
+        status = response.status_code
+        # Failures are sent as an error event in a 200 stream
+        if status == 200 and 'error' in events:
+            status = 'stream_error'
+        elif status == 200 and 'done' not in events:
+            status = 'stream_incomplete'
+        return status, time.perf_counter() - started, ttft, size
+
+    async def _suggestions(self, client, leader, question, session_id, headers):
+        started = time.perf_counter()
+        response = await client.post(
+            f'/api/leaders/{leader.id}/suggestions/',
+            json={'latest_user_message': question, 'session_id': session_id}, headers=headers,
+        )
+        return response.status_code, time.perf_counter() - started, None, len(response.content)
+
+    async def _history(self, client, leader, question, session_id, headers):
+        started = time.perf_counter()
+        response = await client.get(
+            f'/api/leaders/{leader.id}/chat_history/', params={'session_id': session_id}, headers=headers
+        )
+        return response.status_code, time.perf_counter() - started, None, len(response.content)
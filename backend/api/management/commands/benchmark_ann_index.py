@@ -0,0 +1,99 @@
+import json
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from api.ann_index import benchmark_index_types, resolve_index_type, stored_vectors
+from api.leader_index import open_leader_index, read_manifest
+from api.loadtest import summarize
+from api.models import Chat, Leader
+from api.vectorstore import vector_store_registry
+
+INDEX_TYPES = [choice for choice in Leader.IndexType.values if choice != Leader.IndexType.AUTO]
+
+
+class Command(BaseCommand):
+    help = (
+        "Build every vector index type over each leader's stored vectors and report recall@k "
+        "against the exact flat index, search latency and index memory"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--leader', type=int, action='append',
+                            help="Leader id (repeatable; default: every indexed leader)")
+        parser.add_argument('--index-types', default=','.join(INDEX_TYPES),
+                            help=f"Comma-separated subset of {', '.join(INDEX_TYPES)}")
+        parser.add_argument('-k', type=int, default=10, help="Neighbours per query for recall@k")
+        parser.add_argument('--queries', type=int, default=100,
+                            help="Queries per leader: its users' recent questions, topped up with "
+                                 "stored chunk vectors")
+        parser.add_argument('--output', help="Write the JSON report to this file")
+        parser.add_argument('--json', action='store_true', help="Print the JSON report instead of a summary")
+
+    def handle(self, *args, **options):
+        index_types = options['index_types'].split(',')
+        unknown = set(index_types) - set(INDEX_TYPES)
+        if unknown:
+            raise CommandError(f"Unknown index type(s): {', '.join(sorted(unknown))}")
+        leaders = Leader.objects.exclude(index_path__isnull=True).exclude(index_path='')
+        if options['leader']:
+            leaders = leaders.filter(pk__in=options['leader'])
+        if not leaders:
+            raise CommandError("No leaders with an index directory found")
+
+        report = []
+        for leader in leaders:
+            directory = vector_store_registry.resolve_path(leader)
+            manifest = read_manifest(directory)
+            db = open_leader_index(directory)
+            vectors = stored_vectors(db.index)
+            if not len(vectors):
+                self.stderr.write(f"{leader.name}: index is empty, skipped")
+                continue
+            queries = self._queries(leader, db, vectors, options['queries'])
+            results = benchmark_index_types(vectors, queries, options['k'], index_types)
+            report.append({
+                'leader': leader.name,
+                'vectors': len(vectors),
+                'dimension': int(vectors.shape[1]),
+                'stored_as': manifest.get('index_type', 'flat'),
+                'auto': resolve_index_type(Leader.IndexType.AUTO, len(vectors)),
+                'queries': len(queries),
+                'k': min(options['k'], len(vectors)),
+                'results': [
+                    {**result, 'latency_seconds': summarize(result.pop('latencies'))} for result in results
+                ],
+            })
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        for entry in report:
+            self.stdout.write(
+                f"{entry['leader']}: {entry['vectors']} x {entry['dimension']}-d vectors stored as "
+                f"{entry['stored_as']} (auto: {entry['auto']}), {entry['queries']} queries, k={entry['k']}"
+            )
+            for result in entry['results']:
+                built_as = f" (as {result['built_as']})" if result['built_as'] != result['index_type'] else ''
+                latency = result['latency_seconds']
+                self.stdout.write(
+                    f"  {result['index_type']}{built_as}: recall@{entry['k']} {result['recall']:.3f}, "
+                    f"search p50 {latency['p50'] * 1e3:.3f}ms p95 {latency['p95'] * 1e3:.3f}ms, "
+                    f"{result['memory_bytes'] / 1024:.0f} KiB, built in {result['build_seconds']:.2f}s"
+                )
+
+    def _queries(self, leader, db, vectors, count):
+        """Embeddings of the leader's latest user questions, then evenly spaced stored vectors"""
+        questions = list(
+            Chat.objects.filter(leader=leader).order_by('-timestamp').values_list('user_input', flat=True)[:count]
+        )
+        queries = [db.embedding_function.embed_query(question) for question in questions]
+        missing = count - len(queries)
+        if missing > 0:
+            rows = np.unique(np.linspace(0, len(vectors) - 1, min(missing, len(vectors))).astype(int))
+            queries.extend(vectors[rows])
+        return np.asarray(queries, dtype=np.float32)
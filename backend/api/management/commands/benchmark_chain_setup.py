@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.chains import ChainFactory, LeaderChain
+from api.llm import ollama_llm
+from api.models import Leader
+from api.prompts import ANSWER_PROMPT_TEMPLATE
+from api.retrieval import build_retriever
+from api.vectorstore import vector_store_registry
+
+
+class Command(BaseCommand):
+    help = "Compare building a leader's retrieval chain per request with the cached chain factory"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--leader', type=int, help="Leader id (default: first indexed leader)")
+        parser.add_argument('--iterations', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        leaders = Leader.objects.exclude(index_path__isnull=True, pkl_file_path__isnull=True)
+        if options['leader']:
+            leaders = leaders.filter(pk=options['leader'])
+        leader = leaders.first()
+        if leader is None:
+            raise CommandError("No indexed leader found")
+        db, index_version = vector_store_registry.get_versioned(leader)
+        if db is None:
+            raise CommandError(f"{leader} has no index on disk")
+
+        iterations = options['iterations']
+        template = leader.answer_prompt or ANSWER_PROMPT_TEMPLATE
+        config = (index_version, leader.retrieval_k, template, leader.retrieval_mode, leader.rerank_top_n)
+
+        started = time.perf_counter()
+        for _ in range(iterations):
+            LeaderChain(db, ollama_llm, build_retriever(leader, db, index_version), template, config)
+        per_request = (time.perf_counter() - started) / iterations
+
+        factory = ChainFactory(ollama_llm)
+        factory.get(leader, db, index_version)
+        started = time.perf_counter()
+        for _ in range(iterations):
+            factory.get(leader, db, index_version)
+        cached = (time.perf_counter() - started) / iterations
+
+        self.stdout.write(f"{leader}: chain setup over {iterations} iterations")
+        self.stdout.write(f"  built per request: {per_request * 1e6:.1f} us")
+        self.stdout.write(f"  cached factory:    {cached * 1e6:.1f} us")
@@ -0,0 +1,97 @@
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+from django.core.management.base import BaseCommand, CommandError
+
+from api.loadtest import percentile
+
+PATHS = {
+    'wsgi': '/api/leaders/{leader}/chat/',
+    'asgi': '/api/async/leaders/{leader}/chat/',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Open many concurrent streaming chats against running servers and compare "
+        "the sync (WSGI) and async (ASGI) chat endpoints"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--leader', type=int, required=True)
+        parser.add_argument('--token', required=True, help="JWT access token of a test user")
+        parser.add_argument('--wsgi-url', default='http://localhost:8000',
+                            help="Base URL of the WSGI server (e.g. gunicorn backend_site.wsgi)")
+        parser.add_argument('--asgi-url', default='http://localhost:8001',
+                            help="Base URL of the ASGI server (e.g. uvicorn backend_site.asgi:application)")
+        parser.add_argument('--transports', default='wsgi,asgi')
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--message', default="What were his major achievements?")
+        parser.add_argument('--json', action='store_true', help="Print the report as JSON")
+
+    def handle(self, *args, **options):
+        report = {}
+        for transport in options['transports'].split(','):
+            if transport not in PATHS:
+                raise CommandError(f"Unknown transport {transport!r}; use wsgi and/or asgi")
+            base_url = options[f'{transport}_url']
+            url = base_url + PATHS[transport].format(leader=options['leader'])
+            report[transport] = asyncio.run(self._run(url, options))
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        for transport, stats in report.items():
+            self.stdout.write(
+                f"{transport}: {stats['requests']} streams, {stats['errors']} errors, "
+                f"{stats['throughput_rps']:.2f} req/s, "
+                f"first event p50 {stats['ttfb_p50']:.3f}s p95 {stats['ttfb_p95']:.3f}s, "
+                f"total p50 {stats['total_p50']:.3f}s p95 {stats['total_p95']:.3f}s"
+            )
+
+    async def _run(self, url, options):
+        semaphore = asyncio.Semaphore(options['concurrency'])
+        limits = httpx.Limits(max_connections=options['concurrency'])
+        headers = {'Authorization': f"Bearer {options['token']}"}
+        ttfb, totals, errors = [], [], 0
+
+        async def one(client, i):
+            nonlocal errors
+            async with semaphore:
+                started = time.perf_counter()
+                first = None
+                try:
+                    payload = {'message': options['message'], 'session_id': f'bench-{i}', 'streaming': True}
+                    async with client.stream('POST', url, json=payload, headers=headers) as response:
+                        response.raise_for_status()
+                        async for _ in response.aiter_bytes():
+                            if first is None:
+                                first = time.perf_counter() - started
+                except httpx.HTTPError:
+                    errors += 1
+                    return
+                ttfb.append(first or 0.0)
+                totals.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        async with httpx.AsyncClient(timeout=None, limits=limits) as client:
+            await asyncio.gather(*(one(client, i) for i in range(options['requests'])))
+        elapsed = time.perf_counter() - started
+
+        return {
+            'url': url,
+            'requests': options['requests'],
+            'concurrency': options['concurrency'],
+            'errors': errors,
+            'elapsed_seconds': elapsed,
+            'throughput_rps': len(totals) / elapsed if elapsed else 0.0,
+            'ttfb_p50': percentile(ttfb, 50) or 0.0,
+            'ttfb_p95': percentile(ttfb, 95) or 0.0,
+            'total_p50': percentile(totals, 50) or 0.0,
+            'total_p95': percentile(totals, 95) or 0.0,
+            'total_mean': statistics.mean(totals) if totals else 0.0,
+        }
@@ -0,0 +1,93 @@
+import statistics
+import threading
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+
+from api.models import Chat, Leader
+
+
+class Command(BaseCommand):
+    help = (
+        "Insert chat rows from concurrent threads, as finished streams do, and report "
+        "write throughput for the configured database"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--rows', type=int, default=2000, help="Total rows to insert")
+        parser.add_argument('--answer-bytes', type=int, default=1500, help="Size of each stored answer")
+        parser.add_argument('--leader', type=int, help="Leader id (default: the first leader)")
+        parser.add_argument('--keep', action='store_true', help="Keep the inserted rows")
+
+    def handle(self, *args, **options):
+        leader = Leader.objects.filter(pk=options['leader']).first() if options['leader'] else Leader.objects.first()
+        user = get_user_model().objects.order_by('pk').first()
+        if leader is None or user is None:
+            raise CommandError("Needs at least one leader and one user")
+
+        run_id = uuid.uuid4().hex[:8]
+        answer = 'x' * options['answer_bytes']
+        per_thread = max(1, options['rows'] // options['threads'])
+        latencies = []
+        errors = []
+        lock = threading.Lock()
+
+        def writer(n):
+            mine, failed = [], []
+            try:
+                for i in range(per_thread):
+                    started = time.perf_counter()
+                    try:
+                        Chat.objects.create(
+                            user=user, leader=leader, user_input=f'benchmark question {i}',
+                            ai_response=answer, session_id=f'bench-{run_id}-{n}'
+                        )
+                    except OperationalError as e:
+                        failed.append(str(e))
+                        continue
+                    mine.append(time.perf_counter() - started)
+            finally:
+                connections.close_all()
+            with lock:
+                latencies.extend(mine)
+                errors.extend(failed)
+
+        threads = [threading.Thread(target=writer, args=(n,)) for n in range(options['threads'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        settings_dict = connection.settings_dict
+        self.stdout.write(f"{connection.vendor} ({settings_dict['NAME']})")
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                pragmas = {
+                    name: cursor.execute(f'PRAGMA {name}').fetchone()[0]
+                    for name in ('journal_mode', 'synchronous', 'busy_timeout')
+                }
+            self.stdout.write(f"  pragmas: {pragmas}")
+        else:
+            self.stdout.write(f"  CONN_MAX_AGE={settings_dict.get('CONN_MAX_AGE')}")
+        latencies.sort()
+        self.stdout.write(
+            f"  {len(latencies)} rows from {options['threads']} threads in {elapsed:.2f}s: "
+            f"{len(latencies) / elapsed:.0f} rows/s"
+        )
+        if latencies:
+            self.stdout.write(
+                f"  insert latency p50 {statistics.median(latencies) * 1000:.1f} ms, "
+                f"p95 {latencies[int(0.95 * (len(latencies) - 1))] * 1000:.1f} ms, "
+                f"max {latencies[-1] * 1000:.1f} ms"
+            )
+        if errors:
+            self.stdout.write(self.style.WARNING(f"  {len(errors)} failed writes, e.g. {errors[0]}"))
+
+        if not options['keep']:
+            Chat.objects.filter(session_id__startswith=f'bench-{run_id}-').delete()
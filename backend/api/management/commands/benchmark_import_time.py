@@ -0,0 +1,90 @@
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Only ingestion and retrieval should pay for these (see api/services.py)
+DEFERRED_MODULES = (
+    'faiss', 'httpx', 'langchain', 'langchain_community', 'langchain_core', 'numpy', 'scipy',
+    'sentence_transformers', 'torch', 'transformers',
+)
+IMPORT_TIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def parse_import_times(stderr):
+    """``{module: (self_us, cumulative_us, depth)}`` from ``python -X importtime`` output"""
+    modules = {}
+    for line in stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match:
+            own, cumulative, indent, name = match.groups()
+            modules[name] = (int(own), int(cumulative), len(indent) // 2)
+    return modules
+
+
+def deferred_imports(modules):
+    """``{deferred module: top-level import that pulled it in}``"""
+    loaded, pending = {}, []
+    # Modules are listed in the order their imports finished, children before parents
+    for name, (_, _, depth) in modules.items():
+        if name in DEFERRED_MODULES:
+            pending.append(name)
+        if depth == 0:
+            loaded.update((module, name) for module in pending)
+            pending = []
+    return loaded
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the imports a fresh `manage.py <command>` process pays for and fail if they "
+        "exceed the budget or pull in LangChain, FAISS or torch"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--command', default='check', help="manage.py command to time (default: check)")
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument('--budget', type=float, default=1.0,
+                            help="Maximum median import time in seconds")
+        parser.add_argument('--top', type=int, default=10, help="Slowest top-level imports to list")
+
+    def handle(self, *args, **options):
+        manage_py = os.path.join(settings.BASE_DIR, 'manage.py')
+        argv = [sys.executable, '-X', 'importtime', manage_py, *options['command'].split()]
+        import_seconds, wall_seconds = [], []
+        for _ in range(options['runs']):
+            started = time.perf_counter()
+            result = subprocess.run(argv, capture_output=True, text=True, cwd=settings.BASE_DIR)
+            wall_seconds.append(time.perf_counter() - started)
+            if result.returncode:
+                raise CommandError(f"`{' '.join(argv[3:])}` failed:\n{result.stderr[-2000:]}")
+            modules = parse_import_times(result.stderr)
+            import_seconds.append(sum(c for _, c, depth in modules.values() if depth == 0) / 1e6)
+
+        median = statistics.median(import_seconds)
+        self.stdout.write(f"manage.py {options['command']} over {options['runs']} runs")
+        self.stdout.write(f"  imports: {median:.3f}s median (budget {options['budget']:.3f}s)")
+        self.stdout.write(f"  process: {statistics.median(wall_seconds):.3f}s median wall time")
+        self.stdout.write("  slowest top-level imports (last run):")
+        top_level = sorted(
+            ((c, name) for name, (_, c, depth) in modules.items() if depth == 0), reverse=True
+        )
+        for cumulative, name in top_level[:options['top']]:
+            self.stdout.write(f"    {cumulative / 1000:8.1f} ms  {name}")
+
+        problems = []
+        loaded = deferred_imports(modules)
+        if loaded:
+            problems.append("imported at startup: " + ', '.join(
+                f"{name} (via {parent})" for name, parent in sorted(loaded.items())
+            ))
+        if median > options['budget']:
+            problems.append(f"imports took {median:.3f}s, over the {options['budget']:.3f}s budget")
+        if problems:
+            raise CommandError('; '.join(problems))
+        self.stdout.write(self.style.SUCCESS("Within budget"))
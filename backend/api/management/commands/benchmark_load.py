@@ -0,0 +1,86 @@
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.loadtest import (
+    SCENARIOS, LoadTest, benchmark_environment, build_fixture_leaders, create_benchmark_users
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Offline load test: index the PDFs in PDF/ into a throwaway database with fake "
+        "embeddings, serve the API against a fake Ollama and drive chat, streaming chat, "
+        "suggestions and chat history concurrently; reports p50/p95/p99 latency as JSON"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                            help=f"Comma-separated subset of {', '.join(SCENARIOS)}")
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--requests', type=int, default=100, help="Requests per scenario")
+        parser.add_argument('--users', type=int, help="Distinct users (default: --concurrency)")
+        parser.add_argument('--pdf-dir', default=os.path.join(settings.BASE_DIR.parent, 'PDF'))
+        parser.add_argument('--leaders', type=int, help="Index at most this many PDFs")
+        parser.add_argument('--tokens-per-second', type=float, default=50.0,
+                            help="Fake Ollama token rate (0 sends the whole answer at once)")
+        parser.add_argument('--first-token-delay', type=float, default=0.2,
+                            help="Seconds the fake Ollama waits before the first token")
+        parser.add_argument('--output', help="Write the JSON report to this file")
+        parser.add_argument('--json', action='store_true', help="Print the JSON report instead of a summary")
+
+    def handle(self, *args, **options):
+        scenarios = options['scenarios'].split(',')
+        unknown = set(scenarios) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f"Unknown scenario(s): {', '.join(sorted(unknown))}")
+
+        try:
+            with benchmark_environment(options['tokens_per_second'], options['first_token_delay']) as ollama:
+                fixtures = build_fixture_leaders(options['pdf_dir'], options['leaders'])
+                users = create_benchmark_users(options['users'] or options['concurrency'])
+                load_test = LoadTest(
+                    [leader for leader, _ in fixtures], users, options['concurrency'], options['requests']
+                )
+                results = load_test.run(scenarios)
+                llm_requests = len(ollama.requests)
+        except (RuntimeError, ValueError) as e:
+            raise CommandError(str(e))
+
+        report = {
+            'config': {
+                'scenarios': scenarios,
+                'concurrency': options['concurrency'],
+                'requests': options['requests'],
+                'users': len(users),
+                'tokens_per_second': options['tokens_per_second'],
+                'first_token_delay': options['first_token_delay'],
+                'database': settings.DATABASES['default']['ENGINE'],
+            },
+            'fixtures': [{'leader': leader.name, **stats} for leader, stats in fixtures],
+            'llm_requests': llm_requests,
+            'scenarios': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        for leader, stats in fixtures:
+            self.stdout.write(f"{leader.name}: {stats['pages']} pages, {stats['chunks']} chunks indexed")
+        for name, stats in results.items():
+            line = f"{name}: {stats['succeeded']}/{stats['requests']} ok, {stats['throughput_rps']:.2f} req/s"
+            if stats['latency_seconds']:
+                latency = stats['latency_seconds']
+                line += f", latency p50 {latency['p50']:.3f}s p95 {latency['p95']:.3f}s p99 {latency['p99']:.3f}s"
+            if stats['ttft_seconds']:
+                line += f", first token p50 {stats['ttft_seconds']['p50']:.3f}s"
+            if stats['response_bytes']:
+                line += f", {stats['response_bytes']['mean']:.0f} bytes/response"
+            if stats['errors']:
+                line += f", errors {stats['errors']}"
+            self.stdout.write(line)
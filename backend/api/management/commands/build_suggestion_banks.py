@@ -0,0 +1,50 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.llm import OllamaUnavailable, ollama_pool
+from api.models import Leader
+from api.suggestion_bank import build_suggestion_bank, suggestion_banks
+
+
+class Command(BaseCommand):
+    help = "Generate each indexed leader's bank of follow-up questions with the LLM"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--leader', type=int, action='append',
+                            help="Leader id (repeatable; default: every indexed leader)")
+        parser.add_argument('--missing', action='store_true',
+                            help="Skip leaders whose bank is current for their index")
+        parser.add_argument('--chunks', type=int, default=settings.SUGGESTION_BANK_CHUNKS,
+                            help="Chunks sampled from each index")
+        parser.add_argument('--per-chunk', type=int, default=settings.SUGGESTION_BANK_QUESTIONS_PER_CHUNK,
+                            help="Questions asked for per chunk")
+        parser.add_argument('--workers', type=int, default=settings.GENERATION_SLOTS_PER_BACKEND,
+                            help="Concurrent LLM requests")
+
+    def handle(self, *args, **options):
+        leaders = Leader.objects.exclude(index_path__isnull=True).exclude(index_path='')
+        if options['leader']:
+            leaders = leaders.filter(pk__in=options['leader'])
+        if not leaders:
+            raise CommandError("No leaders with an index directory found")
+
+        failed = 0
+        for leader in leaders:
+            if options['missing'] and suggestion_banks.get(leader):
+                self.stdout.write(f"{leader.name}: bank is current, skipped")
+                continue
+            try:
+                stats = build_suggestion_bank(
+                    leader, ollama_pool.generate,
+                    chunks=options['chunks'], per_chunk=options['per_chunk'], workers=options['workers'],
+                )
+            except (OllamaUnavailable, ValueError) as e:
+                failed += 1
+                self.stderr.write(f"{leader.name}: {e}")
+                continue
+            self.stdout.write(
+                f"{leader.name}: {stats['questions']} questions from {stats['chunks']} chunks "
+                f"in {stats['total_seconds']}s"
+            )
+        if failed:
+            raise CommandError(f"{failed} bank(s) could not be built")
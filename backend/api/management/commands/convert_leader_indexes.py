@@ -0,0 +1,49 @@
+import os
+import pickle
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.leader_index import DEFAULT_EMBEDDING_MODEL, leader_index_dir, write_vector_store
+from api.models import Leader
+from api.vectorstore import vector_store_registry
+
+
+class Command(BaseCommand):
+    help = "Convert pickled leader FAISS stores (.pkl) to the mmap-able index layout"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--leader', type=int, action='append', dest='leader_ids',
+                            help="Only convert the given leader id (repeatable)")
+        parser.add_argument('--delete-pkl', action='store_true',
+                            help="Remove the .pkl file after a successful conversion")
+
+    def handle(self, *args, **options):
+        leaders = Leader.objects.exclude(pkl_file_path__isnull=True).exclude(pkl_file_path='')
+        if options['leader_ids']:
+            leaders = leaders.filter(id__in=options['leader_ids'])
+
+        converted = 0
+        for leader in leaders:
+            pkl_path = os.path.join(settings.MEDIA_ROOT, leader.pkl_file_path)
+            if not os.path.exists(pkl_path):
+                self.stderr.write(f"{leader.name}: {pkl_path} not found, skipping")
+                continue
+
+            with open(pkl_path, 'rb') as f:
+                db = pickle.load(f)
+            model_name = getattr(db.embedding_function, 'model_name', DEFAULT_EMBEDDING_MODEL)
+
+            relative_path = leader_index_dir(leader.name)
+            manifest = write_vector_store(
+                os.path.join(settings.MEDIA_ROOT, relative_path), db, model_name
+            )
+            Leader.objects.filter(id=leader.id).update(index_path=relative_path, pkl_file_path=None)
+            vector_store_registry.invalidate(leader.id)
+
+            if options['delete_pkl']:
+                os.remove(pkl_path)
+            converted += 1
+            self.stdout.write(f"{leader.name}: {manifest['count']} vectors -> {relative_path}")
+
+        self.stdout.write(self.style.SUCCESS(f"Converted {converted} leader index(es)"))
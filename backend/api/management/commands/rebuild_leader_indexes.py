@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.ingestion import rebuild_leader_index
+from api.leader_index import IndexFormatError
+from api.models import Leader
+
+
+class Command(BaseCommand):
+    help = "Rebuild leaders' vector indexes with their (or the given) index type, without re-embedding"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--leader', type=int, action='append',
+                            help="Leader id (repeatable; default: every indexed leader)")
+        parser.add_argument('--index-type', choices=Leader.IndexType.values,
+                            help="Index type to build (default: each leader's index_type)")
+
+    def handle(self, *args, **options):
+        leaders = Leader.objects.exclude(index_path__isnull=True).exclude(index_path='')
+        if options['leader']:
+            leaders = leaders.filter(pk__in=options['leader'])
+        if not leaders:
+            raise CommandError("No leaders with an index directory found")
+
+        for leader in leaders:
+            try:
+                manifest = rebuild_leader_index(leader, options['index_type'])
+            except (IndexFormatError, OSError, ValueError) as e:
+                raise CommandError(f"{leader.name}: {e}")
+            self.stdout.write(f"{leader.name}: {manifest['count']} vectors as {manifest['index_type']}")
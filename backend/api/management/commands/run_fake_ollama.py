@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.fake_ollama import DEFAULT_RESPONSE, FakeOllamaServer
+
+
+class Command(BaseCommand):
+    help = "Serve a fake Ollama API that streams canned answers (no model needed)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=11434)
+        parser.add_argument('--model', default=settings.OLLAMA_MODEL)
+        parser.add_argument('--tokens-per-second', type=float, default=50.0)
+        parser.add_argument('--first-token-delay', type=float, default=0.0,
+                            help="Seconds before the first token of every answer")
+        parser.add_argument('--response', default=DEFAULT_RESPONSE, help="Text every answer streams")
+
+    def handle(self, *args, **options):
+        server = FakeOllamaServer(
+            host=options['host'],
+            port=options['port'],
+            model=options['model'],
+            response=options['response'],
+            tokens_per_second=options['tokens_per_second'],
+            first_token_delay=options['first_token_delay'],
+        )
+        self.stdout.write(f"Fake Ollama serving {options['model']} on {server.url}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
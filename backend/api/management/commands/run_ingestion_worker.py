@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.ingestion import IngestionWorkerPool
+
+
+class Command(BaseCommand):
+    help = "Run a worker that processes queued leader PDF ingestion jobs"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=settings.INGESTION_CONCURRENCY,
+                            help="Maximum number of PDFs indexed at the same time")
+
+    def handle(self, *args, **options):
+        pool = IngestionWorkerPool(
+            concurrency=options['concurrency'],
+            poll_interval=settings.INGESTION_POLL_INTERVAL,
+            retry_backoff=settings.INGESTION_RETRY_BACKOFF,
+            stale_after=settings.INGESTION_STALE_AFTER,
+        )
+        self.stdout.write(f"Ingestion worker started (concurrency={options['concurrency']})")
+        pool.run_forever()
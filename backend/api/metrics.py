@@ -0,0 +1,239 @@
+"""Stage timings of chat requests, exported in Prometheus text format.
+
+``RequestTimings`` records the stages of one request (loading the index,
+embedding the question, retrieval, waiting for a generation slot, time to
+first token, generation, saving the chat) as spans. They feed the
+``silai_stage_seconds`` histogram and the request's ``Server-Timing``
+header; the hybrid retriever's own stages go to
+``silai_retrieval_stage_seconds``. ``render_metrics`` adds in-flight streams
+and every loaded component's ``stats()`` (index cache, answer cache, Ollama
+pool, ...): cumulative counts as ``_total`` counters, the rest as gauges.
+"""
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+from . import services
+from .scheduler import generation_scheduler
+from .transcripts import transcript_writer
+
+STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKEN_RATE_BUCKETS = (1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 200, 300)
+
+# Service name -> metric prefix, exported only once the service is loaded
+COMPONENTS = (
+    ('vector_store_registry', 'vector_stores'),
+    ('embedding_service', 'embeddings'),
+    ('answer_cache', 'answer_cache'),
+    ('chain_factory', 'chains'),
+    ('ollama_pool', 'ollama'),
+    ('intent_router', 'intents'),
+    ('suggestion_banks', 'suggestion_banks'),
+    ('keyword_indexes', 'keyword_indexes'),
+)
+METRIC_NAME_PATTERN = re.compile(r'[^a-zA-Z0-9_]')
+# Component stats that only ever grow (since the process started); exported as counters
+COUNTER_KEYS = frozenset({
+    'admitted', 'builds', 'calls', 'cancelled', 'completed', 'dropped', 'evictions', 'failed_flushes',
+    'failures', 'fallbacks', 'flushed', 'flushes', 'hits', 'invalidations', 'loads', 'messages', 'misses',
+    'persistent_hits', 'queries', 'recorded', 'rejected', 'replayed', 'requests', 'served', 'texts',
+    'timed_out', 'total_seconds',
+})
+# Dicts of such counts by name
+COUNTER_GROUPS = frozenset({'routes'})
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values):
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + '}'
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label combination"""
+
+    def __init__(self, name, documentation, labels, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted((key, (list(b), s, c)) for key, (b, s, c) in self._series.items())
+        for label_values, (counts, total, count) in series:
+            for bound, bucket_count in zip(self.buckets, counts):
+                labels = _format_labels(self.labels + ('le',), label_values + (bound,))
+                lines.append(f'{self.name}_bucket{labels} {bucket_count}')
+            labels = _format_labels(self.labels + ('le',), label_values + ('+Inf',))
+            lines.append(f'{self.name}_bucket{labels} {count}')
+            labels = _format_labels(self.labels, label_values)
+            lines.append(f'{self.name}_sum{labels} {total}')
+            lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+
+class Gauge:
+    def __init__(self, name, documentation, labels):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def add(self, amount, *label_values):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} gauge']
+        with self._lock:
+            values = sorted(self._values.items())
+        for label_values, value in values:
+            lines.append(f'{self.name}{_format_labels(self.labels, label_values)} {value}')
+        return lines
+
+
+stage_seconds = Histogram(
+    'silai_stage_seconds', 'Time spent in each stage of a request.', ('endpoint', 'stage'), STAGE_BUCKETS
+)
+generation_tokens_per_second = Histogram(
+    'silai_generation_tokens_per_second', 'Streamed LLM tokens per second after the first token.',
+    ('endpoint',), TOKEN_RATE_BUCKETS
+)
+streams_in_flight = Gauge('silai_streams_in_flight', 'Chat streams currently being sent.', ('endpoint',))
+retrieval_stage_seconds = Histogram(
+    'silai_retrieval_stage_seconds', 'Time spent in each stage of hybrid retrieval.', ('stage',), STAGE_BUCKETS
+)
+
+
+class RequestTimings:
+    """Stage spans of one request, for the stage histogram and ``Server-Timing``"""
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.spans = []
+        self.started = time.perf_counter()
+        self._finished = False
+
+    @contextmanager
+    def span(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - started)
+
+    def record(self, stage, seconds):
+        self.spans.append((stage, seconds))
+        stage_seconds.observe(seconds, self.endpoint, stage)
+
+    def record_token_rate(self, tokens, seconds):
+        if tokens > 1 and seconds > 0:
+            generation_tokens_per_second.observe((tokens - 1) / seconds, self.endpoint)
+
+    def finish(self):
+        """Record the request's total time (once)"""
+        if not self._finished:
+            self._finished = True
+            self.record('total', time.perf_counter() - self.started)
+
+    def server_timing(self):
+        return ', '.join(f'{stage};dur={seconds * 1000:.1f}' for stage, seconds in self.spans)
+
+    def apply(self, response):
+        """Finish and attach the ``Server-Timing`` header to ``response``"""
+        self.finish()
+        response['Server-Timing'] = self.server_timing()
+        return response
+
+
+def timed_stream(events, timings):
+    """Count a stream as in flight while it is sent; its total is recorded when it ends"""
+    streams_in_flight.add(1, timings.endpoint)
+    try:
+        yield from events
+    finally:
+        streams_in_flight.add(-1, timings.endpoint)
+        timings.finish()
+
+
+async def atimed_stream(events, timings):
+    """``timed_stream`` for async generators"""
+    streams_in_flight.add(1, timings.endpoint)
+    try:
+        async for event in events:
+            yield event
+    finally:
+        streams_in_flight.add(-1, timings.endpoint)
+        timings.finish()
+
+
+def _counter_name(name):
+    if name.endswith('_total_seconds'):
+        return name[:-len('_total_seconds')] + '_seconds_total'
+    return name + '_total'
+
+
+def _flatten(name, value, labels, samples, counter=False):
+    if isinstance(value, bool):
+        value = int(value)
+    if isinstance(value, (int, float)):
+        key = (_counter_name(name), 'counter') if counter else (name, 'gauge')
+        samples.setdefault(key, []).append((labels, value))
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            key = str(key)
+            if key[:1].isdigit():
+                # Per-leader breakdowns ({"3": {...}}) become a label
+                _flatten(name, item, labels + (('key', key),), samples, counter)
+            else:
+                item_counter = counter or key in COUNTER_GROUPS or (
+                    key in COUNTER_KEYS and not isinstance(item, dict)
+                )
+                _flatten(f'{name}_{METRIC_NAME_PATTERN.sub("_", key)}', item, labels, samples, item_counter)
+    elif isinstance(value, (list, tuple)):
+        for i, item in enumerate(value):
+            _flatten(name, item, labels + (('item', str(i)),), samples, counter)
+
+
+def component_samples():
+    """Numeric values of the loaded components' ``stats()``, as ``{(metric, type): [(labels, value)]}``"""
+    samples = {}
+    for service, prefix in COMPONENTS:
+        if services.is_loaded(service):
+            _flatten(f'silai_{prefix}', getattr(services, service).stats(), (), samples)
+    _flatten('silai_generation_queue', generation_scheduler.stats(), (), samples)
+    _flatten('silai_transcripts', transcript_writer.stats(), (), samples)
+    return samples
+
+
+def render_metrics():
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in (stage_seconds, retrieval_stage_seconds, generation_tokens_per_second, streams_in_flight):
+        lines.extend(metric.render())
+    for (name, kind), values in sorted(component_samples().items()):
+        lines.append(f'# TYPE {name} {kind}')
+        for labels, value in values:
+            lines.append(f'{name}{_format_labels(tuple(k for k, _ in labels), tuple(v for _, v in labels))} {value}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.4 on 2026-10-18 10:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_leader_created_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='leader',
+            name='index_path',
+            field=models.CharField(blank=True, help_text='Index directory relative to MEDIA_ROOT', max_length=255, null=True),
+        ),
+    ]
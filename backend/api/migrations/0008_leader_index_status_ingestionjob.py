@@ -0,0 +1,60 @@
+# Generated by Django 4.2.4 on 2026-10-18 10:23
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def mark_existing_indexes(apps, schema_editor):
+    Leader = apps.get_model('api', 'Leader')
+    Leader.objects.exclude(index_path__isnull=True).exclude(index_path='').update(
+        index_status='indexed', index_progress=100
+    )
+    Leader.objects.exclude(pkl_file_path__isnull=True).exclude(pkl_file_path='').update(
+        index_status='indexed', index_progress=100
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_leader_index_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='leader',
+            name='index_error',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='leader',
+            name='index_progress',
+            field=models.PositiveSmallIntegerField(default=0, help_text='Indexing progress in percent'),
+        ),
+        migrations.AddField(
+            model_name='leader',
+            name='index_status',
+            field=models.CharField(blank=True, choices=[('queued', 'Queued'), ('parsing', 'Parsing'), ('embedding', 'Embedding'), ('indexed', 'Indexed'), ('failed', 'Failed')], default='', max_length=20),
+        ),
+        migrations.CreateModel(
+            name='IngestionJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('succeeded', 'Succeeded'), ('failed', 'Failed')], default='queued', max_length=20)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('max_attempts', models.PositiveSmallIntegerField(default=3)),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now)),
+                ('error', models.TextField(blank=True, default='')),
+                ('stats', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('leader', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ingestion_jobs', to='api.leader')),
+            ],
+            options={
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['status', 'run_after'], name='api_ingesti_status_607c54_idx')],
+            },
+        ),
+        migrations.RunPython(mark_existing_indexes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.4 on 2026-10-18 10:37
+
+import api.prompts
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_leader_index_status_ingestionjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='leader',
+            name='answer_prompt',
+            field=models.TextField(blank=True, default='', help_text='Overrides the default answer prompt; must use {context} and {input}', validators=[api.prompts.validate_answer_prompt]),
+        ),
+        migrations.AddField(
+            model_name='leader',
+            name='retrieval_k',
+            field=models.PositiveSmallIntegerField(default=3, help_text='Number of passages retrieved per question', validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(20)]),
+        ),
+    ]
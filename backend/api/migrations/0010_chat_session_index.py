@@ -0,0 +1,17 @@
+# Generated by Django 4.2.4 on 2026-10-18 10:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_leader_retrieval_config'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chat',
+            index=models.Index(fields=['session_id', 'leader', 'user', 'timestamp'], name='chat_session_idx'),
+        ),
+    ]
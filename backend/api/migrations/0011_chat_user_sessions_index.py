@@ -0,0 +1,17 @@
+# Generated by Django 4.2.4 on 2026-10-18 10:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_chat_session_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chat',
+            index=models.Index(fields=['user', 'leader', 'session_id', 'timestamp'], name='chat_user_sessions_idx'),
+        ),
+    ]
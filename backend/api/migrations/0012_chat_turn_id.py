@@ -0,0 +1,24 @@
+# Generated by Django 4.2.4 on 2026-10-18 10:44
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_chat_user_sessions_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chat',
+            name='turn_id',
+            field=models.UUIDField(blank=True, editable=False, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='chat',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.4 on 2026-10-18 10:54
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_chat_turn_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='leader',
+            name='rerank_top_n',
+            field=models.PositiveSmallIntegerField(default=0, help_text='Re-order this many retrieved passages with a cross-encoder (0 = off; slower)', validators=[django.core.validators.MaxValueValidator(50)]),
+        ),
+        migrations.AddField(
+            model_name='leader',
+            name='retrieval_mode',
+            field=models.CharField(choices=[('hybrid', 'Hybrid (keyword + vector)'), ('vector', 'Vector only')], default='hybrid', help_text='Hybrid also matches exact names, places and dates via a keyword index', max_length=10),
+        ),
+    ]
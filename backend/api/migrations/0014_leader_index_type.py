@@ -0,0 +1,18 @@
+# Generated by Django 4.2.4 on 2026-10-18 11:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_leader_hybrid_retrieval'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='leader',
+            name='index_type',
+            field=models.CharField(choices=[('auto', 'Automatic (by corpus size)'), ('flat', 'Flat (exact, float32)'), ('hnsw', 'HNSW graph'), ('ivf_pq', 'IVF with product quantization'), ('sq8', 'Scalar quantization (int8)'), ('sq_fp16', 'Scalar quantization (float16)')], default='auto', help_text='Vector index used from the next (re)indexing; compressed and graph indexes use less memory or search faster on large corpora at a small cost in recall', max_length=10),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.4 on 2026-10-18 11:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_leader_index_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChunkEmbedding',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64)),
+                ('embedding_model', models.CharField(max_length=255)),
+                ('text', models.TextField()),
+                ('vector', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='leader',
+            name='pdf_file',
+            field=models.FileField(blank=True, help_text="Upload a PDF to add it to this leader's documents", null=True, upload_to='leader_pdfs/'),
+        ),
+        migrations.CreateModel(
+            name='LeaderDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file', models.FileField(blank=True, upload_to='leader_documents/')),
+                ('title', models.CharField(blank=True, default='', max_length=255)),
+                ('content_hash', models.CharField(blank=True, default='', editable=False, max_length=64)),
+                ('chunks', models.JSONField(blank=True, default=list, editable=False)),
+                ('uploaded_at', models.DateTimeField(auto_now_add=True)),
+                ('indexed_at', models.DateTimeField(blank=True, editable=False, null=True)),
+                ('leader', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='documents', to='api.leader')),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='chunkembedding',
+            constraint=models.UniqueConstraint(fields=('embedding_model', 'content_hash'), name='chunk_embedding_unique'),
+        ),
+    ]
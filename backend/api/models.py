@@ -1,90 +1,210 @@
-from django.db import models
+import os
+
+from django.core.validators import MaxValueValidator, MinValueValidator
+from django.db import models, transaction
 from django.dispatch import receiver
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete, pre_save
 from django.contrib.auth import get_user_model
-import os
-import pickle
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_community.vectorstores import FAISS
-from langchain.embeddings import HuggingFaceEmbeddings
-from django.conf import settings
+from django.utils import timezone
+from . import services
+from .prompts import validate_answer_prompt
 
 User = get_user_model()
 
 class Leader(models.Model):
+    class IndexStatus(models.TextChoices):
+        QUEUED = 'queued', 'Queued'
+        PARSING = 'parsing', 'Parsing'
+        EMBEDDING = 'embedding', 'Embedding'
+        INDEXED = 'indexed', 'Indexed'
+        FAILED = 'failed', 'Failed'
+
+    class RetrievalMode(models.TextChoices):
+        HYBRID = 'hybrid', 'Hybrid (keyword + vector)'
+        VECTOR = 'vector', 'Vector only'
+
+    class IndexType(models.TextChoices):
+        AUTO = 'auto', 'Automatic (by corpus size)'
+        FLAT = 'flat', 'Flat (exact, float32)'
+        HNSW = 'hnsw', 'HNSW graph'
+        IVF_PQ = 'ivf_pq', 'IVF with product quantization'
+        SQ8 = 'sq8', 'Scalar quantization (int8)'
+        SQ_FP16 = 'sq_fp16', 'Scalar quantization (float16)'
+
     name = models.CharField(max_length=100)
     bio = models.TextField()
     image = models.ImageField(upload_to='leader/', null=True, blank=True)
     pdf_file = models.FileField(upload_to='leader_pdfs/', null=True, blank=True, 
-                               help_text="Upload PDF documents related to this leader")
-    pkl_file_path = models.CharField(max_length=255, blank=True, null=True)
+                               help_text="Upload a PDF to add it to this leader's documents")
+    pkl_file_path = models.CharField(max_length=255, blank=True, null=True)  # Legacy pickled store
+    index_path = models.CharField(max_length=255, blank=True, null=True,
+                                  help_text="Index directory relative to MEDIA_ROOT")
+    index_status = models.CharField(max_length=20, choices=IndexStatus.choices, blank=True, default='')
+    index_progress = models.PositiveSmallIntegerField(default=0, help_text="Indexing progress in percent")
+    index_error = models.TextField(blank=True, default='')
+    retrieval_k = models.PositiveSmallIntegerField(
+        default=3, validators=[MinValueValidator(1), MaxValueValidator(20)],
+        help_text="Number of passages retrieved per question"
+    )
+    retrieval_mode = models.CharField(
+        max_length=10, choices=RetrievalMode.choices, default=RetrievalMode.HYBRID,
+        help_text="Hybrid also matches exact names, places and dates via a keyword index"
+    )
+    rerank_top_n = models.PositiveSmallIntegerField(
+        default=0, validators=[MaxValueValidator(50)],
+        help_text="Re-order this many retrieved passages with a cross-encoder (0 = off; slower)"
+    )
+    index_type = models.CharField(
+        max_length=10, choices=IndexType.choices, default=IndexType.AUTO,
+        help_text="Vector index used from the next (re)indexing; compressed and graph indexes "
+                  "use less memory or search faster on large corpora at a small cost in recall"
+    )
+    answer_prompt = models.TextField(
+        blank=True, default='', validators=[validate_answer_prompt],
+        help_text="Overrides the default answer prompt; must use {context} and {input}"
+    )
     created_at = models.DateTimeField() # This is causing the error
 
     def __str__(self):
         return self.name
 
 @receiver(post_save, sender=Leader)
-def process_leader_pdf_to_faiss(sender, instance, **kwargs):
-    """Convert uploaded PDF to FAISS index and save as pickle file"""
-    if instance.pdf_file and not instance.pkl_file_path:
-        # Get the PDF file path
-        pdf_path = instance.pdf_file.path
-        
-        # Create directory for pickle files if it doesn't exist
-        pkl_folder = os.path.join(settings.MEDIA_ROOT, 'leader_pkl_files')
-        if not os.path.exists(pkl_folder):
-            os.makedirs(pkl_folder)
-        
-        # Generate pickle file path with leader name for better identification
-        base_filename = f"{instance.name.replace(' ', '_').lower()}"
-        pkl_filename = f"{base_filename}.pkl"
-        pkl_path = os.path.join(pkl_folder, pkl_filename)
-        
-        try:
-            # Load PDF
-            loader = PyPDFLoader(pdf_path)
-            documents = loader.load()
-            
-            # Check if documents were extracted
-            if not documents:
-                print(f"No documents found in PDF for {instance.name}. Skipping.")
-                return
-            
-            # Create FAISS index
-            model_name = "sentence-transformers/all-mpnet-base-v2"
-            embeddings = HuggingFaceEmbeddings(
-                model_name=model_name, 
-                encode_kwargs={"normalize_embeddings": True}
-            )
-            db = FAISS.from_documents(documents, embeddings)
-            
-            # Save as pickle file
-            with open(pkl_path, "wb") as f:
-                pickle.dump(db, f)
-            
-            # Update model with pickle file path (relative to MEDIA_ROOT)
-            relative_path = os.path.join('leader_pkl_files', pkl_filename)
-            instance.pkl_file_path = relative_path
-            # Using update to avoid triggering the signal again
-            Leader.objects.filter(id=instance.id).update(pkl_file_path=relative_path)
-            os.remove(pdf_path)
-            print(f"PDF file for {instance.name} has been deleted after successful processing")
-            
-            print(f"FAISS index created and saved for {instance.name} at {pkl_path}")
-            
-        except Exception as e:
-            print(f"Error processing PDF for {instance.name}: {e}")
+def enqueue_leader_pdf_ingestion(sender, instance, **kwargs):
+    """Turn a PDF uploaded on the leader into one of its documents"""
+    if instance.pdf_file:
+        name = instance.pdf_file.name
+        # Using update to avoid triggering the signal again
+        Leader.objects.filter(id=instance.id).update(pdf_file='')
+        instance.pdf_file = ''
+        LeaderDocument.objects.create(leader=instance, file=name, title=os.path.basename(name))
+
+@receiver(post_delete, sender=Leader)
+def evict_leader_vector_store(sender, instance, **kwargs):
+    """Release the cached vector store and answers of a deleted leader"""
+    # Nothing is cached in a process that never loaded them
+    if services.is_loaded('vector_store_registry'):
+        services.vector_store_registry.invalidate(instance.id)
+    if services.is_loaded('answer_cache'):
+        services.answer_cache.invalidate(instance.id)
+
+class LeaderDocument(models.Model):
+    """A PDF in a leader's knowledge base; the leader's index covers all of them"""
+    leader = models.ForeignKey(Leader, on_delete=models.CASCADE, related_name='documents')
+    file = models.FileField(upload_to='leader_documents/', blank=True)
+    title = models.CharField(max_length=255, blank=True, default='')
+    # SHA-256 of the file when it was last chunked; re-uploads with the same hash are dropped
+    content_hash = models.CharField(max_length=64, blank=True, default='', editable=False)
+    # [{"hash": chunk text SHA-256, "metadata": {...}}, ...] in index row order
+    chunks = models.JSONField(default=list, blank=True, editable=False)
+    uploaded_at = models.DateTimeField(auto_now_add=True)
+    indexed_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return self.title or os.path.basename(self.file.name) or f"Document {self.id}"
+
+@receiver(pre_save, sender=LeaderDocument)
+def mark_replaced_leader_document(sender, instance, **kwargs):
+    """Mark a document whose file was replaced as not indexed, so it's chunked again"""
+    instance._replaced_file = None
+    if instance.pk is None:
+        return
+    previous = LeaderDocument.objects.filter(pk=instance.pk).values_list('file', flat=True).first()
+    if previous and previous != instance.file.name:
+        instance._replaced_file = previous
+        instance.content_hash = ''
+        instance.indexed_at = None
+        if not instance.file:
+            # The file was cleared; its chunks leave the index
+            instance.chunks = []
+
+@receiver(post_save, sender=LeaderDocument)
+def enqueue_leader_document_ingestion(sender, instance, **kwargs):
+    """Queue the leader's index for an update with the new or replaced document"""
+    replaced = getattr(instance, '_replaced_file', None)
+    if replaced:
+        instance._replaced_file = None
+        instance.file.storage.delete(replaced)
+    if (instance.file or replaced) and instance.indexed_at is None:
+        from .ingestion import enqueue_leader_ingestion
+        enqueue_leader_ingestion(instance.leader)
+
+@receiver(post_delete, sender=LeaderDocument)
+def remove_leader_document(sender, instance, **kwargs):
+    """Delete the file and take an indexed document's chunks out of the leader's index"""
+    if instance.file:
+        instance.file.delete(save=False)
+    if instance.chunks:
+        from .ingestion import enqueue_leader_ingestion
+        leader_id = instance.leader_id
+
+        def enqueue():
+            # Unless the leader itself was deleted along with its documents
+            leader = Leader.objects.filter(id=leader_id).first()
+            if leader is not None:
+                enqueue_leader_ingestion(leader)
+
+        transaction.on_commit(enqueue)
+
+class ChunkEmbedding(models.Model):
+    """A chunk's text and its embedding, addressed by the SHA-256 of the text"""
+    content_hash = models.CharField(max_length=64)
+    embedding_model = models.CharField(max_length=255)
+    text = models.TextField()
+    vector = models.BinaryField()  # float32
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['embedding_model', 'content_hash'], name='chunk_embedding_unique'),
+        ]
 
 class Chat(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chats', null=True)  # Temporarily allow null
     leader = models.ForeignKey(Leader, on_delete=models.CASCADE, related_name='chats')
     user_input = models.TextField()
     ai_response = models.TextField()
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(default=timezone.now)
     session_id = models.CharField(max_length=100)  # To group messages in a chat session
+    # Set for turns saved through the write-behind buffer, so replays don't duplicate them
+    turn_id = models.UUIDField(null=True, blank=True, unique=True, editable=False)
 
     class Meta:
         ordering = ['timestamp']
+        indexes = [
+            # A session's messages in order (history, condensing follow-ups)
+            models.Index(fields=['session_id', 'leader', 'user', 'timestamp'], name='chat_session_idx'),
+            # A user's sessions with their last message time and size, read from the index alone
+            models.Index(fields=['user', 'leader', 'session_id', 'timestamp'], name='chat_user_sessions_idx'),
+        ]
+
+    def __str__(self):
+        return f"Chat with {self.leader.name} at {self.timestamp}"
+
+class IngestionJob(models.Model):
+    """A queued PDF ingestion run; the database table is the job queue"""
+
+    class Status(models.TextChoices):
+        QUEUED = 'queued', 'Queued'
+        RUNNING = 'running', 'Running'
+        SUCCEEDED = 'succeeded', 'Succeeded'
+        FAILED = 'failed', 'Failed'
+
+    leader = models.ForeignKey(Leader, on_delete=models.CASCADE, related_name='ingestion_jobs')
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    error = models.TextField(blank=True, default='')
+    stats = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [models.Index(fields=['status', 'run_after'])]
 
     def __str__(self):
-        return f"Chat with {self.leader.name} at {self.timestamp}"
\ No newline at end of file
+        return f"Ingestion of {self.leader.name} ({self.status})"
@@ -0,0 +1,18 @@
+from rest_framework.pagination import CursorPagination
+
+
+class ChatHistoryPagination(CursorPagination):
+    """Keyset pages of chat messages, starting from the most recent.
+
+    Each page lists its messages oldest first, ready to render; ``next``
+    leads to older messages. Cursors seek on ``timestamp`` through the chat
+    indexes instead of counting or offsetting rows.
+    """
+    ordering = ('-timestamp', '-id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page = super().paginate_queryset(queryset, request, view)
+        return None if page is None else page[::-1]
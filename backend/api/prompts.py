@@ -0,0 +1,64 @@
+from django.core.exceptions import ValidationError
+
+# Prompt used to answer chat questions from a leader's retrieved context
+ANSWER_PROMPT_TEMPLATE = """You are a helpful assistant. Answer based ONLY on the context provided.
+
+RULES:
+- If the input is a polite message like 'thank you', respond politely and briefly.
+- If the question is unclear or too short, ask the user to rephrase.
+- Do NOT answer unrelated or hallucinated questions.
+- Only answer what's directly asked.
+- Do NOT list multiple Q&As unless explicitly asked.
+
+CONTEXT:
+{context}
+
+Question: {input}
+Answer:
+"""
+
+# Prompt used to propose follow-up questions after a chat turn
+SUGGESTION_PROMPT_TEMPLATE = """Based on the user's latest message and the provided context about the historical figure, generate 2-3 helpful follow-up questions that would naturally continue the conversation.
+
+The questions should:
+- Be directly related to the historical figure and context
+- Build upon the user's current inquiry
+- Be specific and engaging
+- Help users explore different aspects of the figure's life, work, or impact
+
+Context about the historical figure:
+{context}
+
+User's latest message: {latest_user_message}
+
+Generate exactly 2-3 follow-up questions, one per line, without numbering or bullet points:"""
+
+# Used offline to build a leader's bank of follow-up questions, one passage at a time
+BANK_QUESTIONS_PROMPT_TEMPLATE = """Read this passage about {leader}. Write {count} short questions a curious reader might ask that the passage answers.
+
+The questions should:
+- Name the people, places, events or dates they are about instead of using "he", "she" or "this"
+- Make sense on their own, without the passage
+- Be one per line, without numbering or bullet points
+
+Passage:
+{passage}
+
+Questions:"""
+
+# Put in front of the answer prompt when suggestions come with the answer
+FOLLOW_UP_MARKER = "Follow-up questions:"
+FOLLOW_UP_INSTRUCTIONS = f"""After your answer, write a line "{FOLLOW_UP_MARKER}" followed by 2-3 short, specific questions the user could ask next to explore the historical figure further, one per line, without numbering or bullet points.
+
+"""
+
+
+def validate_answer_prompt(value):
+    """A per-leader answer prompt must be a template over {context} and {input}"""
+    from langchain_core.prompts import ChatPromptTemplate
+    try:
+        variables = set(ChatPromptTemplate.from_template(value).input_variables)
+    except ValueError as e:
+        raise ValidationError(f"Invalid prompt template: {e}")
+    if variables != {'context', 'input'}:
+        raise ValidationError("The prompt must use exactly the {context} and {input} placeholders")
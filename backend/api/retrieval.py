@@ -0,0 +1,328 @@
+"""Hybrid keyword + vector retrieval for leader chats.
+
+BM25 weights of every chunk's terms are precomputed into a sparse matrix and
+stored next to the leader's FAISS index (``bm25.npz`` and
+``bm25.vocab.json``), so scoring a query is a sum over a few matrix columns.
+``LeaderRetriever`` merges the keyword and vector rankings with reciprocal
+rank fusion and can re-order the fused top ``rerank_top_n`` with a local
+cross-encoder. The time spent in each stage is recorded per leader.
+"""
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from typing import Any, List, Optional
+
+import numpy as np
+import scipy.sparse
+from django.conf import settings
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from .leader_index import _replace, read_manifest
+from .metrics import retrieval_stage_seconds
+from .models import Leader
+from .vectorstore import vector_store_registry
+
+logger = logging.getLogger(__name__)
+
+BM25_FILE = 'bm25.npz'
+BM25_VOCABULARY_FILE = 'bm25.vocab.json'
+
+TOKEN_PATTERN = re.compile(r"\w+")
+STOPWORDS = frozenset(
+    "a an and are as at be but by did do does for from had has have he her his how i in is it its "
+    "of on or she that the their them they this to was were what when where which who whom why "
+    "will with you your".split()
+)
+
+
+def tokenize(text):
+    """Lowercased word tokens without stopwords; numbers (years, dates) are kept"""
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class Bm25Index:
+    """Okapi BM25 over a leader's chunks, in index row order"""
+
+    def __init__(self, vocabulary, weights):
+        self.vocabulary = vocabulary
+        # (chunks x terms), column-compressed so a query reads only its terms' columns
+        self.weights = weights
+
+    def __len__(self):
+        return self.weights.shape[0]
+
+    @classmethod
+    def build(cls, texts, k1=1.5, b=0.75):
+        vocabulary = {}
+        rows, columns, frequencies, lengths = [], [], [], []
+        for row, text in enumerate(texts):
+            tokens = tokenize(text)
+            lengths.append(len(tokens))
+            for term, frequency in Counter(tokens).items():
+                rows.append(row)
+                columns.append(vocabulary.setdefault(term, len(vocabulary)))
+                frequencies.append(frequency)
+
+        count = len(texts)
+        rows = np.asarray(rows, dtype=np.int64)
+        columns = np.asarray(columns, dtype=np.int64)
+        frequencies = np.asarray(frequencies, dtype=np.float32)
+        lengths = np.asarray(lengths, dtype=np.float32)
+        average_length = lengths.mean() if count and lengths.mean() else 1.0
+
+        document_frequency = np.bincount(columns, minlength=len(vocabulary))
+        idf = np.log1p((count - document_frequency + 0.5) / (document_frequency + 0.5))
+        saturation = frequencies * (k1 + 1) / (
+            frequencies + k1 * (1 - b + b * lengths[rows] / average_length)
+        )
+        weights = scipy.sparse.csc_matrix(
+            ((idf[columns] * saturation).astype(np.float32), (rows, columns)),
+            shape=(count, len(vocabulary)),
+        )
+        return cls(vocabulary, weights)
+
+    def search(self, query, k):
+        """Return ``(rows, scores)`` of the ``k`` best matching chunks"""
+        columns = sorted({self.vocabulary[t] for t in tokenize(query) if t in self.vocabulary})
+        if not columns:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        scores = np.asarray(self.weights[:, columns].sum(axis=1)).ravel()
+        matching = np.flatnonzero(scores)
+        if len(matching) > k:
+            matching = matching[np.argpartition(-scores[matching], k - 1)[:k]]
+        order = matching[np.argsort(-scores[matching], kind='stable')]
+        return order, scores[order]
+
+    def save(self, directory, index_created_at):
+        def write_weights(path):
+            with open(path, 'wb') as f:
+                scipy.sparse.save_npz(f, self.weights)
+
+        def write_vocabulary(path):
+            terms = sorted(self.vocabulary, key=self.vocabulary.get)
+            with open(path, 'w') as f:
+                json.dump({'index_created_at': index_created_at, 'count': len(self), 'terms': terms}, f,
+                          ensure_ascii=False)
+
+        _replace(os.path.join(directory, BM25_FILE), write_weights)
+        _replace(os.path.join(directory, BM25_VOCABULARY_FILE), write_vocabulary)
+
+    @classmethod
+    def load(cls, directory, index_created_at):
+        """The saved index, or None if it is missing or was built for another index version"""
+        try:
+            with open(os.path.join(directory, BM25_VOCABULARY_FILE)) as f:
+                saved = json.load(f)
+            weights = scipy.sparse.load_npz(os.path.join(directory, BM25_FILE)).tocsc()
+        except FileNotFoundError:
+            return None
+        if saved.get('index_created_at') != index_created_at or weights.shape[0] != saved.get('count'):
+            return None
+        return cls({term: i for i, term in enumerate(saved['terms'])}, weights)
+
+
+def write_keyword_index(directory, texts, index_created_at):
+    """Build and save the BM25 index for chunk ``texts`` (in index row order)"""
+    index = Bm25Index.build(texts, k1=settings.BM25_K1, b=settings.BM25_B)
+    index.save(directory, index_created_at)
+    return index
+
+
+class KeywordIndexRegistry:
+    """Per-process cache of leaders' BM25 indexes.
+
+    Indexes are read from the leader's index directory. One that is missing
+    or stale (e.g. an index built before hybrid retrieval) is rebuilt from
+    the docstore and saved; legacy pickled stores get an in-memory index.
+    """
+
+    def __init__(self):
+        self._indexes = {}
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.builds = 0
+
+    def get(self, leader, db, index_version):
+        with self._lock:
+            cached = self._indexes.get(leader.id)
+            if cached is not None and cached[0] == index_version:
+                return cached[1]
+
+        directory = vector_store_registry.resolve_path(leader) if leader.index_path else None
+        created_at = read_manifest(directory).get('created_at') if directory else None
+        index = Bm25Index.load(directory, created_at) if directory else None
+        if index is not None and len(index) == db.index.ntotal:
+            with self._lock:
+                self.loads += 1
+        else:
+            texts = [
+                db.docstore.search(db.index_to_docstore_id[row]).page_content
+                for row in range(db.index.ntotal)
+            ]
+            index = Bm25Index.build(texts, k1=settings.BM25_K1, b=settings.BM25_B)
+            if directory:
+                index.save(directory, created_at)
+            with self._lock:
+                self.builds += 1
+        with self._lock:
+            self._indexes[leader.id] = (index_version, index)
+        return index
+
+    def invalidate(self, leader_id):
+        with self._lock:
+            self._indexes.pop(leader_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._indexes), 'loads': self.loads, 'builds': self.builds}
+
+
+class CrossEncoderReranker:
+    """Local cross-encoder, loaded on first use"""
+
+    def __init__(self, model_name):
+        self.model_name = model_name
+        self._model = None
+        self._failed = False
+        self._lock = threading.Lock()
+
+    def score(self, query, texts):
+        """Relevance of each text to ``query``, or None if the model is unavailable"""
+        model = self._load()
+        if model is None:
+            return None
+        return np.asarray(model.predict([(query, text) for text in texts]))
+
+    def _load(self):
+        if self._model is None and not self._failed:
+            with self._lock:
+                if self._model is None and not self._failed:
+                    try:
+                        from sentence_transformers import CrossEncoder
+                        self._model = CrossEncoder(self.model_name)
+                    except Exception as e:
+                        logger.warning("Error loading reranker %s, reranking disabled: %s", self.model_name, e)
+                        self._failed = True
+        return self._model
+
+    @property
+    def loaded(self):
+        return self._model is not None
+
+
+class RetrievalStats:
+    """Recent per-stage retrieval latencies, per leader"""
+
+    STAGES = ('vector', 'keyword', 'fusion', 'rerank', 'total')
+
+    def __init__(self, window=500):
+        self._timings = defaultdict(lambda: {stage: deque(maxlen=window) for stage in self.STAGES})
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, leader_id, timings):
+        with self._lock:
+            self._counts[leader_id] += 1
+            for stage, seconds in timings.items():
+                self._timings[leader_id][stage].append(seconds)
+        for stage, seconds in timings.items():
+            retrieval_stage_seconds.observe(seconds, stage)
+
+    def stats(self):
+        with self._lock:
+            leaders = {}
+            for leader_id, stages in self._timings.items():
+                summary = {'queries': self._counts[leader_id]}
+                for stage, samples in stages.items():
+                    if samples:
+                        ordered = sorted(samples)
+                        summary[f'{stage}_seconds_avg'] = sum(ordered) / len(ordered)
+                        summary[f'{stage}_seconds_p95'] = ordered[math.ceil(0.95 * len(ordered)) - 1]
+                leaders[str(leader_id)] = summary
+            return leaders
+
+
+class LeaderRetriever(BaseRetriever):
+    """Top ``k`` chunks for a question from a leader's vector (and keyword) index.
+
+    Both rankings contribute ``1 / (rrf_k + rank)`` per chunk to the fused
+    ranking, over their top ``candidates`` each. Without a keyword index
+    this is plain vector search.
+    """
+
+    db: Any
+    keyword_index: Optional[Any] = None
+    k: int = 3
+    candidates: int = 20
+    rrf_k: int = 60
+    rerank_top_n: int = 0
+    leader_id: Optional[int] = None
+
+    def _get_relevant_documents(self, query, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        if not self.db.index.ntotal:
+            return []
+        timings = {}
+        started = time.perf_counter()
+        fetch = max(self.k, self.rerank_top_n)
+        if self.keyword_index is not None:
+            fetch = max(fetch, self.candidates)
+
+        vector = np.asarray([self.db.embedding_function.embed_query(query)], dtype=np.float32)
+        _, ids = self.db.index.search(vector, min(fetch, self.db.index.ntotal))
+        rows = [int(row) for row in ids[0] if row >= 0]
+        timings['vector'] = time.perf_counter() - started
+
+        if self.keyword_index is not None:
+            stage = time.perf_counter()
+            keyword_rows, _ = self.keyword_index.search(query, fetch)
+            timings['keyword'] = time.perf_counter() - stage
+
+            stage = time.perf_counter()
+            fused = defaultdict(float)
+            for ranking in (rows, keyword_rows):
+                for rank, row in enumerate(ranking):
+                    fused[int(row)] += 1.0 / (self.rrf_k + rank + 1)
+            rows = sorted(fused, key=lambda row: (-fused[row], row))
+            timings['fusion'] = time.perf_counter() - stage
+
+        documents = [self.db.docstore.search(self.db.index_to_docstore_id[row]) for row in rows]
+        if self.rerank_top_n and len(documents) > 1:
+            stage = time.perf_counter()
+            head = documents[:self.rerank_top_n]
+            scores = reranker.score(query, [doc.page_content for doc in head])
+            if scores is not None:
+                documents = [head[i] for i in np.argsort(-scores, kind='stable')] + documents[len(head):]
+                timings['rerank'] = time.perf_counter() - stage
+
+        timings['total'] = time.perf_counter() - started
+        retrieval_stats.record(self.leader_id, timings)
+        return documents[:self.k]
+
+
+def build_retriever(leader, db, index_version):
+    """The retriever for a leader's current retrieval settings"""
+    keyword_index = None
+    if leader.retrieval_mode == Leader.RetrievalMode.HYBRID:
+        keyword_index = keyword_indexes.get(leader, db, index_version)
+    return LeaderRetriever(
+        db=db,
+        keyword_index=keyword_index,
+        k=leader.retrieval_k,
+        candidates=settings.HYBRID_CANDIDATES,
+        rrf_k=settings.HYBRID_RRF_K,
+        rerank_top_n=leader.rerank_top_n,
+        leader_id=leader.id,
+    )
+
+
+keyword_indexes = KeywordIndexRegistry()
+vector_store_registry.add_listener(keyword_indexes.invalidate)
+reranker = CrossEncoderReranker(settings.RERANKER_MODEL)
+retrieval_stats = RetrievalStats()
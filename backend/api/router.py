@@ -0,0 +1,189 @@
+"""Intent routing ahead of retrieval and generation.
+
+Acknowledgements, greetings, gibberish and messages a configured classifier
+recognises get a canned answer from ``IntentRouter.route`` without touching
+the vector store or Ollama. ``IntentRouter.check_relevance`` then turns away
+questions whose embedding is not close to anything in the leader's index.
+"""
+import logging
+import re
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+from django.conf import settings
+from django.utils.module_loading import import_string
+from langchain_community.vectorstores.utils import DistanceStrategy
+
+logger = logging.getLogger(__name__)
+
+ACKNOWLEDGEMENT = 'acknowledgement'
+GREETING = 'greeting'
+FAREWELL = 'farewell'
+TOO_SHORT = 'too_short'
+GIBBERISH = 'gibberish'
+OFF_TOPIC = 'off_topic'
+
+DEFAULT_PHRASES = {
+    ACKNOWLEDGEMENT: ["thanks", "thank you", "thanks a lot", "thank you so much", "ok", "okay",
+                      "cool", "hmm", "great", "nice", "got it"],
+    GREETING: ["hi", "hello", "hey", "hi there", "hello there", "good morning",
+               "good afternoon", "good evening"],
+    FAREWELL: ["bye", "goodbye", "bye bye", "see you", "good night"],
+}
+
+DEFAULT_RESPONSES = {
+    ACKNOWLEDGEMENT: "You're welcome!",
+    GREETING: "Hello! Ask me anything about {leader}.",
+    FAREWELL: "Goodbye! Come back whenever you have more questions about {leader}.",
+    TOO_SHORT: "Could you please rephrase your question?",
+    GIBBERISH: "Could you please rephrase your question?",
+    OFF_TOPIC: "I can only answer questions about {leader} from the documents I have. "
+               "Could you ask something related?",
+}
+
+PUNCTUATION_PATTERN = re.compile(r"[^\w\s']+")
+WORD_PATTERN = re.compile(r"[^\W\d_]+")
+VOWEL_PATTERN = re.compile(r"[aeiouy]", re.IGNORECASE)
+REPEATED_CHARACTER_PATTERN = re.compile(r"(.)\1{4,}")
+
+
+def normalize_message(text):
+    """Lowercase ``text`` without punctuation, for phrase table lookups"""
+    return ' '.join(PUNCTUATION_PATTERN.sub(' ', text.lower()).split())
+
+
+def is_gibberish(text):
+    """Heuristic: no words at all, long character runs, or mostly vowelless Latin words"""
+    words = WORD_PATTERN.findall(text)
+    if not words:
+        return not any(c.isdigit() for c in text)
+    if REPEATED_CHARACTER_PATTERN.search(text):
+        return True
+    latin = [w for w in words if w.isascii() and len(w) > 3]
+    vowelless = [w for w in latin if not VOWEL_PATTERN.search(w)]
+    return bool(latin) and len(vowelless) * 2 >= len(latin)
+
+
+class RouteDecision:
+    __slots__ = ('route', 'response', 'similarity')
+
+    def __init__(self, route, response, similarity=None):
+        self.route = route
+        self.response = response
+        self.similarity = similarity
+
+
+class IntentRouter:
+    """Answers trivial and off-topic messages without retrieval or an LLM call.
+
+    ``route`` checks, in order: the phrase table (exact match after
+    normalisation), messages shorter than ``min_length``, gibberish, and the
+    optional ``classifier(message, leader)``, which returns a route name from
+    ``responses`` or None. ``check_relevance`` runs once the question has
+    been embedded; a best match in the leader's index below
+    ``min_relevance`` cosine similarity is answered as off-topic (0 turns
+    this check off). Responses may use ``{leader}``; other braces are kept as written.
+    """
+
+    def __init__(self, phrases, responses, min_length=4, min_relevance=0.0, classifier=None):
+        self.phrases = {
+            normalize_message(phrase): route
+            for route, route_phrases in phrases.items()
+            for phrase in route_phrases
+        }
+        self.responses = responses
+        self.min_length = min_length
+        self.min_relevance = min_relevance
+        self.classifier = classifier
+        self._lock = threading.Lock()
+        self.messages = 0
+        self.routes = Counter()
+        self.route_seconds = 0.0
+
+    def route(self, message, leader):
+        """A canned RouteDecision for ``message``, or None to answer it normally"""
+        started = time.perf_counter()
+        route = self._match(message, leader)
+        with self._lock:
+            self.messages += 1
+            self.route_seconds += time.perf_counter() - started
+            if route is not None:
+                self.routes[route] += 1
+        return self._decision(route, leader) if route is not None else None
+
+    def check_relevance(self, db, vector, leader):
+        """An off-topic RouteDecision if nothing in ``db`` is close to ``vector``"""
+        if not self.min_relevance or vector is None:
+            return None
+        similarity = max_similarity(db, vector)
+        if similarity is None or similarity >= self.min_relevance:
+            return None
+        with self._lock:
+            self.routes[OFF_TOPIC] += 1
+        return self._decision(OFF_TOPIC, leader, similarity)
+
+    def stats(self):
+        with self._lock:
+            avoided = sum(self.routes.values())
+            return {
+                'messages': self.messages,
+                'routes': dict(self.routes),
+                'avoided_rate': avoided / self.messages if self.messages else 0.0,
+                'route_seconds_avg': self.route_seconds / self.messages if self.messages else 0.0,
+            }
+
+    def _match(self, message, leader):
+        normalized = normalize_message(message)
+        route = self.phrases.get(normalized)
+        if route is not None:
+            return route
+        if len(message.strip()) < self.min_length:
+            return TOO_SHORT
+        if is_gibberish(message):
+            return GIBBERISH
+        if self.classifier is not None:
+            try:
+                route = self.classifier(message, leader)
+            except Exception as e:
+                logger.exception("Error in intent classifier: %s", e)
+                return None
+            if route is not None and route not in self.responses:
+                logger.warning("Intent classifier returned unknown route %r", route)
+                return None
+            return route
+        return None
+
+    def _decision(self, route, leader, similarity=None):
+        # Operator-supplied text, so no str.format: a stray brace must not break every match
+        return RouteDecision(route, self.responses[route].replace('{leader}', leader.name), similarity)
+
+
+def max_similarity(db, vector):
+    """Cosine similarity of ``vector`` to its nearest neighbour in a FAISS store"""
+    if not db.index.ntotal:
+        return None
+    query = np.asarray([vector], dtype=np.float32)
+    scores, ids = db.index.search(query, 1)
+    if ids[0][0] < 0:
+        return None
+    try:
+        neighbour = db.index.reconstruct(int(ids[0][0]))
+    except RuntimeError:
+        # Index can't return stored vectors; assume normalised embeddings
+        score = float(scores[0][0])
+        if db.distance_strategy == DistanceStrategy.MAX_INNER_PRODUCT:
+            return score
+        return 1.0 - score / 2.0
+    norms = np.linalg.norm(query[0]) * np.linalg.norm(neighbour)
+    return float(query[0] @ neighbour / norms) if norms else 0.0
+
+
+intent_router = IntentRouter(
+    phrases={**DEFAULT_PHRASES, **settings.INTENT_PHRASES},
+    responses={**DEFAULT_RESPONSES, **settings.INTENT_RESPONSES},
+    min_length=settings.INTENT_MIN_LENGTH,
+    min_relevance=settings.INTENT_MIN_RELEVANCE,
+    classifier=import_string(settings.INTENT_CLASSIFIER) if settings.INTENT_CLASSIFIER else None,
+)
@@ -0,0 +1,252 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict, deque
+
+from django.conf import settings
+
+
+class QueueFull(Exception):
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """A request's place in the generation queue, and then its slot.
+
+    Wait with ``wait`` (threads) or ``wait_async`` (event loop), and always
+    ``release`` it, granted or not; it is also a context manager.
+    """
+
+    def __init__(self, scheduler, user_key, background=False):
+        self.scheduler = scheduler
+        self.user_key = user_key
+        self.background = background
+        self.enqueued_at = time.monotonic()
+        self.wait_seconds = None
+        self.granted = False
+        self.released = False
+        self._event = threading.Event()
+        self._futures = []
+
+    @property
+    def position(self):
+        """1-based place in the queue; 0 once the request holds a slot"""
+        return self.scheduler.position(self)
+
+    def wait(self, timeout=None):
+        return self._event.wait(timeout)
+
+    async def wait_async(self, timeout=None):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self.scheduler._lock:
+            if self.granted:
+                return True
+            self._futures.append((loop, future))
+        try:
+            await asyncio.wait_for(future, timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            with self.scheduler._lock:
+                if (loop, future) in self._futures:
+                    self._futures.remove((loop, future))
+
+    def release(self, timed_out=False):
+        self.scheduler._release(self, timed_out)
+
+    def _grant(self):
+        # Called with the scheduler lock held
+        self.granted = True
+        self.wait_seconds = time.monotonic() - self.enqueued_at
+        self._event.set()
+        for loop, future in self._futures:
+            loop.call_soon_threadsafe(_resolve, future)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(True)
+
+
+class GenerationScheduler:
+    """Admission control for LLM generations.
+
+    At most ``slots`` generations run at once in this process (the
+    per-backend limit times the number of Ollama replicas, divided between
+    the server's worker processes). Further requests wait in a bounded queue
+    served round robin across users, so one user's burst can't starve the
+    others. A request that finds the queue (or its user's share of it) full
+    is rejected with ``QueueFull`` right away.
+
+    Background work (suggestion bank builds) submits with ``background=True``:
+    it waits, unbounded, behind every interactive request and holds at most
+    ``background_slots`` slots at once.
+    """
+
+    def __init__(self, slots, max_queue, max_queue_per_user, max_wait, background_slots=1):
+        self.slots = slots
+        self.max_queue = max_queue
+        self.max_queue_per_user = max_queue_per_user
+        self.max_wait = max_wait
+        self.background_slots = background_slots
+        self.active = 0
+        self.background_active = 0
+        # user key -> deque of waiting tickets; the first user is served next
+        self._queues = OrderedDict()
+        self._queued = 0
+        self._background = deque()
+        self._lock = threading.Lock()
+        self._waits = deque(maxlen=1000)
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.cancelled = 0
+        self.completed = 0
+        self.peak_queued = 0
+
+    def submit(self, user_key, background=False):
+        """Queue a request; returns a Ticket or raises QueueFull (never for background work)"""
+        with self._lock:
+            ticket = Ticket(self, user_key, background)
+            if background:
+                self._background.append(ticket)
+                self._dispatch()
+                return ticket
+            if self.active < self.slots and not self._queued:
+                self.active += 1
+                self.admitted += 1
+                self._waits.append(0.0)
+                ticket._grant()
+                return ticket
+            waiting = self._queues.get(user_key)
+            if self._queued >= self.max_queue or (
+                waiting and len(waiting) >= self.max_queue_per_user
+            ):
+                self.rejected += 1
+                raise QueueFull(
+                    'The assistant is busy right now. Please try again shortly.',
+                    retry_after=self._retry_after(),
+                )
+            if waiting is None:
+                waiting = self._queues[user_key] = deque()
+            waiting.append(ticket)
+            self._queued += 1
+            self.admitted += 1
+            self.peak_queued = max(self.peak_queued, self._queued)
+            return ticket
+
+    def position(self, ticket):
+        with self._lock:
+            if ticket.granted or ticket.released:
+                return 0
+            if ticket.background:
+                return self._queued + self._background.index(ticket) + 1
+            users = list(self._queues.values())
+            mine = self._queues.get(ticket.user_key)
+            if mine is None or ticket not in mine:
+                return 0
+            index = mine.index(ticket)
+            rank = users.index(mine)
+            # Each round serves one ticket per user, in queue order
+            ahead = index + sum(
+                min(len(q), index + 1 if r < rank else index)
+                for r, q in enumerate(users) if r != rank
+            )
+            return ahead + 1
+
+    def _release(self, ticket, timed_out):
+        with self._lock:
+            if ticket.released:
+                return
+            ticket.released = True
+            if ticket.granted:
+                self.active -= 1
+                self.completed += 1
+                if ticket.background:
+                    self.background_active -= 1
+            elif ticket.background:
+                if ticket in self._background:
+                    self._background.remove(ticket)
+            else:
+                waiting = self._queues.get(ticket.user_key)
+                if waiting is not None and ticket in waiting:
+                    waiting.remove(ticket)
+                    self._queued -= 1
+                    if not waiting:
+                        del self._queues[ticket.user_key]
+                if timed_out:
+                    self.timed_out += 1
+                else:
+                    self.cancelled += 1
+                self._waits.append(time.monotonic() - ticket.enqueued_at)
+            self._dispatch()
+
+    def _dispatch(self):
+        while self.active < self.slots and self._queues:
+            user_key, waiting = next(iter(self._queues.items()))
+            ticket = waiting.popleft()
+            self._queued -= 1
+            if waiting:
+                self._queues.move_to_end(user_key)
+            else:
+                del self._queues[user_key]
+            self.active += 1
+            ticket._grant()
+            self._waits.append(ticket.wait_seconds)
+        # Background work only gets slots nobody is waiting for
+        while (self._background and self.active < self.slots
+               and self.background_active < self.background_slots):
+            self.active += 1
+            self.background_active += 1
+            self._background.popleft()._grant()
+
+    def _retry_after(self):
+        waits = sorted(self._waits)
+        typical = waits[len(waits) // 2] if waits else 0.0
+        return max(1, int(round(typical)) or 1)
+
+    def stats(self):
+        with self._lock:
+            waits = sorted(self._waits)
+            return {
+                'slots': self.slots,
+                'active': self.active,
+                'queued': self._queued,
+                'queued_users': len(self._queues),
+                'peak_queued': self.peak_queued,
+                'max_queue': self.max_queue,
+                'background_active': self.background_active,
+                'background_queued': len(self._background),
+                'admitted': self.admitted,
+                'rejected': self.rejected,
+                'timed_out': self.timed_out,
+                'cancelled': self.cancelled,
+                'completed': self.completed,
+                'wait_seconds_avg': sum(waits) / len(waits) if waits else 0.0,
+                'wait_seconds_p95': waits[int(0.95 * (len(waits) - 1))] if waits else 0.0,
+                'wait_seconds_max': waits[-1] if waits else 0.0,
+            }
+
+
+generation_scheduler = GenerationScheduler(
+    # Every server process has its own scheduler; together they stay within the total
+    slots=max(
+        1,
+        settings.GENERATION_SLOTS_PER_BACKEND * len(settings.OLLAMA_BASE_URLS)
+        // settings.GENERATION_WORKER_PROCESSES,
+    ),
+    max_queue=settings.GENERATION_QUEUE_SIZE,
+    max_queue_per_user=settings.GENERATION_QUEUE_PER_USER,
+    max_wait=settings.GENERATION_QUEUE_TIMEOUT,
+    background_slots=settings.GENERATION_BACKGROUND_SLOTS,
+)
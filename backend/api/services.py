@@ -0,0 +1,46 @@
+"""Lazy access to the shared ML-backed components.
+
+LangChain, FAISS and scipy take most of a second to import (and the
+embedding model pulls in torch on first use), which migrations, management
+commands and auth-only requests shouldn't pay for. Views and models reach
+these singletons as ``services.<name>``; the module defining one is only
+imported on first access. ``manage.py benchmark_import_time`` checks that
+startup stays within its budget.
+"""
+import importlib
+import sys
+
+# Exported name -> module (in this package) that defines it
+_EXPORTS = {
+    'answer_cache': 'answer_cache',
+    'chain_factory': 'chains',
+    'embedding_service': 'embeddings',
+    'intent_router': 'router',
+    'keyword_indexes': 'retrieval',
+    'OllamaUnavailable': 'llm',
+    'ollama_pool': 'llm',
+    'reranker': 'retrieval',
+    'retrieval_stats': 'retrieval',
+    'suggestion_banks': 'suggestion_bank',
+    'vector_store_registry': 'vectorstore',
+}
+
+
+def __getattr__(name):
+    try:
+        module = _EXPORTS[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+    value = getattr(importlib.import_module(f'.{module}', __package__), name)
+    # Later lookups are plain module attribute reads
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
+
+
+def is_loaded(name):
+    """Whether the module behind ``name`` has been imported in this process"""
+    return f'{__package__}.{_EXPORTS[name]}' in sys.modules
@@ -0,0 +1,167 @@
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+
+# Protocol 1 resends the whole answer so far on every token (legacy clients).
+# Protocol 2 sends only new text as coalesced deltas with resumable event ids.
+LEGACY_PROTOCOL = 1
+DELTA_PROTOCOL = 2
+
+
+def sse_event(data, event=None, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event is not None:
+        lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+
+class StreamReplayBuffer:
+    """Recently sent protocol 2 events, so a dropped client can resume.
+
+    Keeps the events of the last ``max_streams`` streams for ``ttl`` seconds.
+    Resuming is best-effort: the buffer is per process, and a stream whose
+    client dropped under WSGI stops generating, so it may never finish.
+    """
+
+    def __init__(self, max_streams, ttl):
+        self.max_streams = max_streams
+        self.ttl = ttl
+        self._streams = OrderedDict()
+        self._lock = threading.Lock()
+
+    def append(self, stream_id, seq, payload, final=False):
+        """Keep an event; ``final`` marks the stream's last one (``done`` or ``error``)"""
+        with self._lock:
+            stream = self._streams.get(stream_id)
+            if stream is None:
+                stream = self._streams[stream_id] = {'events': [], 'complete': False}
+                while len(self._streams) > self.max_streams:
+                    self._streams.popitem(last=False)
+            stream['events'].append((time.time(), seq, payload))
+            stream['complete'] = stream['complete'] or final
+
+    def events_after(self, stream_id, seq):
+        """``(events after seq, whether the stream finished)``, or None if the stream is unknown"""
+        with self._lock:
+            stream = self._streams.get(stream_id)
+            if not stream or stream['events'][-1][0] < time.time() - self.ttl:
+                return None
+            events = [payload for _, event_seq, payload in stream['events'] if event_seq > seq]
+            return events, stream['complete']
+
+
+replay_buffer = StreamReplayBuffer(
+    max_streams=settings.CHAT_STREAM_REPLAY_STREAMS,
+    ttl=settings.CHAT_STREAM_REPLAY_TTL,
+)
+
+
+def parse_last_event_id(value):
+    """Split a ``<stream id>:<seq>`` event id; returns (None, None) if malformed"""
+    stream_id, _, seq = (value or '').rpartition(':')
+    if not stream_id or not seq.isdigit():
+        return None, None
+    return stream_id, int(seq)
+
+
+class ChatStream:
+    """Encodes a chat answer as server-sent events for either protocol.
+
+    Protocol 2 buffers tokens and emits a ``delta`` event once
+    ``flush_interval`` seconds have passed or ``flush_bytes`` are pending;
+    every event carries an ``<stream id>:<seq>`` id for resumption.
+    """
+
+    def __init__(self, session_id, protocol=DELTA_PROTOCOL, flush_interval=None, flush_bytes=None):
+        self.session_id = session_id
+        self.protocol = protocol
+        self.flush_interval = settings.CHAT_STREAM_FLUSH_INTERVAL if flush_interval is None else flush_interval
+        self.flush_bytes = settings.CHAT_STREAM_FLUSH_BYTES if flush_bytes is None else flush_bytes
+        self.stream_id = uuid.uuid4().hex
+        self.content = ""
+        self._sent = 0
+        self._seq = 0
+        self._last_flush = time.monotonic()
+
+    @property
+    def content_type(self):
+        return 'text/event-stream' if self.protocol == DELTA_PROTOCOL else 'text/plain'
+
+    def token(self, text):
+        """Add generated text; returns the events to send now (maybe none)"""
+        self.content += text
+        if self.protocol != DELTA_PROTOCOL:
+            return [sse_event({'content': self.content, 'done': False, 'session_id': self.session_id})]
+        pending = len(self.content[self._sent:].encode('utf-8'))
+        if pending and (
+            pending >= self.flush_bytes
+            or time.monotonic() - self._last_flush >= self.flush_interval
+        ):
+            return [self._flush()]
+        return []
+
+    def done(self, final_content, **extra):
+        """Final event; ``final_content`` is the full answer (e.g. with citations)"""
+        if self.protocol != DELTA_PROTOCOL:
+            return [sse_event({'content': final_content, 'done': True, 'session_id': self.session_id, **extra})]
+        events = []
+        if final_content.startswith(self.content):
+            # Send whatever was added after the streamed text as a last delta
+            self.content = final_content
+            if len(self.content) > self._sent:
+                events.append(self._flush())
+            data = {'done': True, 'session_id': self.session_id, **extra}
+        else:
+            data = {'done': True, 'session_id': self.session_id, 'content': final_content, **extra}
+        events.append(self._event('done', data))
+        return events
+
+    def queued(self, position):
+        """Tell the client it is waiting for a generation slot"""
+        if self.protocol != DELTA_PROTOCOL:
+            # Legacy clients render ``content``, so keep it empty
+            return [sse_event({'content': '', 'done': False, 'queued': True, 'position': position,
+                               'session_id': self.session_id})]
+        return [self._event('queued', {'queued': True, 'position': position})]
+
+    def error(self, message, **extra):
+        if self.protocol != DELTA_PROTOCOL:
+            return [sse_event({'error': message, **extra})]
+        return [self._event('error', {'error': message, **extra})]
+
+    def _flush(self):
+        delta = self.content[self._sent:]
+        self._sent = len(self.content)
+        self._last_flush = time.monotonic()
+        return self._event('delta', {'delta': delta})
+
+    def _event(self, event, data):
+        self._seq += 1
+        payload = sse_event({**data, 'seq': self._seq}, event=event, event_id=f"{self.stream_id}:{self._seq}")
+        replay_buffer.append(self.stream_id, self._seq, payload, final=event in ('done', 'error'))
+        return payload
+
+
+def stream_protocol(data):
+    """Protocol requested by the client (``stream_protocol``), else the default"""
+    try:
+        protocol = int(data.get('stream_protocol', settings.CHAT_STREAM_PROTOCOL))
+    except (TypeError, ValueError):
+        protocol = settings.CHAT_STREAM_PROTOCOL
+    return protocol if protocol in (LEGACY_PROTOCOL, DELTA_PROTOCOL) else settings.CHAT_STREAM_PROTOCOL
+
+
+def event_stream_response(events, content_type):
+    response = StreamingHttpResponse(events, content_type=content_type)
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,299 @@
+"""Precomputed follow-up question banks, stored next to each leader's index.
+
+``build_suggestion_bank`` asks the LLM which questions a sample of the
+leader's chunks answer, embeds them and writes ``suggestions.npy``
+(normalised vectors) and then ``suggestions.json`` (the questions, their
+source pages and the index they were built from). At request time
+``SuggestionBankRegistry.suggest`` scores the whole bank against the latest
+message and the session's earlier questions with one matrix product, so
+suggestions come back without an LLM round trip.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.conf import settings
+
+from .embeddings import embedding_service, normalize_query
+from .history import recent_questions
+from .leader_index import _replace, manifest_path, open_leader_index, read_manifest
+from .prompts import BANK_QUESTIONS_PROMPT_TEMPLATE
+from .scheduler import generation_scheduler
+from .suggestions import BULLET_PATTERN
+from .vectorstore import vector_store_registry
+
+logger = logging.getLogger(__name__)
+
+BANK_FILE = 'suggestions.json'
+BANK_VECTORS_FILE = 'suggestions.npy'
+# Bank questions at least this similar count as the same question
+DUPLICATE_SIMILARITY = 0.95
+
+
+def _normalize_rows(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms, norms, 1.0)
+
+
+def parse_bank_questions(text):
+    """Questions from one LLM reply, one per line"""
+    questions = []
+    for line in text.split('\n'):
+        line = BULLET_PATTERN.sub('', line.strip()).strip(' *_"')
+        if line.endswith('?') and 10 <= len(line) <= 160:
+            questions.append(line)
+    return questions
+
+
+class SuggestionBank:
+    def __init__(self, questions, vectors, index_created_at):
+        self.questions = questions
+        self.vectors = vectors
+        self.index_created_at = index_created_at
+        self._keys = [normalize_query(q['question']) for q in questions]
+
+    def __len__(self):
+        return len(self.questions)
+
+    def rank(self, query_vectors, count=3, min_score=0.0, history_weight=0.3,
+             asked=(), asked_similarity=0.9, diversity_similarity=0.85):
+        """The ``count`` best questions for ``query_vectors`` (latest message first).
+
+        A question's score is its similarity to the latest message, blended
+        with its mean similarity to the earlier ones by ``history_weight``.
+        Questions that repeat one of the ``asked`` texts or a query, or one
+        already picked, are skipped; so is anything scoring below ``min_score``.
+        """
+        queries = _normalize_rows(query_vectors)
+        similarities = self.vectors @ queries.T
+        scores = similarities[:, 0]
+        if len(queries) > 1 and history_weight:
+            scores = (1 - history_weight) * scores + history_weight * similarities[:, 1:].mean(axis=1)
+        repeated = similarities.max(axis=1) >= asked_similarity
+        if asked:
+            asked = {normalize_query(text) for text in asked}
+            repeated |= np.fromiter((key in asked for key in self._keys), dtype=bool, count=len(self._keys))
+        scores = np.where(repeated, -np.inf, scores)
+
+        chosen = []
+        for i in np.argsort(-scores):
+            if scores[i] < min_score or len(chosen) == count:
+                break
+            if chosen and (self.vectors[chosen] @ self.vectors[i]).max() >= diversity_similarity:
+                continue
+            chosen.append(int(i))
+        return [(self.questions[i]['question'], float(scores[i])) for i in chosen]
+
+
+def bank_paths(directory):
+    return os.path.join(directory, BANK_FILE), os.path.join(directory, BANK_VECTORS_FILE)
+
+
+def read_suggestion_bank(directory):
+    """Load a leader's bank, or None if it has none, it predates the index or
+    it was embedded with another model than the current one"""
+    bank_path, vectors_path = bank_paths(directory)
+    try:
+        with open(bank_path) as f:
+            bank = json.load(f)
+        vectors = np.load(vectors_path)
+    except FileNotFoundError:
+        return None
+    if bank.get('index_created_at') != read_manifest(directory).get('created_at'):
+        # Built from a previous version of the index
+        return None
+    if bank.get('embedding_model') != embedding_service.model_name:
+        # Query vectors from another model can't be ranked against these
+        return None
+    if len(vectors) != len(bank['questions']):
+        return None
+    return SuggestionBank(bank['questions'], vectors, bank['index_created_at'])
+
+
+def generate_in_background(prompt):
+    """``ollama_pool.generate`` in a background generation slot, so chats go first"""
+    from .llm import ollama_pool
+
+    with generation_scheduler.submit('suggestion-bank', background=True) as ticket:
+        ticket.wait()
+        return ollama_pool.generate(prompt)
+
+
+def build_suggestion_bank(leader, generate=generate_in_background, chunks=40, per_chunk=3, workers=2):
+    """Generate, embed and write a leader's question bank; returns build stats.
+
+    ``generate(prompt)`` returns the LLM's completion; by default it
+    waits for a background slot of the generation scheduler. Up to ``chunks``
+    chunks, spread evenly over the index, are each asked for ``per_chunk``
+    questions.
+    """
+    if not leader.index_path:
+        raise ValueError(
+            f"{leader.name} has no index directory; run convert_leader_indexes first"
+        )
+    started = time.perf_counter()
+    directory = vector_store_registry.resolve_path(leader)
+    manifest = read_manifest(directory)
+    db = open_leader_index(directory)
+    total = db.index.ntotal
+    if not total:
+        raise ValueError(f"{leader.name}'s index is empty")
+    rows = np.unique(np.linspace(0, total - 1, min(chunks, total)).astype(int))
+    documents = [db.docstore.search(int(row)) for row in rows]
+
+    def questions_for(document):
+        prompt = BANK_QUESTIONS_PROMPT_TEMPLATE.format(
+            leader=leader.name, count=per_chunk, passage=document.page_content
+        )
+        try:
+            return parse_bank_questions(generate(prompt))[:per_chunk]
+        except Exception as e:
+            logger.warning("Error generating bank questions for %s: %s", leader.name, e)
+            return []
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        replies = list(executor.map(questions_for, documents))
+    generated = time.perf_counter()
+
+    candidates = {}
+    for document, questions in zip(documents, replies):
+        for question in questions:
+            candidates.setdefault(normalize_query(question), {
+                'question': question,
+                'source': os.path.basename(document.metadata.get('source') or ''),
+                'page': document.metadata.get('page'),
+            })
+    questions = list(candidates.values())
+    if not questions:
+        raise ValueError(f"The LLM produced no usable questions for {leader.name}")
+    vectors = _normalize_rows(embedding_service.embed_documents([q['question'] for q in questions]))
+
+    # Drop near-duplicates, keeping the first of each group
+    similarities = np.triu(vectors @ vectors.T, k=1)
+    keep = ~(similarities >= DUPLICATE_SIMILARITY).any(axis=0)
+    questions = [q for q, kept in zip(questions, keep) if kept]
+    vectors = vectors[keep]
+
+    bank_path, vectors_path = bank_paths(directory)
+
+    def write_vectors(path):
+        with open(path, 'wb') as f:
+            np.save(f, vectors)
+
+    def write_bank(path):
+        with open(path, 'w') as f:
+            json.dump({
+                'index_created_at': manifest.get('created_at'),
+                'embedding_model': embedding_service.model_name,
+                'questions': questions,
+            }, f, indent=2, ensure_ascii=False)
+
+    # The JSON file goes last; a reader catching old questions with new vectors sees their counts differ
+    _replace(vectors_path, write_vectors)
+    _replace(bank_path, write_bank)
+    suggestion_banks.invalidate(leader.id)
+
+    return {
+        'chunks': len(documents),
+        'questions': len(questions),
+        'generate_seconds': round(generated - started, 3),
+        'total_seconds': round(time.perf_counter() - started, 3),
+    }
+
+
+class SuggestionBankRegistry:
+    """Per-process cache of loaded suggestion banks.
+
+    A bank is reloaded when its file changes and ignored when it was built
+    for an older version of the leader's index or another embedding model. ``suggest`` returns None
+    (use the LLM instead) when there is no bank or nothing in it scores at
+    least ``min_score``.
+    """
+
+    def __init__(self, enabled, min_score, history_weight, history_turns):
+        self.enabled = enabled
+        self.min_score = min_score
+        self.history_weight = history_weight
+        self.history_turns = history_turns
+        self._banks = {}
+        self._lock = threading.Lock()
+        self.served = 0
+        self.fallbacks = 0
+        self.loads = 0
+        self.rank_seconds = 0.0
+
+    def get(self, leader):
+        if not leader.index_path:
+            return None
+        directory = vector_store_registry.resolve_path(leader)
+        try:
+            # A rebuilt index makes its old bank stale even if the bank file is unchanged
+            version = (
+                os.stat(bank_paths(directory)[0]).st_mtime_ns,
+                os.stat(manifest_path(directory)).st_mtime_ns,
+                embedding_service.model_name,
+            )
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            cached = self._banks.get(leader.id)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+        try:
+            bank = read_suggestion_bank(directory)
+        except (OSError, ValueError) as e:
+            logger.warning("Error loading the suggestion bank for %s: %s", leader.name, e)
+            bank = None
+        with self._lock:
+            self._banks[leader.id] = (version, bank)
+            self.loads += 1
+        return bank
+
+    def suggest(self, leader, user, session_id, latest_user_message, count=3):
+        """Up to ``count`` bank questions for the conversation, or None"""
+        bank = self.get(leader) if self.enabled else None
+        if not bank:
+            with self._lock:
+                self.fallbacks += 1
+            return None
+        history = recent_questions(user, leader, session_id, self.history_turns) if session_id else []
+        started = time.perf_counter()
+        queries = [latest_user_message] + history
+        ranked = bank.rank(
+            embedding_service.embed_queries(queries), count=count, min_score=self.min_score,
+            history_weight=self.history_weight, asked=queries
+        )
+        with self._lock:
+            self.rank_seconds += time.perf_counter() - started
+            if len(ranked) < 2:
+                self.fallbacks += 1
+                return None
+            self.served += 1
+        return [question for question, _ in ranked]
+
+    def invalidate(self, leader_id):
+        with self._lock:
+            self._banks.pop(leader_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'served': self.served,
+                'fallbacks': self.fallbacks,
+                'loads': self.loads,
+                'banks': sum(1 for _, bank in self._banks.values() if bank is not None),
+                'rank_seconds_avg': self.rank_seconds / self.served if self.served else 0.0,
+            }
+
+
+suggestion_banks = SuggestionBankRegistry(
+    enabled=settings.SUGGESTION_BANK_ENABLED,
+    min_score=settings.SUGGESTION_BANK_MIN_SCORE,
+    history_weight=settings.SUGGESTION_BANK_HISTORY_WEIGHT,
+    history_turns=settings.CHAT_HISTORY_TURNS,
+)
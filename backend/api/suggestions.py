@@ -0,0 +1,104 @@
+import re
+
+from .prompts import FOLLOW_UP_MARKER
+
+
+def fallback_suggestions(leader_name):
+    return [
+        f"What were {leader_name}'s major achievements?",
+        f"How did {leader_name} influence their era?",
+        f"What challenges did {leader_name} face?"
+    ]
+
+
+def parse_suggestions(result, leader_name):
+    """Turn the LLM's one-question-per-line output into 2-3 suggestions"""
+    # Parse the suggestions (split by newlines and clean up)
+    suggestions = [
+        line.strip()
+        for line in result.strip().split('\n')
+        if line.strip() and not line.strip().startswith(('-', '*', '•'))
+    ]
+
+    # Ensure we have 2-3 suggestions
+    suggestions = suggestions[:3]  # Limit to max 3
+
+    # Fallback suggestions if AI didn't generate proper ones
+    if len(suggestions) < 2:
+        suggestions = fallback_suggestions(leader_name)
+    return suggestions
+
+
+BULLET_PATTERN = re.compile(r"^(?:[-*•]+|\d+[.)])\s*")
+# Formatting a model may put around the follow-up marker ("**Follow-up questions:**")
+MARKER_FORMATTING = ' \t\r\n*#_'
+
+
+class FollowUpSplitter:
+    """Separates a streamed answer from the follow-up questions after it.
+
+    ``feed`` returns the text that is safe to show; anything that may be the
+    start of ``FOLLOW_UP_MARKER`` is held back until it turns out not to be.
+    After ``finish``, ``answer`` is the answer alone and ``follow_ups`` the
+    raw text after the marker.
+    """
+
+    def __init__(self):
+        self.text = ''
+        self.answer = None
+        self.follow_ups = ''
+        self._marker = FOLLOW_UP_MARKER.lower()
+        self._emitted = 0
+        self._marker_at = None
+
+    def feed(self, token):
+        self.text += token
+        if self._marker_at is not None:
+            return ''
+        lowered = self.text.lower()
+        self._marker_at = lowered.find(self._marker, self._emitted)
+        if self._marker_at < 0:
+            self._marker_at = None
+            end = len(self.text)
+            for size in range(min(len(self._marker) - 1, end - self._emitted), 0, -1):
+                if self._marker.startswith(lowered[end - size:]):
+                    end -= size
+                    break
+        else:
+            end = self._marker_at
+        end = max(len(self.text[:end].rstrip(MARKER_FORMATTING)), self._emitted)
+        chunk = self.text[self._emitted:end]
+        self._emitted = end
+        return chunk
+
+    def finish(self):
+        """Return the rest of the answer that was held back"""
+        if self._marker_at is None:
+            self.answer = self.text.rstrip()
+        else:
+            self.answer = self.text[:self._marker_at].rstrip(MARKER_FORMATTING)
+            self.follow_ups = self.text[self._marker_at + len(self._marker):]
+        rest = self.answer[self._emitted:]
+        self._emitted = max(self._emitted, len(self.answer))
+        return rest
+
+
+def parse_follow_ups(text, leader_name):
+    """2-3 follow-up questions from the text after the marker (bullets and numbers allowed)"""
+    suggestions = []
+    for line in text.split('\n'):
+        line = BULLET_PATTERN.sub('', line.strip()).strip(' *_"')
+        if line:
+            suggestions.append(line)
+    suggestions = suggestions[:3]
+    if len(suggestions) < 2:
+        suggestions = fallback_suggestions(leader_name)
+    return suggestions
+
+
+def split_follow_ups(text, leader_name):
+    """Return ``(answer, suggestions)`` for a complete fused response"""
+    splitter = FollowUpSplitter()
+    splitter.feed(text)
+    splitter.finish()
+    return splitter.answer, parse_follow_ups(splitter.follow_ups, leader_name)
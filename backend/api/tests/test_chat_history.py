@@ -0,0 +1,96 @@
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.models import Chat, Leader
+
+
+class ChatHistoryTestCase(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email='reader@example.com', first_name='R', password='x')
+        self.leader = Leader.objects.create(name='Kannagi', bio='x', created_at=timezone.now())
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.started = timezone.now() - timedelta(days=1)
+
+    def chat(self, session_id, seconds, user=None, leader=None):
+        return Chat.objects.create(
+            user=user or self.user, leader=leader or self.leader, user_input=f'Question {seconds}',
+            ai_response='...', session_id=session_id, timestamp=self.started + timedelta(seconds=seconds),
+        )
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def follow(self, page):
+        """Path and query of a page's ``next`` link"""
+        parts = urlsplit(page['next'])
+        return f'{parts.path}?{parts.query}'
+
+
+class ChatHistoryPaginationTests(ChatHistoryTestCase):
+    def test_pages_go_back_in_time_and_read_oldest_first(self):
+        for i in range(5):
+            self.chat('s', i)
+        self.chat('other', 10)
+        page = self.get(f'/api/leaders/{self.leader.id}/chat_history/?session_id=s&page_size=2')
+        self.assertEqual([c['user_input'] for c in page['results']], ['Question 3', 'Question 4'])
+        self.assertIsNone(page['previous'])
+
+        page = self.get(self.follow(page))
+        self.assertEqual([c['user_input'] for c in page['results']], ['Question 1', 'Question 2'])
+        page = self.get(self.follow(page))
+        self.assertEqual([c['user_input'] for c in page['results']], ['Question 0'])
+        self.assertIsNone(page['next'])
+
+    def test_session_is_required(self):
+        response = self.client.get(f'/api/leaders/{self.leader.id}/chat_history/')
+        self.assertEqual(response.status_code, 400)
+
+
+class ChatSessionsTests(ChatHistoryTestCase):
+    def sessions(self, url):
+        names = []
+        while url:
+            page = self.get(url)
+            names += [session['session_id'] for session in page['results']]
+            url = page['next'] and self.follow(page)
+        return names
+
+    def test_sessions_are_summarised_most_recent_first(self):
+        self.chat('a', 0)
+        self.chat('a', 5)
+        self.chat('b', 3)
+        self.chat('mine-not', 9, user=get_user_model().objects.create_user(
+            email='other@example.com', first_name='O', password='x'))
+        results = self.get('/api/chats/sessions/')['results']
+        self.assertEqual([(s['session_id'], s['message_count']) for s in results], [('a', 2), ('b', 1)])
+        self.assertLess(results[0]['first_message_at'], results[0]['last_message_at'])
+
+    def test_pages_keep_sessions_that_share_a_timestamp(self):
+        for session_id in ('a', 'b', 'c', 'd', 'e'):
+            self.chat(session_id, 1)
+        self.chat('newest', 2)
+        self.chat('oldest', 0)
+        self.assertEqual(
+            self.sessions('/api/chats/sessions/?limit=2'),
+            ['newest', 'a', 'b', 'c', 'd', 'e', 'oldest'],
+        )
+
+    def test_leader_filter(self):
+        other = Leader.objects.create(name='Bharati', bio='x', created_at=timezone.now())
+        self.chat('a', 0)
+        self.chat('b', 1, leader=other)
+        self.assertEqual(self.sessions(f'/api/chats/sessions/?leader={other.id}'), ['b'])
+        self.assertEqual(self.client.get('/api/chats/sessions/?leader=x').status_code, 400)
+
+    def test_bad_before_is_rejected(self):
+        for before in ('yesterday', '2024-13-40T00:00'):
+            response = self.client.get('/api/chats/sessions/', {'before': before})
+            self.assertEqual(response.status_code, 400)
@@ -0,0 +1,129 @@
+import json
+import os
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files import File
+from django.test import TestCase
+from django.utils import timezone
+
+from api.chunk_store import file_hash
+from api.models import IngestionJob, Leader
+
+from .utils import PDF_DIR, add_document, offline_settings, sync_leader_index
+
+
+@offline_settings
+class LeaderDocumentTests(TestCase):
+    def setUp(self):
+        self.leader = Leader.objects.create(name='Kannagi', bio='x', created_at=timezone.now())
+
+    def index_count(self):
+        from api.leader_index import read_manifest
+
+        path = os.path.join(settings.MEDIA_ROOT, Leader.objects.get(id=self.leader.id).index_path)
+        return read_manifest(path)['count']
+
+    def queued_jobs(self):
+        return IngestionJob.objects.filter(leader=self.leader, status=IngestionJob.Status.QUEUED).count()
+
+    def test_upload_queues_ingestion(self):
+        add_document(self.leader, 'Kannagi_en.docx.pdf')
+        self.assertEqual(self.queued_jobs(), 1)
+        stats = sync_leader_index(self.leader)
+        self.assertEqual(stats['index_update'], 'rebuilt')
+        self.assertGreater(stats['chunks_embedded'], 0)
+
+    def test_identical_upload_is_dropped(self):
+        add_document(self.leader, 'Kannagi_en.docx.pdf')
+        sync_leader_index(self.leader)
+        add_document(self.leader, 'Kannagi_en.docx.pdf', 'again.pdf')
+        stats = sync_leader_index(self.leader)
+        self.assertEqual(stats['duplicates_dropped'], 1)
+        self.assertEqual(stats['index_update'], 'unchanged')
+        self.assertEqual(self.leader.documents.count(), 1)
+
+    def test_replacing_file_reindexes_document(self):
+        document = add_document(self.leader, 'Kannagi_en.docx.pdf')
+        sync_leader_index(self.leader)
+        document.refresh_from_db()
+        old_path = document.file.path
+        old_chunks = document.chunks
+
+        with open(os.path.join(PDF_DIR, 'Subramania Bharati.pdf'), 'rb') as f:
+            document.file.save('bharati.pdf', File(f))
+
+        document.refresh_from_db()
+        self.assertFalse(os.path.exists(old_path))
+        self.assertIsNone(document.indexed_at)
+        self.assertEqual(self.queued_jobs(), 1)
+
+        stats = sync_leader_index(self.leader)
+        document.refresh_from_db()
+        self.assertEqual(stats['documents_updated'], 1)
+        self.assertEqual(stats['index_update'], 'rebuilt')
+        self.assertEqual(document.content_hash, file_hash(document.file))
+        self.assertNotEqual(document.chunks, old_chunks)
+
+    def test_replacing_file_with_a_later_documents_content_drops_it(self):
+        first = add_document(self.leader, 'Kannagi_en.docx.pdf')
+        add_document(self.leader, 'Subramania Bharati.pdf')
+        sync_leader_index(self.leader)
+        count = self.index_count()
+
+        with open(os.path.join(PDF_DIR, 'Subramania Bharati.pdf'), 'rb') as f:
+            first.file.save('bharati-again.pdf', File(f))
+        stats = sync_leader_index(self.leader)
+        self.assertEqual(stats['duplicates_dropped'], 1)
+        self.assertEqual(self.leader.documents.count(), 1)
+        self.assertLess(self.index_count(), count)
+        self.assertEqual(self.index_count(), len(self.leader.documents.get().chunks))
+
+    def test_clearing_file_removes_chunks(self):
+        document = add_document(self.leader, 'Kannagi_en.docx.pdf')
+        sync_leader_index(self.leader)
+        document.file = ''
+        document.save()
+        self.assertEqual(self.queued_jobs(), 1)
+        stats = sync_leader_index(self.leader)
+        self.assertEqual(stats['index_update'], 'removed')
+        self.assertIsNone(Leader.objects.get(id=self.leader.id).index_path)
+
+    def test_changing_index_type_rebuilds_from_stored_vectors(self):
+        add_document(self.leader, 'Kannagi_en.docx.pdf')
+        sync_leader_index(self.leader)
+        Leader.objects.filter(id=self.leader.id).update(index_type=Leader.IndexType.SQ8)
+        stats = sync_leader_index(self.leader)
+        self.assertEqual((stats['index_update'], stats['index_type']), ('rebuilt', 'sq8'))
+        self.assertEqual(stats['chunks_embedded'], 0)
+
+
+@offline_settings
+class RebuildIndexesActionTests(TestCase):
+    def setUp(self):
+        admin = get_user_model().objects.create_superuser(email='admin@example.com', first_name='A', password='x')
+        self.client.force_login(admin)
+        self.leader = Leader.objects.create(name='Bharati', bio='x', created_at=timezone.now())
+        add_document(self.leader, 'Subramania Bharati.pdf')
+        sync_leader_index(self.leader)
+
+    def rebuild(self):
+        return self.client.post(
+            '/admin/api/leader/', {'action': 'rebuild_indexes', '_selected_action': [self.leader.id]}, follow=True
+        )
+
+    def test_queues_ingestion_job(self):
+        response = self.rebuild()
+        self.assertContains(response, "Queued 1 leader(s) for reindexing")
+        self.assertTrue(IngestionJob.objects.filter(leader=self.leader, status=IngestionJob.Status.QUEUED).exists())
+
+    def test_reports_unsupported_index_format(self):
+        path = os.path.join(settings.MEDIA_ROOT, Leader.objects.get(id=self.leader.id).index_path, 'manifest.json')
+        with open(path) as f:
+            manifest = json.load(f)
+        with open(path, 'w') as f:
+            json.dump({**manifest, 'format_version': 999}, f)
+
+        response = self.rebuild()
+        self.assertContains(response, "Unsupported index format 999")
+        self.assertFalse(IngestionJob.objects.filter(leader=self.leader, status=IngestionJob.Status.QUEUED).exists())
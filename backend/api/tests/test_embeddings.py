@@ -0,0 +1,52 @@
+import json
+import os
+import tempfile
+from unittest import mock
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from api.fake_embeddings import FAKE_EMBEDDING_MODEL, WordTokenizer
+
+
+class QueryCacheKeyTests(SimpleTestCase):
+    def service(self):
+        from api.embeddings import EmbeddingService, QueryEmbeddingCache
+
+        cache = QueryEmbeddingCache(FAKE_EMBEDDING_MODEL, max_entries=10)
+        return EmbeddingService(FAKE_EMBEDDING_MODEL, batch_size=8, query_cache=cache)
+
+    def test_normalize_query(self):
+        from api.embeddings import normalize_query
+
+        self.assertEqual(normalize_query('  Who was\n NETAJI? '), 'who was netaji?')
+        self.assertEqual(normalize_query('Who was  NETAJI?', casefold=False), 'Who was NETAJI?')
+
+    def test_uncased_model_shares_vectors_across_case(self):
+        service = self.service()
+        with mock.patch.object(service, '_embed', wraps=service._embed) as embed:
+            service.embed_queries(['Who was Bharati?', 'who was bharati?'])
+        embed.assert_called_once_with('queries', ['Who was Bharati?'])
+        self.assertEqual(service.query_cache.stats()['entries'], 1)
+
+    def test_cased_model_embeds_original_text(self):
+        service = self.service()
+        with mock.patch.object(WordTokenizer, 'do_lower_case', False), \
+                mock.patch.object(service, '_embed', wraps=service._embed) as embed:
+            service.embed_queries(['Who founded the INA?', 'who founded the ina?'])
+        embed.assert_called_once_with('queries', ['Who founded the INA?', 'who founded the ina?'])
+        self.assertEqual(service.query_cache.stats()['entries'], 2)
+
+    def test_cache_hits_do_not_load_the_model(self):
+        from api.embeddings import EmbeddingService, QueryEmbeddingCache
+
+        model_dir = tempfile.mkdtemp()
+        with open(os.path.join(model_dir, 'tokenizer_config.json'), 'w') as f:
+            json.dump({'do_lower_case': True}, f)
+        cache = QueryEmbeddingCache(model_dir, max_entries=10)
+        cache.put_many({'who was bharati?': np.array([0.6, 0.8], dtype=np.float32)})
+        service = EmbeddingService(model_dir, batch_size=8, query_cache=cache)
+        with mock.patch.object(service, '_model', side_effect=AssertionError('model loaded')):
+            [vector] = service.embed_queries(['Who was  Bharati?'])
+        self.assertEqual(vector, np.float32([0.6, 0.8]).tolist())
+        self.assertFalse(service.loaded)
@@ -0,0 +1,73 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from api.history import condense_question, is_self_contained, recent_questions
+from api.models import Chat, Leader
+
+
+class SelfContainedTests(SimpleTestCase):
+    def test_named_questions_stand_alone(self):
+        self.assertTrue(is_self_contained('Where was Bharati born?'))
+        self.assertTrue(is_self_contained('what did subramania bharati write?', 'Subramania Bharati'))
+        self.assertTrue(is_self_contained('What poems were written about freedom?'))
+
+    def test_follow_ups_need_history(self):
+        self.assertFalse(is_self_contained('What happened after that?'))
+        self.assertFalse(is_self_contained('And Gandhi?'))
+        self.assertFalse(is_self_contained('Why?'))
+
+
+@override_settings(CHAT_HISTORY_TURNS=3, CHAT_HISTORY_TOKEN_BUDGET=20)
+class CondenseQuestionTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email='reader@example.com', first_name='R', password='x')
+        self.leader = Leader.objects.create(name='Subramania Bharati', bio='x', created_at=timezone.now())
+        self.started = timezone.now()
+
+    def ask(self, *questions, session_id='s', user=None):
+        for i, question in enumerate(questions):
+            Chat.objects.create(
+                user=user or self.user, leader=self.leader, user_input=question, ai_response='...',
+                session_id=session_id, timestamp=self.started + timedelta(seconds=i),
+            )
+
+    def test_recent_questions_are_oldest_first(self):
+        self.ask('one', 'two', 'three', 'four')
+        self.ask('elsewhere', session_id='other')
+        self.assertEqual(recent_questions(self.user, self.leader, 's', 3), ['two', 'three', 'four'])
+
+    def test_follow_up_gets_previous_questions_newest_first(self):
+        self.ask('Where was he born?', 'Which newspapers did he edit?')
+        self.assertEqual(
+            condense_question(self.user, self.leader, 's', 'What happened after that?'),
+            'What happened after that? (following up on: Which newspapers did he edit? / Where was he born?)',
+        )
+
+    def test_history_stays_within_token_budget(self):
+        self.ask('x' * 200, 'Which newspapers did he edit?')
+        condensed = condense_question(self.user, self.leader, 's', 'And after that?')
+        self.assertEqual(condensed, 'And after that? (following up on: Which newspapers did he edit?)')
+
+    def test_overlong_previous_question_is_cut(self):
+        self.ask('word ' * 100)
+        condensed = condense_question(self.user, self.leader, 's', 'And then?')
+        self.assertEqual(condensed, f"And then? (following up on: {('word ' * 16).rstrip()})")
+
+    def test_self_contained_and_first_questions_are_unchanged(self):
+        self.assertEqual(condense_question(self.user, self.leader, 's', 'And then?'), 'And then?')
+        self.ask('Where was he born?')
+        question = 'Which newspapers did Bharati edit?'
+        self.assertEqual(condense_question(self.user, self.leader, 's', question), question)
+
+    def test_other_users_sessions_are_not_used(self):
+        other = get_user_model().objects.create_user(email='other@example.com', first_name='O', password='x')
+        self.ask('Where was he born?', user=other)
+        self.assertEqual(condense_question(self.user, self.leader, 's', 'And then?'), 'And then?')
+
+    @override_settings(CHAT_HISTORY_TURNS=0)
+    def test_disabled(self):
+        self.ask('Where was he born?')
+        self.assertEqual(condense_question(self.user, self.leader, 's', 'And then?'), 'And then?')
@@ -0,0 +1,88 @@
+import asyncio
+import json
+import os
+
+from django.conf import settings
+from django.test import TestCase
+from django.utils import timezone
+
+from api.models import Leader
+
+from .utils import add_document, offline_settings, sync_leader_index
+
+
+@offline_settings
+class OpenLeaderIndexTests(TestCase):
+    def setUp(self):
+        from api.leader_index import open_leader_index
+
+        leader = Leader.objects.create(name='Kannagi', bio='x', created_at=timezone.now())
+        add_document(leader, 'Kannagi_en.docx.pdf')
+        sync_leader_index(leader)
+        path = os.path.join(settings.MEDIA_ROOT, Leader.objects.get(id=leader.id).index_path)
+        self.db = open_leader_index(path)
+
+    def test_search_returns_chunks(self):
+        documents = self.db.similarity_search('Kannagi Madurai', k=2)
+        self.assertEqual(len(documents), 2)
+
+    def test_changes_are_refused_before_touching_the_index(self):
+        from api.leader_index import ReadOnlyIndexError
+
+        count = self.db.index.ntotal
+        with self.assertRaises(ReadOnlyIndexError):
+            self.db.add_texts(['A new passage'])
+        with self.assertRaises(ReadOnlyIndexError):
+            asyncio.run(self.db.aadd_texts(['A new passage']))
+        with self.assertRaises(ReadOnlyIndexError):
+            self.db.delete(['0'])
+        self.assertEqual(self.db.index.ntotal, count)
+
+
+@offline_settings
+class LeaderIndexBuildTests(TestCase):
+    def setUp(self):
+        self.leader = Leader.objects.create(name='Kannagi', bio='x', created_at=timezone.now())
+        add_document(self.leader, 'Kannagi_en.docx.pdf')
+        sync_leader_index(self.leader)
+        self.path = os.path.join(settings.MEDIA_ROOT, Leader.objects.get(id=self.leader.id).index_path)
+
+    def build_files(self):
+        return sorted(name for name in os.listdir(self.path) if name.startswith('index.'))
+
+    def test_new_build_keeps_the_previous_one_readable(self):
+        from api.leader_index import open_leader_index, read_manifest
+
+        first = read_manifest(self.path)
+        with open(os.path.join(self.path, 'manifest.json')) as f:
+            first_manifest = f.read()
+        add_document(self.leader, 'Subramania Bharati.pdf')
+        self.assertEqual(sync_leader_index(self.leader)['index_update'], 'extended')
+        second = read_manifest(self.path)
+        self.assertNotEqual(first['index_file'], second['index_file'])
+        self.assertGreater(second['count'], first['count'])
+
+        # A reader that got the old manifest still opens a consistent old build
+        with open(os.path.join(self.path, 'manifest.json'), 'w') as f:
+            f.write(first_manifest)
+        self.assertEqual(open_leader_index(self.path).index.ntotal, first['count'])
+
+    def test_builds_before_the_previous_are_removed(self):
+        from api.leader_index import read_manifest
+
+        add_document(self.leader, 'Subramania Bharati.pdf')
+        sync_leader_index(self.leader)
+        previous = read_manifest(self.path)['index_file']
+        Leader.objects.filter(id=self.leader.id).update(index_type=Leader.IndexType.SQ8)
+        sync_leader_index(self.leader)
+        self.assertEqual(self.build_files(), sorted([previous, read_manifest(self.path)['index_file']]))
+
+    def test_mismatched_build_is_refused(self):
+        from api.leader_index import IndexFormatError, open_leader_index, read_manifest
+
+        manifest = read_manifest(self.path)
+        manifest['count'] += 1
+        with open(os.path.join(self.path, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f)
+        with self.assertRaises(IndexFormatError):
+            open_leader_index(self.path, attempts=1)
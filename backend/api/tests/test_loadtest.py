@@ -0,0 +1,55 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+from django.test import SimpleTestCase
+
+from api.loadtest import LoadTest, sse_event_names
+from api.streaming import sse_event
+
+
+def stream_events(*events):
+    return ''.join(sse_event(data, event=name, event_id=f's:{i}') for i, (name, data) in enumerate(events))
+
+
+class LoadTestStreamTests(SimpleTestCase):
+    def run_stream(self, body, chunk_size=7):
+        async def send(request):
+            data = body.encode()
+            chunks = [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)]
+            return httpx.Response(200, content=_iterate(chunks), headers={'Content-Type': 'text/event-stream'})
+
+        async def run():
+            load_test = LoadTest([SimpleNamespace(id=1, name='Bharati')], [(None, 'token')], 1, 1)
+            async with httpx.AsyncClient(transport=httpx.MockTransport(send), base_url='http://test') as client:
+                return await load_test._stream(client, *load_test._request(0))
+
+        return asyncio.run(run())
+
+    def test_completed_stream_succeeds(self):
+        status, _, ttft, size = self.run_stream(stream_events(
+            ('queued', {'position': 1}), ('delta', {'delta': 'A poet'}), ('done', {'done': True}),
+        ))
+        self.assertEqual(status, 200)
+        self.assertIsNotNone(ttft)
+        self.assertGreater(size, 0)
+
+    def test_error_event_is_a_failure(self):
+        status, _, _, _ = self.run_stream(stream_events(
+            ('error', {'error': 'Could not reach Ollama'}), ('done', {'done': True}),
+        ))
+        self.assertEqual(status, 'stream_error')
+
+    def test_stream_without_done_is_a_failure(self):
+        status, _, _, _ = self.run_stream(stream_events(('delta', {'delta': 'A po'})))
+        self.assertEqual(status, 'stream_incomplete')
+
+    def test_event_names_keep_partial_events(self):
+        names, rest = sse_event_names(b'event: delta\ndata: {}\n\ndata: {}\n\nevent: do')
+        self.assertEqual(names, ['delta', 'message'])
+        self.assertEqual(rest, b'event: do')
+
+
+async def _iterate(chunks):
+    for chunk in chunks:
+        yield chunk
@@ -0,0 +1,50 @@
+from django.test import SimpleTestCase, override_settings
+
+from api.metrics import Gauge, _flatten, retrieval_stage_seconds
+
+
+class ComponentSampleTests(SimpleTestCase):
+    def test_cumulative_counts_are_counters(self):
+        samples = {}
+        stats = {
+            'hits': 3, 'entries': 2, 'routes': {'greeting': 1},
+            'queries': {'calls': 4, 'avg_seconds': 0.1, 'total_seconds': 0.4},
+            'backends': [{'requests': 5, 'in_flight': 1}],
+        }
+        _flatten('silai_cache', stats, (), samples)
+        self.assertEqual(dict(samples), {
+            ('silai_cache_hits_total', 'counter'): [((), 3)],
+            ('silai_cache_entries', 'gauge'): [((), 2)],
+            ('silai_cache_routes_greeting_total', 'counter'): [((), 1)],
+            ('silai_cache_queries_calls_total', 'counter'): [((), 4)],
+            ('silai_cache_queries_avg_seconds', 'gauge'): [((), 0.1)],
+            ('silai_cache_queries_seconds_total', 'counter'): [((), 0.4)],
+            ('silai_cache_backends_requests_total', 'counter'): [((('item', '0'),), 5)],
+            ('silai_cache_backends_in_flight', 'gauge'): [((('item', '0'),), 1)],
+        })
+
+    def test_retrieval_stages_have_their_own_histogram(self):
+        retrieval_stage_seconds.observe(0.002, 'keyword')
+        self.assertIn('silai_retrieval_stage_seconds_count{stage="keyword"}', '\n'.join(retrieval_stage_seconds.render()))
+
+    def test_gauge_render(self):
+        gauge = Gauge('silai_test', 'Test.', ('endpoint',))
+        gauge.add(2, 'chat')
+        self.assertEqual(gauge.render()[-1], 'silai_test{endpoint="chat"} 2')
+
+
+class MetricsEndpointTests(SimpleTestCase):
+    @override_settings(METRICS_TOKEN='', DEBUG=False)
+    def test_needs_token_outside_debug(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+
+    @override_settings(METRICS_TOKEN='', DEBUG=True)
+    def test_open_in_debug_without_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 200)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_checks_bearer_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('# TYPE silai_stage_seconds histogram', response.content.decode())
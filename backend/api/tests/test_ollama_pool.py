@@ -0,0 +1,83 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api import services
+from api.fake_ollama import FakeOllamaServer
+from api.llm import OllamaBackend, OllamaPool, OllamaUnavailable
+from api.models import Leader
+
+from .utils import add_document, offline_settings, sync_leader_index
+
+
+class OllamaOutage:
+    """A fake Ollama that can go down and come back on the same address"""
+
+    def __init__(self):
+        self.server = FakeOllamaServer(port=0, tokens_per_second=0).start()
+        self.port = self.server.server_address[1]
+        self.url = self.server.url
+
+    def go_down(self):
+        self.server.stop()
+
+    def come_back(self):
+        self.server = FakeOllamaServer(port=self.port, tokens_per_second=0).start()
+
+    def stop(self):
+        self.server.stop()
+
+
+class OllamaPoolRecoveryTests(SimpleTestCase):
+    def setUp(self):
+        self.ollama = OllamaOutage()
+        self.addCleanup(self.ollama.stop)
+        self.pool = OllamaPool(
+            [self.ollama.url], 'qwen2.5', connect_timeout=1, read_timeout=5, keep_alive='5m',
+            health_check_interval=0,
+        )
+        self.addCleanup(self.pool.close)
+
+    def test_recovers_after_transport_error(self):
+        self.ollama.go_down()
+        with self.assertRaises(OllamaUnavailable):
+            self.pool.generate('Hello')
+        self.assertFalse(self.pool.backends[0].healthy)
+
+        self.ollama.come_back()
+        self.assertTrue(self.pool.generate('Hello'))
+        self.assertTrue(self.pool.backends[0].healthy)
+
+
+@offline_settings
+class ChatRecoveryTests(TestCase):
+    def setUp(self):
+        self.ollama = OllamaOutage()
+        self.addCleanup(self.ollama.stop)
+        patcher = mock.patch.object(services.ollama_pool, 'backends', [OllamaBackend(self.ollama.url)])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.leader = Leader.objects.create(name='Kannagi', bio='x', created_at=timezone.now())
+        add_document(self.leader, 'Kannagi_en.docx.pdf')
+        sync_leader_index(self.leader)
+        user = get_user_model().objects.create_user(email='reader@example.com', first_name='R', password='x')
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def chat(self, message):
+        return self.client.post(
+            f'/api/leaders/{self.leader.id}/chat/', {'message': message, 'session_id': 's'}, format='json'
+        )
+
+    def test_chat_recovers_once_ollama_is_back(self):
+        self.ollama.go_down()
+        self.assertEqual(self.chat('Who was Kannagi?').status_code, 503)
+
+        self.ollama.come_back()
+        response = self.chat('Why did Kannagi go to Madurai?')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(services.ollama_pool.backends[0].healthy)
@@ -0,0 +1,106 @@
+import os
+import shutil
+import tempfile
+from types import SimpleNamespace
+
+import faiss
+import numpy as np
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from langchain_core.documents import Document
+
+from api.models import Leader
+
+from .utils import add_document, offline_settings, sync_leader_index
+
+TEXTS = [
+    'Kannagi was the wife of Kovalan.',
+    'Kovalan sold her anklet in Madurai.',
+    'The Pandya king wrongly executed him.',
+    'Bharati was born in Ettayapuram in 1882.',
+]
+
+
+class StubStore:
+    """A FAISS store whose query vector ranks the chunks in row order"""
+
+    def __init__(self, texts):
+        self.index = faiss.IndexFlatIP(len(texts))
+        self.index.add(np.eye(len(texts), dtype=np.float32))
+        self.docstore = SimpleNamespace(search=lambda row: Document(page_content=texts[row], metadata={'row': row}))
+        self.index_to_docstore_id = list(range(len(texts)))
+        query_vector = [1.0 / (row + 1) for row in range(len(texts))]
+        self.embedding_function = SimpleNamespace(embed_query=lambda query: query_vector)
+
+
+class Bm25IndexTests(SimpleTestCase):
+    def setUp(self):
+        from api.retrieval import Bm25Index
+
+        self.index = Bm25Index.build(TEXTS)
+
+    def test_search_ranks_rarer_terms_higher(self):
+        rows, scores = self.index.search('Where did Kovalan go in Madurai?', k=5)
+        self.assertEqual(list(rows), [1, 0])
+        self.assertGreater(scores[0], scores[1])
+
+    def test_numbers_are_terms_and_stopwords_are_not(self):
+        self.assertEqual(list(self.index.search('1882', k=5)[0]), [3])
+        self.assertEqual(len(self.index.search('the was in', k=5)[0]), 0)
+
+    def test_save_and_load(self):
+        from api.retrieval import Bm25Index
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.index.save(directory, 'v1')
+        self.assertIsNone(Bm25Index.load(directory, 'v2'))
+        loaded = Bm25Index.load(directory, 'v1')
+        self.assertEqual(list(loaded.search('Kovalan Madurai', k=5)[0]), list(self.index.search('Kovalan Madurai', k=5)[0]))
+
+
+class LeaderRetrieverTests(SimpleTestCase):
+    def retrieve(self, query, hybrid=True, **kwargs):
+        from api.retrieval import Bm25Index, LeaderRetriever
+
+        retriever = LeaderRetriever(
+            db=StubStore(TEXTS), keyword_index=Bm25Index.build(TEXTS) if hybrid else None, rrf_k=60, **kwargs
+        )
+        return [document.metadata['row'] for document in retriever.invoke(query)]
+
+    def test_keyword_search_finds_what_vectors_miss(self):
+        self.assertEqual(self.retrieve('Ettayapuram', hybrid=False, k=2, candidates=2), [0, 1])
+        self.assertEqual(self.retrieve('Ettayapuram', k=2, candidates=2), [0, 3])
+
+    def test_fusion_favours_chunks_both_rankings_found(self):
+        # Vectors rank 0, 1, 2, 3; keywords find only 1, which both rankings put near the top
+        self.assertEqual(self.retrieve('anklet', k=4, candidates=4), [1, 0, 2, 3])
+
+
+@offline_settings
+class KeywordIndexRegistryTests(TestCase):
+    def test_leader_indexed_before_hybrid_gets_a_keyword_index_on_first_use(self):
+        from api.retrieval import BM25_FILE, BM25_VOCABULARY_FILE, build_retriever, keyword_indexes
+        from api.vectorstore import vector_store_registry
+
+        leader = Leader.objects.create(name='Kannagi', bio='x', created_at=timezone.now())
+        add_document(leader, 'Kannagi_en.docx.pdf')
+        sync_leader_index(leader)
+        leader = Leader.objects.get(id=leader.id)
+        directory = os.path.join(settings.MEDIA_ROOT, leader.index_path)
+        for name in (BM25_FILE, BM25_VOCABULARY_FILE):
+            os.remove(os.path.join(directory, name))
+        keyword_indexes.invalidate(leader.id)
+        builds, loads = keyword_indexes.builds, keyword_indexes.loads
+
+        db, version = vector_store_registry.get_versioned(leader)
+        retriever = build_retriever(leader, db, version)
+        self.assertEqual(len(retriever.keyword_index), db.index.ntotal)
+        self.assertEqual(keyword_indexes.builds, builds + 1)
+        self.assertTrue(os.path.exists(os.path.join(directory, BM25_FILE)))
+        self.assertTrue(retriever.invoke('Where did Kannagi go?'))
+
+        keyword_indexes.invalidate(leader.id)
+        keyword_indexes.get(leader, db, version)
+        self.assertEqual(keyword_indexes.loads, loads + 1)
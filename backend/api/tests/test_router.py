@@ -0,0 +1,26 @@
+from types import SimpleNamespace
+
+from django.test import SimpleTestCase
+
+LEADER = SimpleNamespace(name='Kannagi')
+
+
+class IntentRouterTests(SimpleTestCase):
+    def router(self, **responses):
+        from api.router import DEFAULT_PHRASES, DEFAULT_RESPONSES, IntentRouter
+
+        return IntentRouter(DEFAULT_PHRASES, {**DEFAULT_RESPONSES, **responses})
+
+    def test_canned_routes(self):
+        router = self.router()
+        self.assertEqual(router.route('Thank you!', LEADER).route, 'acknowledgement')
+        self.assertEqual(router.route('hi', LEADER).response, 'Hello! Ask me anything about Kannagi.')
+        self.assertEqual(router.route('xkcdqwrtz bvnmplk', LEADER).route, 'gibberish')
+        self.assertIsNone(router.route('Why did Kannagi go to Madurai?', LEADER))
+
+    def test_operator_responses_may_contain_braces(self):
+        router = self.router(greeting='Vanakkam {friend}! {leader} answers {} questions in {0} ways {')
+        self.assertEqual(
+            router.route('hello', LEADER).response,
+            'Vanakkam {friend}! Kannagi answers {} questions in {0} ways {',
+        )
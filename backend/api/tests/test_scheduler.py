@@ -0,0 +1,54 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from api.scheduler import GenerationScheduler
+
+from .utils import offline_settings
+
+
+@offline_settings
+class BackgroundGenerationTests(SimpleTestCase):
+    def setUp(self):
+        self.scheduler = GenerationScheduler(
+            slots=2, max_queue=4, max_queue_per_user=2, max_wait=1, background_slots=1
+        )
+
+    def test_background_work_waits_behind_chats(self):
+        first = self.scheduler.submit('bank', background=True)
+        second = self.scheduler.submit('bank', background=True)
+        self.assertTrue(first.granted)
+        self.assertFalse(second.granted)  # only one background slot
+
+        chat = self.scheduler.submit('alice')
+        queued_chat = self.scheduler.submit('bob')
+        self.assertTrue(chat.granted)
+        self.assertFalse(queued_chat.granted)
+        self.assertEqual(second.position, 2)
+
+        # A freed slot goes to the waiting chat, not the queued background work
+        first.release()
+        self.assertTrue(queued_chat.granted)
+        self.assertFalse(second.granted)
+
+        chat.release()
+        self.assertTrue(second.granted)
+        stats = self.scheduler.stats()
+        self.assertEqual((stats['background_active'], stats['background_queued']), (1, 0))
+
+    def test_background_work_is_never_rejected(self):
+        tickets = [self.scheduler.submit('bank', background=True) for _ in range(10)]
+        self.assertEqual(sum(ticket.granted for ticket in tickets), 1)
+        self.assertEqual(self.scheduler.stats()['rejected'], 0)
+
+    def test_bank_generation_holds_a_background_slot(self):
+        from api import suggestion_bank
+
+        def generate(prompt):
+            self.assertEqual(self.scheduler.stats()['background_active'], 1)
+            return '- Who was Bharati?'
+
+        with mock.patch.object(suggestion_bank, 'generation_scheduler', self.scheduler), \
+                mock.patch('api.llm.ollama_pool.generate', side_effect=generate):
+            self.assertEqual(suggestion_bank.generate_in_background('prompt'), '- Who was Bharati?')
+        self.assertEqual(self.scheduler.stats()['background_active'], 0)
@@ -0,0 +1,95 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.models import Leader
+from api.streaming import LEGACY_PROTOCOL, ChatStream, parse_last_event_id
+
+
+def parse(events):
+    """``(event name, id, data)`` of each encoded event"""
+    parsed = []
+    for event in events:
+        fields = dict(line.split(': ', 1) for line in event.strip().split('\n'))
+        parsed.append((fields.get('event'), fields.get('id'), json.loads(fields['data'])))
+    return parsed
+
+
+class ChatStreamTests(SimpleTestCase):
+    def test_tokens_are_coalesced_until_flush_bytes(self):
+        stream = ChatStream('s', flush_interval=60, flush_bytes=10)
+        self.assertEqual(stream.token('Kannagi '), [])
+        [event] = stream.token('went to')
+        self.assertEqual(parse([event])[0][2]['delta'], 'Kannagi went to')
+        self.assertEqual(stream.token(' Madurai'), [])
+
+    def test_interval_flushes_pending_text(self):
+        stream = ChatStream('s', flush_interval=0, flush_bytes=1000)
+        self.assertEqual(parse(stream.token('Hi'))[0][2]['delta'], 'Hi')
+
+    def test_done_sends_the_rest_with_sequential_ids(self):
+        stream = ChatStream('s', flush_interval=60, flush_bytes=1000)
+        stream.token('Kannagi went')
+        events = parse(stream.queued(1) + stream.done('Kannagi went to Madurai. [1]', suggestions=['Why?']))
+        self.assertEqual([name for name, _, _ in events], ['queued', 'delta', 'done'])
+        self.assertEqual([data['seq'] for _, _, data in events], [1, 2, 3])
+        self.assertEqual([parse_last_event_id(event_id) for _, event_id, _ in events],
+                         [(stream.stream_id, seq) for seq in (1, 2, 3)])
+        self.assertEqual(events[1][2]['delta'], 'Kannagi went to Madurai. [1]')
+        self.assertNotIn('content', events[2][2])
+        self.assertEqual(events[2][2]['suggestions'], ['Why?'])
+
+    def test_rewritten_answer_is_sent_whole(self):
+        stream = ChatStream('s', flush_interval=0, flush_bytes=1)
+        stream.token('Draft')
+        [(name, _, data)] = parse(stream.done('Final answer'))
+        self.assertEqual((name, data['content']), ('done', 'Final answer'))
+
+    def test_legacy_protocol_resends_the_whole_answer(self):
+        stream = ChatStream('s', protocol=LEGACY_PROTOCOL)
+        stream.token('Kan')
+        [(name, event_id, data)] = parse(stream.token('nagi'))
+        self.assertEqual((name, event_id, data['content'], data['done']), (None, None, 'Kannagi', False))
+
+    def test_malformed_event_ids(self):
+        for value in (None, '', 'abc', 'abc:', ':3', 'abc:x'):
+            self.assertEqual(parse_last_event_id(value), (None, None))
+
+
+class ResumeStreamTests(TestCase):
+    def setUp(self):
+        leader = Leader.objects.create(name='Kannagi', bio='x', created_at=timezone.now())
+        user = get_user_model().objects.create_user(email='reader@example.com', first_name='R', password='x')
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+        self.url = f'/api/leaders/{leader.id}/chat/'
+
+    def resume(self, last_event_id):
+        response = self.client.post(
+            self.url, {'message': 'Who was Kannagi?', 'streaming': True}, format='json',
+            HTTP_LAST_EVENT_ID=last_event_id,
+        )
+        return parse(b''.join(response.streaming_content).decode().split('\n\n')[:-1])
+
+    def test_finished_stream_replays_missed_events(self):
+        stream = ChatStream('s', flush_interval=0, flush_bytes=1)
+        stream.token('Kannagi')
+        stream.token(' went to Madurai.')
+        stream.done('Kannagi went to Madurai.')
+        events = self.resume(f'{stream.stream_id}:1')
+        self.assertEqual([(name, data['seq']) for name, _, data in events], [('delta', 2), ('done', 3)])
+
+    def test_unfinished_stream_ends_with_an_error(self):
+        stream = ChatStream('s', flush_interval=0, flush_bytes=1)
+        stream.token('Kannagi')
+        stream.token(' went')
+        events = self.resume(f'{stream.stream_id}:1')
+        self.assertEqual([name for name, _, _ in events], ['delta', 'error'])
+        self.assertTrue(events[-1][2]['incomplete'])
+
+    def test_unknown_stream_cannot_be_resumed(self):
+        [(name, _, data)] = self.resume('0123abcd:4')
+        self.assertEqual((name, data['error']), ('error', 'Stream can no longer be resumed'))
@@ -0,0 +1,48 @@
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+
+from api.models import Leader
+
+from .utils import add_document, offline_settings, sync_leader_index
+
+QUESTIONS = [
+    'Why did Kannagi go to Madurai?',
+    'What did Kannagi do after Kovalan died?',
+    'Who was the king of Madurai?',
+]
+
+
+def fake_generate(prompt):
+    return '\n'.join(QUESTIONS)
+
+
+@offline_settings
+class SuggestionBankTests(TestCase):
+    def setUp(self):
+        from api.suggestion_bank import build_suggestion_bank
+
+        self.leader = Leader.objects.create(name='Kannagi', bio='x', created_at=timezone.now())
+        add_document(self.leader, 'Kannagi_en.docx.pdf')
+        sync_leader_index(self.leader)
+        self.leader = Leader.objects.get(id=self.leader.id)
+        build_suggestion_bank(self.leader, generate=fake_generate, chunks=3)
+
+    def test_bank_serves_suggestions(self):
+        from api.suggestion_bank import suggestion_banks
+
+        with mock.patch.object(suggestion_banks, 'min_score', -1.0):
+            suggestions = suggestion_banks.suggest(self.leader, None, None, 'Tell me about Madurai')
+        self.assertGreaterEqual(len(suggestions), 2)
+        self.assertTrue(set(suggestions) <= set(QUESTIONS))
+
+    def test_bank_from_another_embedding_model_is_ignored(self):
+        from api.embeddings import embedding_service
+        from api.suggestion_bank import suggestion_banks
+
+        self.assertIsNotNone(suggestion_banks.get(self.leader))
+        with mock.patch.object(embedding_service, 'model_name', 'fake-hashing-128'):
+            self.assertIsNone(suggestion_banks.get(self.leader))
+            self.assertIsNone(suggestion_banks.suggest(self.leader, None, None, 'Tell me about Madurai'))
+        self.assertIsNotNone(suggestion_banks.get(self.leader))
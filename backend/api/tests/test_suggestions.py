@@ -0,0 +1,50 @@
+from django.test import SimpleTestCase
+
+from api.suggestions import FollowUpSplitter, fallback_suggestions, parse_follow_ups, split_follow_ups
+
+
+def stream(tokens):
+    """Feed ``tokens`` one at a time; returns the splitter and every chunk shown"""
+    splitter = FollowUpSplitter()
+    chunks = [splitter.feed(token) for token in tokens]
+    chunks.append(splitter.finish())
+    return splitter, chunks
+
+
+class FollowUpSplitterTests(SimpleTestCase):
+    def test_marker_split_across_tokens_is_never_shown(self):
+        splitter, chunks = stream([
+            'Kannagi went to Madurai.', '\n\nFol', 'low-up ques', 'tions:', '\nWhy did she go?\nWho was Kovalan?',
+        ])
+        self.assertEqual(''.join(chunks), 'Kannagi went to Madurai.')
+        self.assertNotIn('Fol', ''.join(chunks))
+        self.assertEqual(splitter.answer, 'Kannagi went to Madurai.')
+        self.assertEqual(parse_follow_ups(splitter.follow_ups, 'Kannagi'), ['Why did she go?', 'Who was Kovalan?'])
+
+    def test_formatting_around_the_marker_is_dropped(self):
+        for marker in ('**Follow-up questions:**', '### Follow-up Questions:', '_follow-up questions:_'):
+            with self.subTest(marker=marker):
+                text = f'Kannagi went to Madurai.\n\n{marker}\n- Why did she go?\n2. Who was **Kovalan**?'
+                splitter, chunks = stream(list(text))
+                self.assertEqual(''.join(chunks), 'Kannagi went to Madurai.')
+                self.assertEqual(
+                    parse_follow_ups(splitter.follow_ups, 'Kannagi'), ['Why did she go?', 'Who was **Kovalan**?']
+                )
+
+    def test_text_without_marker_is_all_shown(self):
+        text = 'Follow the river to Madurai, Kannagi said. Follow-up came later.'
+        splitter, chunks = stream([text[i:i + 7] for i in range(0, len(text), 7)])
+        self.assertEqual(''.join(chunks), text)
+        self.assertEqual(splitter.follow_ups, '')
+        self.assertEqual(split_follow_ups(text, 'Kannagi'), (text, fallback_suggestions('Kannagi')))
+
+    def test_fewer_than_two_questions_fall_back(self):
+        self.assertEqual(parse_follow_ups('\n- Why did she go?\n', 'Kannagi'), fallback_suggestions('Kannagi'))
+        self.assertEqual(
+            split_follow_ups('Answer.\nFollow-up questions:\n**\n', 'Kannagi'),
+            ('Answer.', fallback_suggestions('Kannagi')),
+        )
+
+    def test_at_most_three_questions(self):
+        questions = '\n'.join(f'Question {i}?' for i in range(5))
+        self.assertEqual(len(parse_follow_ups(questions, 'Kannagi')), 3)
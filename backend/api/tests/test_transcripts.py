@@ -0,0 +1,56 @@
+import json
+import os
+import shutil
+import tempfile
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.test import TransactionTestCase
+from django.utils import timezone
+
+from api.models import Chat, Leader
+from api.transcripts import TranscriptWriter
+
+
+# Foreign keys are checked at commit, which a TestCase never reaches
+class TranscriptWriterTests(TransactionTestCase):
+    def setUp(self):
+        self.journal_dir = tempfile.mkdtemp(prefix='silai-journal-')
+        self.addCleanup(shutil.rmtree, self.journal_dir, ignore_errors=True)
+        self.writer = TranscriptWriter(
+            enabled=True, batch_size=100, flush_interval=3600, journal_dir=self.journal_dir
+        )
+        self.user = get_user_model().objects.create_user(email='reader@example.com', first_name='R', password='x')
+        self.leader = Leader.objects.create(name='Bharati', bio='x', created_at=timezone.now())
+
+    def test_flush_drops_turn_of_deleted_leader(self):
+        gone = Leader.objects.create(name='Gone', bio='x', created_at=timezone.now())
+        self.writer.record(self.user, gone, 'hi', 'hello', 's1')
+        self.writer.record(self.user, self.leader, 'who?', 'a poet', 's2')
+        gone.delete()
+
+        self.assertEqual(self.writer.flush(), 1)
+        self.assertEqual(list(Chat.objects.values_list('session_id', flat=True)), ['s2'])
+        stats = self.writer.stats()
+        self.assertEqual((stats['pending'], stats['dropped'], stats['failed_flushes']), (0, 1, 0))
+
+        # Later turns aren't held up
+        self.writer.record(self.user, self.leader, 'more', 'sure', 's2')
+        self.assertEqual(self.writer.flush(), 1)
+        self.assertEqual(os.listdir(self.journal_dir), [os.path.basename(self.writer._segment.path)])
+
+    def test_recover_drops_bad_turns(self):
+        records = [
+            {
+                'turn_id': str(uuid.uuid4()), 'user_id': self.user.pk, 'leader_id': leader_id,
+                'user_input': 'q', 'ai_response': 'a', 'session_id': 's', 'timestamp': timezone.now().isoformat(),
+            }
+            for leader_id in (self.leader.pk, self.leader.pk + 1000)
+        ]
+        with open(os.path.join(self.journal_dir, 'crashed.jsonl'), 'w', encoding='utf-8') as f:
+            f.writelines(json.dumps(record) + '\n' for record in records)
+
+        self.assertEqual(self.writer.recover(), 2)
+        self.assertEqual(Chat.objects.count(), 1)
+        self.assertEqual(self.writer.dropped, 1)
+        self.assertEqual(os.listdir(self.journal_dir), [])
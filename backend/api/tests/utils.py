@@ -0,0 +1,38 @@
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.files import File
+from django.test import override_settings
+
+from api.fake_embeddings import FAKE_EMBEDDING_MODEL
+from api.models import IngestionJob, Leader, LeaderDocument
+
+PDF_DIR = os.path.join(settings.BASE_DIR.parent, 'PDF')
+
+# Fake embeddings, a throwaway media directory and no background work. The
+# embedding service reads its model name when api.embeddings is imported, so
+# tests import it (and api.leader_index, api.vectorstore, ...) inside the test.
+offline_settings = override_settings(
+    MEDIA_ROOT=tempfile.mkdtemp(prefix='silai-tests-'),
+    EMBEDDING_MODEL_NAME=FAKE_EMBEDDING_MODEL,
+    QUERY_EMBEDDING_CACHE_PATH='',
+    INGESTION_RUN_IN_PROCESS=False,
+    SUGGESTION_BANK_BUILD_ON_INGEST=False,
+)
+
+
+def add_document(leader, filename, name=None):
+    """Upload one of the bundled PDFs as a document of ``leader``"""
+    with open(os.path.join(PDF_DIR, filename), 'rb') as f:
+        return LeaderDocument.objects.create(leader=leader, file=File(f, name=name or filename))
+
+
+def sync_leader_index(leader):
+    """Run the leader's queued ingestion here; returns its stats"""
+    from api.ingestion import build_leader_index
+
+    stats = build_leader_index(Leader.objects.get(id=leader.id), lambda status, progress: None)
+    IngestionJob.objects.filter(leader=leader).update(status=IngestionJob.Status.SUCCEEDED)
+    Leader.objects.filter(id=leader.id).update(index_status=Leader.IndexStatus.INDEXED, index_progress=100)
+    return stats
@@ -0,0 +1,281 @@
+"""Write-behind persistence of finished chat turns.
+
+With ``TRANSCRIPT_WRITE_BEHIND`` on, streaming chats hand their finished turn
+to ``transcript_writer`` instead of inserting it themselves. Turns are
+appended to a local journal and flushed to the database with ``bulk_create``
+once ``TRANSCRIPT_BATCH_SIZE`` are pending or every
+``TRANSCRIPT_FLUSH_INTERVAL`` seconds.
+
+Each process writes its own journal segment in ``TRANSCRIPT_JOURNAL_DIR``
+and holds an exclusive lock on it. A segment is deleted only after its turns
+are committed. Segments left behind by a crashed process are replayed on
+start-up. Every turn carries a ``turn_id``, so replaying turns that were
+already committed inserts nothing. A turn the database rejects (its leader
+or user was deleted meanwhile) is logged and dropped, so it can't hold up
+the turns queued behind it.
+"""
+import atexit
+import glob
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Chat
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+# Windows locks byte ranges, and a locked range can't be read even by this process,
+# so the lock is taken on one byte far past any journal's contents
+MSVCRT_LOCK_OFFSET = 2 ** 31 - 2
+
+
+def _lock(file):
+    """Lock ``file`` exclusively; raises BlockingIOError if another process holds it"""
+    if fcntl is not None:
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return
+    os.lseek(file.fileno(), MSVCRT_LOCK_OFFSET, os.SEEK_SET)
+    try:
+        msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError as e:
+        raise BlockingIOError(*e.args) from e
+
+
+class _Segment:
+    """An append-only journal file, exclusively locked while open"""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'a', encoding='utf-8')
+        try:
+            _lock(self.file)
+        except BlockingIOError:
+            self.file.close()
+            raise
+
+    def append(self, record):
+        self.file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        # Reaches the OS now, so the turn survives a crash of this process
+        self.file.flush()
+
+    def discard(self):
+        if fcntl is None:
+            # Windows can't remove an open file; a replay of it after close inserts nothing new
+            self.file.close()
+            os.remove(self.path)
+            return
+        os.remove(self.path)
+        self.file.close()
+
+
+class TranscriptWriter:
+    def __init__(self, enabled, batch_size, flush_interval, journal_dir):
+        self.enabled = enabled
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.journal_dir = journal_dir
+        self._pending = []
+        self._segment = None
+        # Segments whose turns are still pending after a failed flush
+        self._retained = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self.recorded = 0
+        self.flushed = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.replayed = 0
+        self.dropped = 0
+        self.last_flush_seconds = None
+
+    def record(self, user, leader, user_input, ai_response, session_id):
+        """Persist a finished turn, now or (write-behind) with the next batch"""
+        if not self.enabled:
+            return Chat.objects.create(
+                user=user,
+                leader=leader,
+                user_input=user_input,
+                ai_response=ai_response,
+                session_id=session_id
+            )
+
+        self._ensure_started()
+        record = {
+            'turn_id': str(uuid.uuid4()),
+            'user_id': user.pk if user is not None else None,
+            'leader_id': leader.pk,
+            'user_input': user_input,
+            'ai_response': ai_response,
+            'session_id': session_id,
+            'timestamp': timezone.now().isoformat(),
+        }
+        with self._lock:
+            self._segment.append(record)
+            self._pending.append(record)
+            self.recorded += 1
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self._wake.set()
+        return None
+
+    def flush(self):
+        """Write all pending turns now; returns how many were committed"""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                records, self._pending = self._pending, []
+                segments = self._retained + [self._segment]
+                self._retained = []
+                self._segment = self._open_segment()
+
+            started = time.perf_counter()
+            try:
+                dropped = _insert_valid(records)
+            except Exception as e:
+                logger.exception("Error flushing %d chat turns: %s", len(records), e)
+                with self._lock:
+                    # Retry them with the next flush; their journals stay on disk
+                    self._pending[:0] = records
+                    self._retained = segments + self._retained
+                    self.failed_flushes += 1
+                return 0
+
+            for segment in segments:
+                segment.discard()
+            with self._lock:
+                self.flushed += len(records) - dropped
+                self.dropped += dropped
+                self.flushes += 1
+                self.last_flush_seconds = time.perf_counter() - started
+            return len(records) - dropped
+
+    def recover(self):
+        """Replay journal segments left behind by processes that died"""
+        replayed = 0
+        for path in sorted(glob.glob(os.path.join(self.journal_dir, '*.jsonl'))):
+            try:
+                segment = _Segment(path)
+            except BlockingIOError:
+                # Still held by a live process
+                continue
+            except FileNotFoundError:
+                continue
+            with open(path, encoding='utf-8') as f:
+                records = [json.loads(line) for line in f if line.strip()]
+            if records:
+                self.dropped += _insert_valid(records)
+            segment.discard()
+            replayed += len(records)
+        if replayed:
+            logger.info("Replayed %d chat turns from the transcript journal", replayed)
+        return replayed
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'pending': len(self._pending),
+                'recorded': self.recorded,
+                'flushed': self.flushed,
+                'flushes': self.flushes,
+                'failed_flushes': self.failed_flushes,
+                'replayed': self.replayed,
+                'dropped': self.dropped,
+                'last_flush_seconds': self.last_flush_seconds,
+            }
+
+    def _open_segment(self):
+        return _Segment(os.path.join(self.journal_dir, f"{os.getpid()}-{uuid.uuid4().hex}.jsonl"))
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            os.makedirs(self.journal_dir, exist_ok=True)
+            try:
+                self.replayed += self.recover()
+            except Exception as e:
+                logger.exception("Error replaying the transcript journal: %s", e)
+            self._segment = self._open_segment()
+            self._thread = threading.Thread(target=self._run, name='transcript-writer', daemon=True)
+            self._thread.start()
+            atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.exception("Error in transcript writer: %s", e)
+            finally:
+                close_old_connections()
+
+
+def _insert_valid(records):
+    """Insert ``records``, dropping any the database rejects; returns how many were dropped"""
+    try:
+        with transaction.atomic():
+            _insert(records)
+        return 0
+    except IntegrityError:
+        pass
+    # Find the bad turns one by one
+    dropped = 0
+    for record in records:
+        try:
+            with transaction.atomic():
+                _insert([record])
+        except IntegrityError as e:
+            logger.error(
+                "Dropping chat turn %s of leader %s and user %s: %s",
+                record['turn_id'], record['leader_id'], record['user_id'], e
+            )
+            dropped += 1
+    return dropped
+
+
+def _insert(records):
+    Chat.objects.bulk_create(
+        [
+            Chat(
+                turn_id=record['turn_id'],
+                user_id=record['user_id'],
+                leader_id=record['leader_id'],
+                user_input=record['user_input'],
+                ai_response=record['ai_response'],
+                session_id=record['session_id'],
+                timestamp=parse_datetime(record['timestamp']),
+            )
+            for record in records
+        ],
+        ignore_conflicts=True,
+    )
+
+
+transcript_writer = TranscriptWriter(
+    enabled=settings.TRANSCRIPT_WRITE_BEHIND,
+    batch_size=settings.TRANSCRIPT_BATCH_SIZE,
+    flush_interval=settings.TRANSCRIPT_FLUSH_INTERVAL,
+    journal_dir=settings.TRANSCRIPT_JOURNAL_DIR,
+)
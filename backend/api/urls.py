@@ -1,6 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from . import views
+from . import async_views
 
 router = DefaultRouter()
 router.register(r'leaders', views.LeaderViewSet)
@@ -8,4 +9,8 @@ router.register(r'chats', views.ChatViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
-]
\ No newline at end of file
+    path('stats/', views.RuntimeStatsView.as_view(), name='runtime-stats'),
+    # Async variants for ASGI deployments
+    path('async/leaders/<int:pk>/chat/', async_views.leader_chat, name='leader-chat-async'),
+    path('async/leaders/<int:pk>/suggestions/', async_views.leader_suggestions, name='leader-suggestions-async'),
+]
@@ -0,0 +1,188 @@
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .leader_index import (
+    DEFAULT_EMBEDDING_MODEL, embeddings_for, index_nbytes, manifest_path, open_leader_index
+)
+
+
+class _CacheEntry:
+    __slots__ = ('mtime_ns', 'nbytes', 'store')
+
+    def __init__(self, mtime_ns, nbytes, store):
+        self.mtime_ns = mtime_ns
+        self.nbytes = nbytes
+        self.store = store
+
+
+class VectorStoreRegistry:
+    """Process-wide LRU cache of loaded per-leader FAISS stores.
+
+    Entries are keyed by leader id and validated against the mtime of the
+    index manifest (or legacy pickle) on every lookup, so a rebuilt index is
+    picked up automatically even when it was written by another process. The
+    cache is bounded by an approximate memory budget (the on-disk size of
+    each index).
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._loading = {}
+        self._bytes = 0
+        self._listeners = []
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def resolve_path(self, leader):
+        """Return the absolute index location for a leader, or None if it has none.
+
+        Leaders indexed in the mmap layout point at an index directory;
+        older leaders still point at a pickled store.
+        """
+        if leader.index_path:
+            return os.path.join(settings.MEDIA_ROOT, leader.index_path)
+        if leader.pkl_file_path:
+            return os.path.join(settings.MEDIA_ROOT, leader.pkl_file_path)
+        return None
+
+    def get(self, leader):
+        """Return the leader's vector store, loading it on a miss.
+
+        Returns None when the leader has no index on disk.
+        """
+        return self.get_versioned(leader)[0]
+
+    def get_versioned(self, leader):
+        """Return ``(store, version)`` for a leader, or ``(None, None)``.
+
+        The version is the index mtime; it changes whenever the index is
+        rebuilt, so callers can key derived caches on it.
+        """
+        path = self.resolve_path(leader)
+        if path is None:
+            return None, None
+        is_directory = bool(leader.index_path)
+        try:
+            # The manifest is written last, so its mtime versions the whole index
+            stat = os.stat(manifest_path(path) if is_directory else path)
+        except FileNotFoundError:
+            self.invalidate(leader.id)
+            return None, None
+
+        entry = self._lookup(leader.id, stat.st_mtime_ns)
+        if entry is not None:
+            return entry.store, entry.mtime_ns
+
+        # Only one thread loads a given leader; the others wait and re-check
+        with self._loading_lock(leader.id):
+            entry = self._lookup(leader.id, stat.st_mtime_ns, count=False)
+            if entry is not None:
+                return entry.store, entry.mtime_ns
+            if is_directory:
+                store, nbytes = open_leader_index(path), index_nbytes(path)
+            else:
+                store, nbytes = self._load_pickle(path), stat.st_size
+            self._insert(leader.id, _CacheEntry(stat.st_mtime_ns, nbytes, store))
+            return store, stat.st_mtime_ns
+
+    def add_listener(self, callback):
+        """Call ``callback(leader_id)`` whenever a leader's store leaves the cache.
+
+        Lets caches of objects built on a store (e.g. chains) drop them
+        together with it. Callbacks run under the registry lock and must not
+        call back into the registry.
+        """
+        self._listeners.append(callback)
+
+    def invalidate(self, leader_id):
+        """Drop a leader's cached store, e.g. after its index was rebuilt"""
+        with self._lock:
+            entry = self._entries.pop(leader_id, None)
+            if entry is not None:
+                self._bytes -= entry.nbytes
+                self.invalidations += 1
+            self._notify(leader_id)
+
+    def clear(self):
+        with self._lock:
+            leader_ids = list(self._entries)
+            self._entries.clear()
+            self._bytes = 0
+            for leader_id in leader_ids:
+                self._notify(leader_id)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+            }
+
+    def _lookup(self, leader_id, mtime_ns, count=True):
+        with self._lock:
+            entry = self._entries.get(leader_id)
+            if entry is not None and entry.mtime_ns != mtime_ns:
+                # Index file changed on disk since it was cached
+                self._entries.pop(leader_id)
+                self._bytes -= entry.nbytes
+                self.invalidations += 1
+                self._notify(leader_id)
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(leader_id)
+                if count:
+                    self.hits += 1
+            elif count:
+                self.misses += 1
+            return entry
+
+    def _insert(self, leader_id, entry):
+        with self._lock:
+            old = self._entries.pop(leader_id, None)
+            if old is not None:
+                self._bytes -= old.nbytes
+                self._notify(leader_id)
+            self._entries[leader_id] = entry
+            self._bytes += entry.nbytes
+            # Evict least recently used stores, always keeping the newest one
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                evicted_id, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+                self.evictions += 1
+                self._notify(evicted_id)
+
+    def _notify(self, leader_id):
+        for callback in self._listeners:
+            callback(leader_id)
+
+    def _loading_lock(self, leader_id):
+        with self._lock:
+            return self._loading.setdefault(leader_id, threading.Lock())
+
+    def _load_pickle(self, path):
+        with open(path, 'rb') as f:
+            store = pickle.load(f)
+        # Query through the shared model rather than the pickled copy
+        model_name = getattr(store.embedding_function, 'model_name', DEFAULT_EMBEDDING_MODEL)
+        store.embedding_function = embeddings_for(model_name)
+        return store
+
+
+vector_store_registry = VectorStoreRegistry(
+    max_bytes=getattr(settings, 'VECTOR_STORE_CACHE_MAX_BYTES', 1024 * 1024 * 1024),
+)
@@ -1,22 +1,82 @@
 from rest_framework import generics, viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
-from django.http import StreamingHttpResponse
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.views import APIView
+from . import services
+from .metrics import RequestTimings, render_metrics, timed_stream
 from .models import Leader, Chat
+from .pagination import ChatHistoryPagination
 from .serializers import LeaderSerializer, ChatSerializer
-import pickle
+from .history import condense_question
+from .scheduler import QueueFull, generation_scheduler
+from .suggestions import FollowUpSplitter, parse_follow_ups, parse_suggestions, split_follow_ups
+from .transcripts import transcript_writer
+from .streaming import (
+    ChatStream, event_stream_response, parse_last_event_id, replay_buffer, sse_event, stream_protocol
+)
+import logging
 import os
+import re
+import secrets
 from django.conf import settings
-from langchain_community.llms import Ollama
+from django.db.models import Count, Max, Min, Q
+from django.http import HttpResponse
+from django.utils.dateparse import parse_datetime
 import uuid
-from langchain_core.prompts import ChatPromptTemplate
-from langchain.chains import create_retrieval_chain
-from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain.chains import LLMChain
 import json
 import time
 
+logger = logging.getLogger(__name__)
+
+def format_citations(sources):
+    """Unique "<file>, page <n>" citations for retrieved documents"""
+    citations = []
+    for doc in sources:
+        meta = doc.metadata
+        page = meta.get('page', 'Unknown')
+        full_path = meta.get('source')
+        source_filename = os.path.basename(full_path) if full_path else 'PDF'
+        citations.append(f"{source_filename}, page {page}")
+    return list(dict.fromkeys(citations))
+
+def with_citations(answer, citations):
+    citations_text = "\nCitations:\n" + "\n".join(citations) if citations else ""
+    return f"{answer}{citations_text}"
+
+OLLAMA_UNAVAILABLE_MESSAGE = (
+    f'Failed to connect to Ollama. Please ensure Ollama is running with {settings.OLLAMA_MODEL} model.'
+)
+
+def ollama_unavailable_response():
+    return Response({'error': OLLAMA_UNAVAILABLE_MESSAGE}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+GENERATION_TIMEOUT_MESSAGE = 'Timed out waiting for the assistant. Please try again.'
+
+def queue_full_response(error):
+    response = Response(
+        {'error': str(error), 'retry_after': error.retry_after},
+        status=status.HTTP_429_TOO_MANY_REQUESTS
+    )
+    response['Retry-After'] = str(error.retry_after)
+    return response
+
+def wait_for_slot(ticket, stream):
+    """Yield "queued" events until ``ticket`` gets a generation slot; False on timeout"""
+    deadline = time.monotonic() + generation_scheduler.max_wait
+    last_position = None
+    while not ticket.granted:
+        position = ticket.position
+        if position and position != last_position:
+            yield from stream.queued(position)
+            last_position = position
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            ticket.release(timed_out=True)
+            return False
+        ticket.wait(min(settings.GENERATION_QUEUE_UPDATE_INTERVAL, remaining))
+    return True
+
 class LeaderList(generics.ListAPIView):
     queryset = Leader.objects.all()
     serializer_class = LeaderSerializer
@@ -33,233 +93,294 @@ class LeaderViewSet(viewsets.ModelViewSet):
         user_input = request.data.get('message')
         session_id = request.data.get('session_id', str(uuid.uuid4()))
         is_streaming = request.data.get('streaming', False)  # Add streaming parameter
-        chat_history = []
+        # Follow-up suggestions generated along with the answer, in the same LLM call
+        with_suggestions = bool(request.data.get('suggestions', False))
+
+        if is_streaming and request.headers.get('Last-Event-ID'):
+            return self._resume_stream(request.headers['Last-Event-ID'])
+
+        timings = RequestTimings('chat_stream' if is_streaming else 'chat')
+
+        stream = ChatStream(session_id, protocol=stream_protocol(request.data)) if is_streaming else None
 
         if not user_input:
             if is_streaming:
-                def error_stream():
-                    yield f"data: {json.dumps({'error': 'Message is required'})}\n\n"
-                return StreamingHttpResponse(error_stream(), content_type='text/plain')
+                return event_stream_response(stream.error('Message is required'), stream.content_type)
             else:
                 return Response({'error': 'Message is required'}, status=status.HTTP_400_BAD_REQUEST)
 
-        if user_input.strip().lower() in ["thanks", "thank you", "ok", "okay", "cool", "hmm"]:
-            response_text = "You're welcome!"
-            if is_streaming:
-                def quick_response_stream():
-                    yield f"data: {json.dumps({'content': response_text, 'done': True, 'session_id': session_id})}\n\n"
-                return StreamingHttpResponse(quick_response_stream(), content_type='text/plain')
-            else:
-                return Response({
-                    'response': response_text,
-                    'session_id': session_id
-                })
-
-        if len(user_input.strip()) < 4:
-            response_text = "Could you please rephrase your question?"
-            if is_streaming:
-                def rephrase_stream():
-                    yield f"data: {json.dumps({'content': response_text, 'done': True, 'session_id': session_id})}\n\n"
-                return StreamingHttpResponse(rephrase_stream(), content_type='text/plain')
-            else:
-                return Response({
-                    'response': response_text,
-                    'session_id': session_id
-                })
+        # Canned answers for thanks, greetings, gibberish, ... (no retrieval or LLM)
+        with timings.span('route'):
+            decision = services.intent_router.route(user_input, leader)
+        if decision:
+            return timings.apply(self._routed_response(decision, session_id, stream))
 
         if is_streaming:
-            return self._handle_streaming_chat(request, leader, user_input, session_id)
+            return self._handle_streaming_chat(
+                request, leader, user_input, session_id, stream, with_suggestions, timings
+            )
         else:
-            return self._handle_regular_chat(request, leader, user_input, session_id)
+            return timings.apply(
+                self._handle_regular_chat(request, leader, user_input, session_id, with_suggestions, timings)
+            )
 
-    def _handle_regular_chat(self, request, leader, user_input, session_id):
+    def _routed_response(self, decision, session_id, stream):
+        if stream is not None:
+            return event_stream_response(stream.done(decision.response, route=decision.route), stream.content_type)
+        return Response({
+            'response': decision.response,
+            'session_id': session_id,
+            'route': decision.route
+        })
+
+    def _resume_stream(self, last_event_id):
+        """Replay protocol 2 events a client missed after ``Last-Event-ID``.
+
+        Only streams this process sent can be replayed. One that never
+        finished ends with an ``error`` event, so the client re-sends the message.
+        """
+        stream_id, seq = parse_last_event_id(last_event_id)
+        replay = replay_buffer.events_after(stream_id, seq) if stream_id else None
+        if replay is None:
+            return event_stream_response(
+                [sse_event({'error': 'Stream can no longer be resumed'}, event='error')], 'text/event-stream'
+            )
+        events, complete = replay
+        if not complete:
+            events.append(sse_event(
+                {'error': 'Stream ended before the answer was complete', 'incomplete': True}, event='error'
+            ))
+        return event_stream_response(events, 'text/event-stream')
+
+    def _handle_regular_chat(self, request, leader, user_input, session_id, with_suggestions, timings):
         """Handle regular non-streaming chat"""
         try:
-            # Load the FAISS index
-            pkl_path = os.path.join(settings.MEDIA_ROOT, leader.pkl_file_path)
-            if not os.path.exists(pkl_path):
+            # Load the FAISS index (shared, cached per process)
+            with timings.span('index_load'):
+                db, index_version = services.vector_store_registry.get_versioned(leader)
+            if db is None:
                 return Response(
                     {'error': 'Leader knowledge base not found. Please ensure the PDF has been processed.'},
                     status=status.HTTP_404_NOT_FOUND
                 )
 
-            with open(pkl_path, 'rb') as f:
-                db = pickle.load(f)
+            # Follow-ups are retrieved (and cached) with the session's earlier questions
+            with timings.span('condense'):
+                question = condense_question(request.user, leader, session_id, user_input)
+
+            # Reuse a prior answer to a near-identical question
+            question_vector = None
+            if settings.ANSWER_CACHE_ENABLED or services.intent_router.min_relevance:
+                with timings.span('embed'):
+                    question_vector = services.embedding_service.embed_query(question)
+            if settings.ANSWER_CACHE_ENABLED:
+                with timings.span('cache_lookup'):
+                    cached = services.answer_cache.lookup(leader.id, index_version, question_vector)
+                if cached:
+                    full_response = with_citations(cached.answer, cached.citations)
+                    with timings.span('save'):
+                        chat = Chat.objects.create(
+                            user=request.user,
+                            leader=leader,
+                            user_input=user_input,
+                            ai_response=full_response,
+                            session_id=session_id
+                        )
+                    return Response({
+                        'response': full_response,
+                        'session_id': session_id,
+                        'chat_id': chat.id,
+                        'cached': True
+                    })
+
+            # Turn away questions the leader's documents don't cover
+            with timings.span('relevance'):
+                decision = services.intent_router.check_relevance(db, question_vector, leader)
+            if decision:
+                return self._routed_response(decision, session_id, None)
+
+            # Prompt, retriever and chain compiled once per leader
+            leader_chain = services.chain_factory.get(leader, db, index_version)
+            if with_suggestions:
+                retrieval_chain = leader_chain.fused_retrieval_chain
+            else:
+                retrieval_chain = leader_chain.retrieval_chain
 
-            # Initialize LLM (no streaming for regular chat)
+            # Wait for a generation slot (429 straight away if the queue is full)
             try:
-                llm = Ollama(model="qwen2.5", base_url="http://localhost:11434")
-            except Exception as e:
-                return Response(
-                    {'error': 'Failed to connect to Ollama. Please ensure Ollama is running with qwen2.5 model.'},
-                    status=status.HTTP_503_SERVICE_UNAVAILABLE
-                )
-
-            # Prompt template
-            prompt = ChatPromptTemplate.from_template("""You are a helpful assistant. Answer based ONLY on the context provided.
-
-RULES:
-- If the input is a polite message like 'thank you', respond politely and briefly.
-- If the question is unclear or too short, ask the user to rephrase.
-- Do NOT answer unrelated or hallucinated questions.
-- Only answer what's directly asked.
-- Do NOT list multiple Q&As unless explicitly asked.
-
-CONTEXT:
-{context}
-
-Question: {input}
-Answer:
-""")
-
-            # Chain setup
-            document_chain = create_stuff_documents_chain(llm, prompt)
-            retriever = db.as_retriever(search_kwargs={"k": 3})
-            retrieval_chain = create_retrieval_chain(retriever, document_chain)
-
-            # Run chain
-            response = retrieval_chain.invoke({"input": user_input})
+                ticket = generation_scheduler.submit(request.user.pk)
+            except QueueFull as e:
+                return queue_full_response(e)
+            with ticket:
+                with timings.span('queue'):
+                    granted = ticket.wait(generation_scheduler.max_wait)
+                if not granted:
+                    ticket.release(timed_out=True)
+                    return Response({'error': GENERATION_TIMEOUT_MESSAGE}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+                # Run chain (its retrieval and generation are recorded as spans)
+                response = retrieval_chain.invoke({"input": question}, config=leader_chain.run_config(timings))
             ai_response = response.get("answer") or response.get("output") or str(response)
             sources = response.get("context", [])
+            extra = {}
+            if with_suggestions:
+                ai_response, extra['suggestions'] = split_follow_ups(ai_response, leader.name)
 
             # Format citations
-            citations = []
-            for doc in sources:
-                meta = doc.metadata
-                page = meta.get('page', 'Unknown')
-                full_path = meta.get('source')
-                source_filename = os.path.basename(full_path) if full_path else 'PDF'
-                citations.append(f"{source_filename}, page {page}")
-
-            citations_text = "\nCitations:\n" + "\n".join(set(citations)) if citations else ""
-            full_response = f"{ai_response}{citations_text}"
+            citations = format_citations(sources)
+            full_response = with_citations(ai_response, citations)
+            if settings.ANSWER_CACHE_ENABLED:
+                services.answer_cache.store(leader.id, index_version, question_vector, ai_response, citations)
 
             # Save to DB
-            chat = Chat.objects.create(
-                user=request.user,
-                leader=leader,
-                user_input=user_input,
-                ai_response=full_response,
-                session_id=session_id
-            )
+            with timings.span('save'):
+                chat = Chat.objects.create(
+                    user=request.user,
+                    leader=leader,
+                    user_input=user_input,
+                    ai_response=full_response,
+                    session_id=session_id
+                )
 
             return Response({
                 'response': full_response,
                 'session_id': session_id,
-                'chat_id': chat.id
+                'chat_id': chat.id,
+                **extra
             })
 
+        except services.OllamaUnavailable as e:
+            logger.warning("Error in chat endpoint: %s", e)
+            return ollama_unavailable_response()
         except Exception as e:
-            print(f"Error in chat endpoint: {str(e)}")
+            logger.exception("Error in chat endpoint: %s", e)
             return Response(
                 {'error': f'An error occurred while processing your message: {str(e)}'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-    def _handle_streaming_chat(self, request, leader, user_input, session_id):
-        """Handle streaming chat"""
+    def _handle_streaming_chat(self, request, leader, user_input, session_id, stream, with_suggestions, timings):
+        """Handle streaming chat; ``stream`` encodes events for the client's protocol"""
         def generate_streaming_response():
             try:
-                # Load the FAISS index
-                pkl_path = os.path.join(settings.MEDIA_ROOT, leader.pkl_file_path)
-                if not os.path.exists(pkl_path):
-                    yield f"data: {json.dumps({'error': 'Leader knowledge base not found. Please ensure the PDF has been processed.'})}\n\n"
+                # Load the FAISS index (shared, cached per process)
+                with timings.span('index_load'):
+                    db, index_version = services.vector_store_registry.get_versioned(leader)
+                if db is None:
+                    yield from stream.error('Leader knowledge base not found. Please ensure the PDF has been processed.')
                     return
 
-                with open(pkl_path, 'rb') as f:
-                    db = pickle.load(f)
-
-                # Initialize LLM with streaming enabled
-                try:
-                    llm = Ollama(
-                        model="qwen2.5", 
-                        base_url="http://localhost:11434"
-                    )
-                except Exception as e:
-                    yield f"data: {json.dumps({'error': 'Failed to connect to Ollama. Please ensure Ollama is running with qwen2.5 model.'})}\n\n"
+                # Follow-ups are retrieved (and cached) with the session's earlier questions
+                with timings.span('condense'):
+                    question = condense_question(request.user, leader, session_id, user_input)
+
+                # Replay a prior answer to a near-identical question as a stream
+                question_vector = None
+                if settings.ANSWER_CACHE_ENABLED or services.intent_router.min_relevance:
+                    with timings.span('embed'):
+                        question_vector = services.embedding_service.embed_query(question)
+                if settings.ANSWER_CACHE_ENABLED:
+                    with timings.span('cache_lookup'):
+                        cached = services.answer_cache.lookup(leader.id, index_version, question_vector)
+                    if cached:
+                        for token in re.findall(r'\S+\s*', cached.answer):
+                            yield from stream.token(token)
+                        final_response = with_citations(cached.answer, cached.citations)
+                        yield from stream.done(final_response, cached=True)
+                        with timings.span('save'):
+                            transcript_writer.record(
+                                user=request.user,
+                                leader=leader,
+                                user_input=user_input,
+                                ai_response=final_response,
+                                session_id=session_id
+                            )
+                        return
+
+                # Turn away questions the leader's documents don't cover
+                with timings.span('relevance'):
+                    decision = services.intent_router.check_relevance(db, question_vector, leader)
+                if decision:
+                    yield from stream.done(decision.response, route=decision.route)
                     return
 
-                # Prompt template
-                prompt = ChatPromptTemplate.from_template("""You are a helpful assistant. Answer based ONLY on the context provided.
-
-RULES:
-- If the input is a polite message like 'thank you', respond politely and briefly.
-- If the question is unclear or too short, ask the user to rephrase.
-- Do NOT answer unrelated or hallucinated questions.
-- Only answer what's directly asked.
-- Do NOT list multiple Q&As unless explicitly asked.
-
-CONTEXT:
-{context}
-
-Question: {input}
-Answer:
-""")
-
-                # Chain setup
-                document_chain = create_stuff_documents_chain(llm, prompt)
-                retriever = db.as_retriever(search_kwargs={"k": 3})
-                retrieval_chain = create_retrieval_chain(retriever, document_chain)
+                # Prompt, retriever and chain compiled once per leader
+                leader_chain = services.chain_factory.get(leader, db, index_version)
+                if with_suggestions:
+                    retrieval_chain = leader_chain.fused_retrieval_chain
+                    splitter = FollowUpSplitter()
+                else:
+                    retrieval_chain = leader_chain.retrieval_chain
+                    splitter = None
 
                 # Stream the response using native Ollama streaming
-                full_response = ""
                 sources = []
-                
-                # Use streaming invoke for real-time token generation
-                for chunk in retrieval_chain.stream({"input": user_input}):
-                    if 'answer' in chunk and chunk['answer']:
-                        token = chunk['answer']
-                        full_response += token
-                        
-                        # Send each token as it arrives from Ollama
-                        chunk_data = {
-                            'content': full_response,
-                            'done': False,
-                            'session_id': session_id
-                        }
-                        yield f"data: {json.dumps(chunk_data)}\n\n"
-                    
-                    # Collect context/sources for citations
-                    if 'context' in chunk:
-                        sources = chunk['context']
 
-                # Format citations after streaming is complete
-                citations = []
-                for doc in sources:
-                    meta = doc.metadata
-                    page = meta.get('page', 'Unknown')
-                    full_path = meta.get('source')
-                    source_filename = os.path.basename(full_path) if full_path else 'PDF'
-                    citations.append(f"{source_filename}, page {page}")
+                # Wait for a generation slot, telling the client its queue position
+                try:
+                    ticket = generation_scheduler.submit(request.user.pk)
+                except QueueFull as e:
+                    yield from stream.error(str(e), retry_after=e.retry_after)
+                    return
+                with ticket:
+                    with timings.span('queue'):
+                        granted = yield from wait_for_slot(ticket, stream)
+                    if not granted:
+                        yield from stream.error(GENERATION_TIMEOUT_MESSAGE)
+                        return
+
+                    # Use streaming invoke for real-time token generation
+                    for chunk in retrieval_chain.stream({"input": question}, config=leader_chain.run_config(timings)):
+                        if 'answer' in chunk and chunk['answer']:
+                            # Forward tokens as they arrive from Ollama (coalesced in protocol 2)
+                            token = splitter.feed(chunk['answer']) if splitter else chunk['answer']
+                            if token:
+                                yield from stream.token(token)
+
+                        # Collect context/sources for citations
+                        if 'context' in chunk:
+                            sources = chunk['context']
+
+                # The follow-up questions after the answer go out with the final event
+                extra = {}
+                if splitter:
+                    rest = splitter.finish()
+                    if rest:
+                        yield from stream.token(rest)
+                    extra['suggestions'] = parse_follow_ups(splitter.follow_ups, leader.name)
 
-                citations_text = "\nCitations:\n" + "\n".join(set(citations)) if citations else ""
-                final_response = f"{full_response}{citations_text}"
+                # Format citations after streaming is complete
+                full_response = stream.content
+                citations = format_citations(sources)
+                final_response = with_citations(full_response, citations)
+                if settings.ANSWER_CACHE_ENABLED:
+                    services.answer_cache.store(leader.id, index_version, question_vector, full_response, citations)
 
                 # Send final response with citations
-                final_data = {
-                    'content': final_response,
-                    'done': True,
-                    'session_id': session_id
-                }
-                yield f"data: {json.dumps(final_data)}\n\n"
-
-                # Save to DB
+                yield from stream.done(final_response, **extra)
+
+                # Save to DB (or hand it to the write-behind buffer)
                 try:
-                    Chat.objects.create(
-                        user=request.user,
-                        leader=leader,
-                        user_input=user_input,
-                        ai_response=final_response,
-                        session_id=session_id
-                    )
+                    with timings.span('save'):
+                        transcript_writer.record(
+                            user=request.user,
+                            leader=leader,
+                            user_input=user_input,
+                            ai_response=final_response,
+                            session_id=session_id
+                        )
                 except Exception as db_error:
-                    print(f"Error saving chat to DB: {str(db_error)}")
+                    logger.exception("Error saving chat to DB: %s", db_error)
 
+            except services.OllamaUnavailable as e:
+                logger.warning("Error in streaming chat endpoint: %s", e)
+                yield from stream.error(OLLAMA_UNAVAILABLE_MESSAGE)
             except Exception as e:
-                print(f"Error in streaming chat endpoint: {str(e)}")
-                yield f"data: {json.dumps({'error': f'An error occurred while processing your message: {str(e)}'})}\n\n"
+                logger.exception("Error in streaming chat endpoint: %s", e)
+                yield from stream.error(f'An error occurred while processing your message: {str(e)}')
 
-        return StreamingHttpResponse(generate_streaming_response(), content_type='text/plain')
+        # Stage timings go to /metrics; headers are sent before the stages run
+        return event_stream_response(timed_stream(generate_streaming_response(), timings), stream.content_type)
 
     @action(detail=True, methods=['get'])
     def chat_history(self, request, pk=None):
@@ -274,10 +395,13 @@ Answer:
                 leader=leader,
                 session_id=session_id,
                 user=request.user
-            ).order_by('timestamp')
+            )
 
-            serializer = ChatSerializer(chats, many=True)
-            return Response(serializer.data)
+            # Most recent page first; follow ``next`` for older messages
+            paginator = ChatHistoryPagination()
+            page = paginator.paginate_queryset(chats, request, view=self)
+            serializer = ChatSerializer(page, many=True)
+            return paginator.get_paginated_response(serializer.data)
 
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -306,7 +430,7 @@ Answer:
             })
 
         except Exception as e:
-            print(f"Error in clear_chat: {str(e)}")
+            logger.exception("Error in clear_chat: %s", e)
             return Response(
                 {'error': f'Failed to clear chat history: {str(e)}'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -321,83 +445,68 @@ Answer:
         if not latest_user_message:
             return Response({'error': 'latest_user_message is required'}, status=status.HTTP_400_BAD_REQUEST)
 
+        timings = RequestTimings('suggestions')
+        return timings.apply(self._suggestions(request, leader, latest_user_message, timings))
+
+    def _suggestions(self, request, leader, latest_user_message, timings):
         try:
-            # Load the FAISS index
-            pkl_path = os.path.join(settings.MEDIA_ROOT, leader.pkl_file_path)
-            if not os.path.exists(pkl_path):
+            # Load the FAISS index (shared, cached per process)
+            with timings.span('index_load'):
+                db, index_version = services.vector_store_registry.get_versioned(leader)
+            if db is None:
                 return Response(
                     {'error': 'Leader knowledge base not found. Please ensure the PDF has been processed.'},
                     status=status.HTTP_404_NOT_FOUND
                 )
 
-            with open(pkl_path, 'rb') as f:
-                db = pickle.load(f)
-
-            # Initialize LLM
-            try:
-                llm = Ollama(model="qwen2.5", base_url="http://localhost:11434")
-            except Exception as e:
-                return Response(
-                    {'error': 'Failed to connect to Ollama. Please ensure Ollama is running with qwen2.5 model.'},
-                    status=status.HTTP_503_SERVICE_UNAVAILABLE
+            # Rank the leader's precomputed question bank; the LLM is only the fallback
+            with timings.span('bank'):
+                suggestions = services.suggestion_banks.suggest(
+                    leader, request.user, request.data.get('session_id'), latest_user_message
                 )
+            if suggestions:
+                return Response({'suggestions': suggestions, 'source': 'bank'})
+
+            # Retriever and suggestion chain compiled once per leader
+            leader_chain = services.chain_factory.get(leader, db, index_version)
 
             # Retrieve relevant documents for the latest message
-            retriever = db.as_retriever(search_kwargs={"k": 3})
-            relevant_docs = retriever.get_relevant_documents(latest_user_message)
+            with timings.span('retrieval'):
+                relevant_docs = leader_chain.retriever.invoke(latest_user_message)
             
             # Extract context from relevant documents
             context = "\n".join([doc.page_content for doc in relevant_docs[:3]])
 
-            # Prompt template for generating suggestions
-            suggestion_prompt = ChatPromptTemplate.from_template("""Based on the user's latest message and the provided context about the historical figure, generate 2-3 helpful follow-up questions that would naturally continue the conversation.
-
-The questions should:
-- Be directly related to the historical figure and context
-- Build upon the user's current inquiry
-- Be specific and engaging
-- Help users explore different aspects of the figure's life, work, or impact
-
-Context about the historical figure:
-{context}
-
-User's latest message: {latest_user_message}
-
-Generate exactly 2-3 follow-up questions, one per line, without numbering or bullet points:""")
-
-            # Create LLM chain for suggestions
-            suggestion_chain = LLMChain(llm=llm, prompt=suggestion_prompt)
-            
-            # Generate suggestions
-            result = suggestion_chain.run(
-                context=context,
-                latest_user_message=latest_user_message
-            )
-            
-            # Parse the suggestions (split by newlines and clean up)
-            suggestions = [
-                line.strip() 
-                for line in result.strip().split('\n') 
-                if line.strip() and not line.strip().startswith(('-', '*', '•'))
-            ]
-            
-            # Ensure we have 2-3 suggestions
-            suggestions = suggestions[:3]  # Limit to max 3
+            # Suggestions share the generation slots with chat
+            try:
+                ticket = generation_scheduler.submit(request.user.pk)
+            except QueueFull as e:
+                return queue_full_response(e)
+            with ticket:
+                with timings.span('queue'):
+                    granted = ticket.wait(generation_scheduler.max_wait)
+                if not granted:
+                    ticket.release(timed_out=True)
+                    return Response({'error': GENERATION_TIMEOUT_MESSAGE}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+                # Generate suggestions
+                result = leader_chain.suggestion_chain.invoke({
+                    'context': context,
+                    'latest_user_message': latest_user_message
+                }, config=leader_chain.run_config(timings))
             
-            # Fallback suggestions if AI didn't generate proper ones
-            if len(suggestions) < 2:
-                suggestions = [
-                    f"What were {leader.name}'s major achievements?",
-                    f"How did {leader.name} influence their era?",
-                    f"What challenges did {leader.name} face?"
-                ]
+            suggestions = parse_suggestions(result, leader.name)
 
             return Response({
-                'suggestions': suggestions
+                'suggestions': suggestions,
+                'source': 'llm'
             })
 
+        except services.OllamaUnavailable as e:
+            logger.warning("Error in suggestions endpoint: %s", e)
+            return ollama_unavailable_response()
         except Exception as e:
-            print(f"Error in suggestions endpoint: {str(e)}")
+            logger.exception("Error in suggestions endpoint: %s", e)
             return Response(
                 {'error': f'An error occurred while generating suggestions: {str(e)}'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -407,9 +516,96 @@ class ChatViewSet(viewsets.ModelViewSet):
     queryset = Chat.objects.none()
     serializer_class = ChatSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = ChatHistoryPagination
 
     def get_queryset(self):
         session_id = self.request.query_params.get('session_id')
         if session_id:
             return Chat.objects.filter(session_id=session_id, user=self.request.user)
-        return Chat.objects.none()
\ No newline at end of file
+        return Chat.objects.none()
+
+    @action(detail=False, methods=['get'])
+    def sessions(self, request):
+        """The user's chat sessions, most recently active first.
+
+        Aggregates message count and first/last message time per session
+        without reading message bodies. ``leader`` filters by leader;
+        ``before`` and ``before_session`` (the ``last_message_at`` and
+        ``session_id`` of a page's last session, as in its ``next`` link) page back.
+        """
+        sessions = Chat.objects.filter(user=request.user)
+        leader_id = request.query_params.get('leader')
+        if leader_id:
+            if not leader_id.isdigit():
+                return Response({'error': 'leader must be an id'}, status=status.HTTP_400_BAD_REQUEST)
+            sessions = sessions.filter(leader_id=leader_id)
+
+        sessions = sessions.values('session_id', 'leader').annotate(
+            message_count=Count('id'),
+            first_message_at=Min('timestamp'),
+            last_message_at=Max('timestamp'),
+        ).order_by('-last_message_at', 'session_id')
+
+        before = request.query_params.get('before')
+        if before:
+            try:
+                before = parse_datetime(before)
+            except ValueError:
+                before = None
+            if before is None:
+                return Response({'error': 'before must be an ISO 8601 datetime'}, status=status.HTTP_400_BAD_REQUEST)
+            # Sessions that share the boundary time continue after the page's last session
+            before_session = request.query_params.get('before_session')
+            newer = Q(last_message_at__lt=before)
+            if before_session:
+                newer |= Q(last_message_at=before, session_id__gt=before_session)
+            sessions = sessions.filter(newer)
+
+        try:
+            limit = min(max(int(request.query_params.get('limit', 20)), 1), 100)
+        except ValueError:
+            return Response({'error': 'limit must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = list(sessions[:limit + 1])
+        next_url = None
+        if len(results) > limit:
+            results = results[:limit]
+            params = request.query_params.copy()
+            params['before'] = results[-1]['last_message_at'].isoformat()
+            params['before_session'] = results[-1]['session_id']
+            next_url = request.build_absolute_uri(f"{request.path}?{params.urlencode()}")
+        return Response({'next': next_url, 'results': results})
+
+class RuntimeStatsView(APIView):
+    """Counters of the shared caches, retrieval stages, intent router, suggestion banks, Ollama pool, generation queue and transcript writer"""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response({
+            'vector_stores': services.vector_store_registry.stats(),
+            'embeddings': services.embedding_service.stats(),
+            'answer_cache': services.answer_cache.stats(),
+            'chains': services.chain_factory.stats(),
+            'ollama': services.ollama_pool.stats(),
+            'generation': generation_scheduler.stats(),
+            'transcripts': transcript_writer.stats(),
+            'intents': services.intent_router.stats(),
+            'suggestion_banks': services.suggestion_banks.stats(),
+            'retrieval': {
+                'leaders': services.retrieval_stats.stats(),
+                'keyword_indexes': services.keyword_indexes.stats(),
+                'reranker_loaded': services.reranker.loaded,
+            },
+        })
+
+
+def metrics(request):
+    """Stage latencies, token rates, in-flight streams and component counters for Prometheus"""
+    token = settings.METRICS_TOKEN
+    if not token:
+        # Without a token only a development server exposes them
+        if not settings.DEBUG:
+            return HttpResponse('Set METRICS_TOKEN to enable /metrics', status=403, content_type='text/plain')
+    elif not secrets.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponse('Unauthorized', status=401, content_type='text/plain')
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -6,6 +6,7 @@ from django.conf import settings
 from django.conf.urls.static import static
 from accounts.views import get_user_profile_data
 from accounts.views import user_profile
+from api.views import metrics
 
 urlpatterns = [
     path("admin/", admin.site.urls),
@@ -19,6 +20,7 @@ urlpatterns = [
     path('api/', include('api.urls')),
     path('user_data/<str:pk>',get_user_profile_data),
     path('accounts/profile/', user_profile, name="user_profile"),  # NEW: Profile update & fetch API
+    path('metrics', metrics, name='metrics'),  # Prometheus scrape target
 
 ]
 
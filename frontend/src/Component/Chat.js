@@ -53,7 +53,8 @@ const Chat = ({ leader }) => {
             console.log('Suggestions URL:', url);
             
             const response = await axios.post(url, {
-                latest_user_message: latestUserMessage
+                latest_user_message: latestUserMessage,
+                session_id: sessionId
             }, {
                 headers: getAuthHeader()
             });
@@ -79,7 +80,7 @@ const Chat = ({ leader }) => {
             setIsSuggestionsLoading(false);
             console.log('=== SUGGESTIONS FETCH COMPLETE ===');
         }
-    }, [leader.id, leader.name, API_BASE_URL]);
+    }, [leader.id, leader.name, sessionId, API_BASE_URL]);
 
     // Handle suggestion click - fills input and sends the message
     const handleSuggestionClick = (suggestion) => {
@@ -104,9 +105,11 @@ const Chat = ({ leader }) => {
             );
             
             console.log('Chat history response:', response.data);
+            // The latest page of the session, oldest message first
+            const chats = response.data.results ?? response.data;
             
-            if (response.data.length > 0) {
-                const formattedMessages = response.data.flatMap(chat => [
+            if (chats.length > 0) {
+                const formattedMessages = chats.flatMap(chat => [
                     { type: 'user', content: chat.user_input },
                     { type: 'ai', content: chat.ai_response }
                 ]);
@@ -114,7 +117,7 @@ const Chat = ({ leader }) => {
                 setMessages(formattedMessages);
 
                 // Fetch suggestions based on the last user message
-                const lastUserMessage = response.data[response.data.length - 1]?.user_input;
+                const lastUserMessage = chats[chats.length - 1]?.user_input;
                 console.log('Last user message for suggestions:', lastUserMessage);
                 if (lastUserMessage) {
                     console.log('Fetching suggestions based on chat history');
@@ -180,15 +183,20 @@ const Chat = ({ leader }) => {
             
             const response = await axios.post(url, {
                 message: messageToSend,
-                session_id: sessionId
+                session_id: sessionId,
+                suggestions: true
             }, {
                 headers: getAuthHeader()
             });
 
             setMessages(prev => [...prev, { type: 'ai', content: response.data.response }]);
 
-            // Fetch new suggestions based on the message just sent
-            fetchSuggestions(messageToSend);
+            // Suggestions come with the answer; canned replies have none, so fetch them
+            if (response.data.suggestions?.length) {
+                setSuggestions(response.data.suggestions);
+            } else {
+                fetchSuggestions(messageToSend);
+            }
 
             // Check if we need to show the clear prompt
             if (messages.length >= MAX_MESSAGES) {
@@ -136,9 +136,11 @@ const ChatPage = () => {
             );
             
             console.log('Chat history response:', response.data);
+            // The latest page of the session, oldest message first
+            const chats = response.data.results ?? response.data;
             
-            if (response.data.length > 0) {
-                const formattedMessages = response.data.flatMap(chat => {
+            if (chats.length > 0) {
+                const formattedMessages = chats.flatMap(chat => {
                     const userMessage = { type: 'user', content: chat.user_input };
                     
                     // Parse AI response for citations
@@ -155,7 +157,7 @@ const ChatPage = () => {
                 setMessages(formattedMessages);
 
                 // Fetch suggestions based on the last user message
-                const lastUserMessage = response.data[response.data.length - 1]?.user_input;
+                const lastUserMessage = chats[chats.length - 1]?.user_input;
                 console.log('Last user message for suggestions:', lastUserMessage);
                 if (lastUserMessage && leader) {
                     console.log('Fetching suggestions based on chat history');
@@ -356,6 +358,7 @@ const ChatPage = () => {
             const reader = response.body.getReader();
             const decoder = new TextDecoder();
             let buffer = '';
+            let streamedContent = '';
 
             while (true) {
                 const { done, value } = await reader.read();
@@ -388,10 +391,20 @@ const ChatPage = () => {
                                 break;
                             }
 
+                            // Delta events carry only new text; the legacy format resends it all
+                            if (data.delta !== undefined) {
+                                streamedContent += data.delta;
+                            } else if (data.content !== undefined) {
+                                streamedContent = data.content;
+                            }
+                            const content = data.queued
+                                ? `Waiting for the assistant (position ${data.position} in queue)...`
+                                : streamedContent;
+
                             // Update the streaming message
                             setMessages(prev => {
                                 const newMessages = [...prev];
-                                const { mainContent, citations } = parseResponse(data.content);
+                                const { mainContent, citations } = parseResponse(content);
                                 // Find the last streaming AI message and update it
                                 for (let i = newMessages.length - 1; i >= 0; i--) {
                                     if (newMessages[i].type === 'ai' && newMessages[i].streaming !== undefined) {